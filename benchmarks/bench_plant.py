@@ -0,0 +1,326 @@
+# Copyright (c) 2020 IBM Corp. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Plant throughput benchmarks.
+
+Each scenario plants synthetic evidence into a local bare git repository
+standing in for a remote evidence locker.  The locker is seeded with a
+synthetic history of configurable size.  Scenarios run in their own process
+so that peak RSS is measured per scenario.
+
+Scenarios:
+
+- ``locker``: plant through ``PlantLocker`` directly.
+- ``cli``: plant through the ``plant.cli:run`` entry point.
+- ``cli-sparse``: plant through the ``plant.cli:run`` entry point with a
+  shallow, partial and sparse locker clone.
+- ``cli-direct``: plant through the ``plant.cli:run`` entry point writing
+  evidence straight into git objects.
+
+Results can be saved as a baseline and later runs compared against it::
+
+  python benchmarks/bench_plant.py --save-baseline baseline.json
+  python benchmarks/bench_plant.py --baseline baseline.json
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess  # nosec B404: runs git and benchmark child processes.
+import sys
+import tempfile
+import time
+
+SCENARIOS = ["locker", "cli", "cli-sparse", "cli-direct"]
+CLI_OPTIONS = {"cli": [], "cli-sparse": ["--sparse"], "cli-direct": ["--direct"]}
+LOCKER_URL = "https://bench.local/org/locker"
+USER = {"name": "bench", "email": "bench@example.com"}
+
+
+def parse_args(argv=None):
+    """Parse benchmark command line arguments."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--scenario",
+        choices=SCENARIOS,
+        action="append",
+        help="scenario to run, can be repeated - defaults to all scenarios",
+    )
+    parser.add_argument("--files", type=int, default=1000, help="files to plant")
+    parser.add_argument(
+        "--categories", type=int, default=10, help="categories to plant files in"
+    )
+    parser.add_argument(
+        "--file-size", type=int, default=1024, help="evidence file size in bytes"
+    )
+    parser.add_argument(
+        "--history", type=int, default=100, help="commits of seeded locker history"
+    )
+    parser.add_argument(
+        "--history-files",
+        type=int,
+        default=10,
+        help="files added by each seeded locker history commit",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=1, help="plant --workers for cli scenarios"
+    )
+    parser.add_argument("--output", help="path to write results to as JSON")
+    parser.add_argument("--baseline", help="path to baseline results to compare to")
+    parser.add_argument("--save-baseline", help="path to save results as a baseline")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.2,
+        help="files/sec drop from the baseline reported as a regression",
+    )
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--workspace", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def git(*args, cwd=None, stdin=None):
+    """Run a git command."""
+    subprocess.run(  # nosec B603 B607: fixed git commands.
+        ["git", *args], cwd=cwd, input=stdin, check=True, capture_output=True
+    )
+
+
+def seed_locker(path, commits, files_per_commit, categories):
+    """Create a bare locker repository with a synthetic history."""
+    git("init", "--bare", "--initial-branch=master", path)
+    git("config", "uploadpack.allowFilter", "true", cwd=path)
+    stream = []
+    now = int(time.time()) - commits
+    committer = f"committer {USER['name']} <{USER['email']}>"
+    for commit in range(commits):
+        message = f"Seed commit {commit}".encode()
+        stream.append(b"commit refs/heads/master\n")
+        stream.append(f"{committer} {now + commit} +0000\n".encode())
+        stream.append(b"data %d\n%s\n" % (len(message), message))
+        for i in range(files_per_commit):
+            category = f"seed_{(commit + i) % max(categories, 1)}"
+            content = json.dumps({"commit": commit, "file": i}).encode()
+            stream.append(
+                f"M 100644 inline external/{category}/seed_{commit}_{i}.json\n".encode()
+            )
+            stream.append(b"data %d\n%s\n" % (len(content), content))
+    if not commits:
+        return
+    git("fast-import", "--quiet", cwd=path, stdin=b"".join(stream))
+
+
+def create_evidence(path, files, categories, size):
+    """Create evidence files and a JSON Lines plant config for them."""
+    os.makedirs(path)
+    config = os.path.join(path, "config.jsonl")
+    block = (b"0123456789abcdef" * (size // 16 + 1))[:size]
+    with open(config, "w") as cfg:
+        for i in range(files):
+            file_path = os.path.join(path, f"evidence_{i}.json")
+            with open(file_path, "wb") as f:
+                f.write(b"%d" % i + block[len(b"%d" % i) :])
+            detail = {"path": file_path, "category": f"bench_{i % categories}"}
+            cfg.write(json.dumps(detail) + "\n")
+    return config
+
+
+def prepare(args, scenario, root):
+    """Create the workspace of a scenario."""
+    workspace = os.path.join(root, scenario)
+    os.makedirs(workspace)
+    seed_locker(
+        os.path.join(workspace, "remote.git"),
+        args.history,
+        args.history_files,
+        args.categories,
+    )
+    create_evidence(
+        os.path.join(workspace, "evidence"),
+        args.files,
+        args.categories,
+        args.file_size,
+    )
+    with open(os.path.join(workspace, "gitconfig"), "w") as f:
+        f.write(
+            f"[user]\n\tname = {USER['name']}\n\temail = {USER['email']}\n"
+            f'[url "file://{workspace}/remote.git"]\n\tinsteadOf = {LOCKER_URL}\n'
+        )
+    open(os.path.join(workspace, "creds.ini"), "w").close()
+    os.makedirs(os.path.join(workspace, "tmp"))
+    return workspace
+
+
+def run_locker(args, workspace):
+    """Plant through PlantLocker directly."""
+    from compliance.evidence import ExternalEvidence
+
+    from plant.locker import PlantLocker
+    from plant.manifest import Manifest
+    from plant.report import RunReport
+
+    report = RunReport()
+    with PlantLocker(
+        name="locker",
+        repo_url=f"file://{workspace}/remote.git",
+        do_push=True,
+        gitconfig={"user": USER},
+        repo_path=os.path.join(workspace, "tmp", "locker"),
+        batch_index=True,
+        report=report,
+    ) as locker:
+        manifest = Manifest(os.path.join(workspace, "evidence", "config.jsonl"))
+        for path, details in manifest:
+            evidence = ExternalEvidence(os.path.basename(path), details["category"])
+            locker.plant(evidence, path)
+    return report.as_dict()["phases"]
+
+
+def run_cli(args, workspace, options=()):
+    """Plant through the plant CLI entry point."""
+    from plant.cli import run
+
+    report_file = os.path.join(workspace, "report.json")
+    sys.argv = [
+        "plant",
+        "push-remote",
+        LOCKER_URL,
+        "--creds",
+        os.path.join(workspace, "creds.ini"),
+        "--config-file",
+        os.path.join(workspace, "evidence", "config.jsonl"),
+        "--git-config",
+        json.dumps({"user": USER}),
+        "--workers",
+        str(args.workers),
+        "--report",
+        "json",
+        "--report-file",
+        report_file,
+    ]
+    sys.argv.extend(options)
+    with open(os.devnull, "w") as devnull:
+        stdout, sys.stdout = sys.stdout, devnull
+        try:
+            run()
+        except SystemExit as e:
+            if e.code:
+                raise RuntimeError(f"plant exited with {e.code}")
+        finally:
+            sys.stdout = stdout
+    with open(report_file) as f:
+        return json.load(f)["lockers"][0]["phases"]
+
+
+def child(args):
+    """Run a scenario in the current process and print its results."""
+    workspace = args.workspace
+    os.environ["GIT_CONFIG_GLOBAL"] = os.path.join(workspace, "gitconfig")
+    os.environ["TMPDIR"] = os.path.join(workspace, "tmp")
+    tempfile.tempdir = None
+    start = time.perf_counter()
+    if args.child == "locker":
+        phases = run_locker(args, workspace)
+    else:
+        phases = run_cli(args, workspace, CLI_OPTIONS[args.child])
+    seconds = time.perf_counter() - start
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        peak_rss //= 1024
+    result = {
+        "scenario": args.child,
+        "files": args.files,
+        "categories": args.categories,
+        "history": args.history,
+        "seconds": round(seconds, 6),
+        "files_per_sec": round(args.files / seconds, 3),
+        "peak_rss_kb": peak_rss,
+        "phases": {name: round(p["seconds"], 6) for name, p in phases.items()},
+    }
+    print(json.dumps(result))
+
+
+def run_scenario(args, scenario, root):
+    """Run a scenario in a child process and provide its results."""
+    workspace = prepare(args, scenario, root)
+    cmd = [sys.executable, os.path.abspath(__file__), "--child", scenario]
+    cmd += ["--workspace", workspace]
+    for opt in ["files", "categories", "history", "workers"]:
+        cmd += [f"--{opt}", str(getattr(args, opt))]
+    env = dict(os.environ)
+    repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env["PYTHONPATH"] = os.pathsep.join(
+        p for p in [repo_root, env.get("PYTHONPATH")] if p
+    )
+    proc = subprocess.run(  # nosec B603: runs this script.
+        cmd, env=env, capture_output=True, text=True
+    )
+    if proc.returncode:
+        raise RuntimeError(f"{scenario} scenario failed:\n{proc.stderr}{proc.stdout}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def compare(results, baseline, threshold):
+    """Compare results to baseline results and report regressions."""
+    baseline = {r["scenario"]: r for r in baseline}
+    regressions = []
+    print(f"\n{'scenario':<12} {'files/sec':>10} {'baseline':>10} {'change':>8}")
+    for result in results:
+        base = baseline.get(result["scenario"])
+        if not base:
+            print(f"{result['scenario']:<12} {result['files_per_sec']:>10.1f}")
+            continue
+        change = result["files_per_sec"] / base["files_per_sec"] - 1
+        print(
+            f"{result['scenario']:<12} {result['files_per_sec']:>10.1f} "
+            f"{base['files_per_sec']:>10.1f} {change:>+8.1%}"
+        )
+        if change < -threshold:
+            regressions.append(result["scenario"])
+    return regressions
+
+
+def main(argv=None):
+    """Run the plant benchmarks."""
+    args = parse_args(argv)
+    if args.child:
+        child(args)
+        return 0
+    results = []
+    with tempfile.TemporaryDirectory(prefix="plant-bench-") as root:
+        for scenario in args.scenario or SCENARIOS:
+            result = run_scenario(args, scenario, root)
+            results.append(result)
+            phases = ", ".join(f"{k} {v:.3f}s" for k, v in result["phases"].items())
+            print(
+                f"{scenario}: {result['files']} files in {result['seconds']:.3f}s "
+                f"({result['files_per_sec']:.1f} files/sec), "
+                f"peak RSS {result['peak_rss_kb']} KB - {phases}"
+            )
+    for path in [args.output, args.save_baseline]:
+        if path:
+            with open(path, "w") as f:
+                json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print(f"\nRegressions found: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -13,4 +13,4 @@
 # limitations under the License.
 """The Auditree tool for adding evidence to an evidence locker."""
 
-__version__ = "1.0.0"
+__version__ = "1.1.0"
@@ -0,0 +1,296 @@
+# Copyright (c) 2020 IBM Corp. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Plant large evidence blob stores."""
+
+import importlib.util
+import json
+import os
+import shutil
+import uuid
+from abc import ABC, abstractmethod
+from pathlib import Path
+from urllib.parse import urlparse
+
+from plant.utils import CHUNK_SIZE
+
+POINTER_FORMAT = "auditree-plant-blob/v1"
+BLOB_KEYS = ("blob_location", "original_size", "original_digest")
+
+
+class BlobStore(ABC):
+    """
+    A content addressed store for evidence too large to commit.
+
+    Blobs are keyed by the SHA-256 digest of their content, so a blob is
+    only stored once however many times, and into however many lockers, it
+    is planted.  Planting only checks for and stores blobs, ``open`` is the
+    reader API for downstream checks that read evidence stored in a blob
+    store.
+    """
+
+    url = None
+
+    def get_key(self, digest):
+        """
+        Provide the store key of a blob.
+
+        :param digest: the hexadecimal SHA-256 digest of the blob content.
+
+        :returns: the blob key, relative to the store root.
+        """
+        return f"sha256/{digest[:2]}/{digest}"
+
+    def get_location(self, digest):
+        """
+        Provide the location of a blob, recorded in pointer files.
+
+        :param digest: the hexadecimal SHA-256 digest of the blob content.
+
+        :returns: the blob URL.
+        """
+        return f"{self.url.rstrip('/')}/{self.get_key(digest)}"
+
+    @abstractmethod
+    def exists(self, digest):
+        """Check whether a blob is stored."""
+
+    @abstractmethod
+    def put(self, source, digest):
+        """Store a file as a blob unless it is stored already."""
+
+    @abstractmethod
+    def open(self, digest):
+        """Open a stored blob for reading."""
+
+
+class LocalBlobStore(BlobStore):
+    """A blob store kept in a local or mounted directory."""
+
+    def __init__(self, path):
+        """
+        Construct and initialize the local blob store object.
+
+        :param path: the path to the blob store directory.
+        """
+        self.path = os.path.abspath(os.path.expanduser(path))
+        self.url = Path(self.path).as_uri()
+
+    def exists(self, digest):
+        """
+        Check whether a blob is stored.
+
+        :param digest: the hexadecimal SHA-256 digest of the blob content.
+
+        :returns: True if the blob is stored.
+        """
+        return os.path.isfile(os.path.join(self.path, self.get_key(digest)))
+
+    def put(self, source, digest):
+        """
+        Store a file as a blob unless it is stored already.
+
+        The blob is written next to its final location and renamed into
+        place, so a partially written blob is never seen.
+
+        :param source: the path to the file to store.
+        :param digest: the hexadecimal SHA-256 digest of the file content.
+
+        :returns: the blob location.
+        """
+        target = os.path.join(self.path, self.get_key(digest))
+        if not os.path.isfile(target):
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            tmp = f"{target}.{uuid.uuid4().hex}.tmp"
+            try:
+                with open(source, "rb") as fsrc, open(tmp, "wb") as fdst:
+                    shutil.copyfileobj(fsrc, fdst, CHUNK_SIZE)
+                os.replace(tmp, target)
+            finally:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+        return self.get_location(digest)
+
+    def open(self, digest):
+        """
+        Open a stored blob for reading.
+
+        :param digest: the hexadecimal SHA-256 digest of the blob content.
+
+        :returns: a binary file object.
+        """
+        return open(os.path.join(self.path, self.get_key(digest)), "rb")
+
+
+class S3BlobStore(BlobStore):
+    """A blob store kept in an S3 compatible object store bucket."""
+
+    def __init__(self, bucket, prefix="", endpoint_url=None, client=None):
+        """
+        Construct and initialize the S3 blob store object.
+
+        Credentials are found by boto3 as usual, from the environment or
+        the AWS configuration files.
+
+        :param bucket: the bucket name.
+        :param prefix: the key prefix blobs are stored under.
+        :param endpoint_url: the URL of an S3 compatible endpoint, defaults
+          to AWS S3.
+        :param client: the S3 client to use instead of a boto3 client.
+        """
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+        self.url = f"s3://{bucket}/{self.prefix}".rstrip("/")
+        if client is None:
+            import boto3
+
+            client = boto3.client("s3", endpoint_url=endpoint_url)
+        self.client = client
+
+    def get_key(self, digest):
+        """
+        Provide the object key of a blob.
+
+        :param digest: the hexadecimal SHA-256 digest of the blob content.
+
+        :returns: the object key, including the store prefix.
+        """
+        key = super().get_key(digest)
+        return f"{self.prefix}/{key}" if self.prefix else key
+
+    def get_location(self, digest):
+        """
+        Provide the location of a blob, recorded in pointer files.
+
+        :param digest: the hexadecimal SHA-256 digest of the blob content.
+
+        :returns: the blob URL.
+        """
+        return f"s3://{self.bucket}/{self.get_key(digest)}"
+
+    def exists(self, digest):
+        """
+        Check whether a blob is stored.
+
+        :param digest: the hexadecimal SHA-256 digest of the blob content.
+
+        :returns: True if the blob is stored.
+        """
+        key = self.get_key(digest)
+        response = self.client.list_objects_v2(
+            Bucket=self.bucket, Prefix=key, MaxKeys=1
+        )
+        return any(obj["Key"] == key for obj in response.get("Contents", []))
+
+    def put(self, source, digest):
+        """
+        Store a file as a blob unless it is stored already.
+
+        Large files are uploaded in parts, without being loaded into memory.
+
+        :param source: the path to the file to store.
+        :param digest: the hexadecimal SHA-256 digest of the file content.
+
+        :returns: the blob location.
+        """
+        if not self.exists(digest):
+            self.client.upload_file(source, self.bucket, self.get_key(digest))
+        return self.get_location(digest)
+
+    def open(self, digest):
+        """
+        Open a stored blob for reading.
+
+        :param digest: the hexadecimal SHA-256 digest of the blob content.
+
+        :returns: a binary streaming body.
+        """
+        response = self.client.get_object(Bucket=self.bucket, Key=self.get_key(digest))
+        return response["Body"]
+
+
+def get_blob_store(url, endpoint_url=None):
+    """
+    Provide the blob store for a blob store URL.
+
+    :param url: an ``s3://bucket/prefix`` URL or a local directory path.
+    :param endpoint_url: the URL of an S3 compatible endpoint.
+
+    :returns: the blob store object.
+    """
+    parsed = urlparse(url)
+    if parsed.scheme == "s3":
+        return S3BlobStore(parsed.netloc, parsed.path, endpoint_url)
+    if parsed.scheme == "file":
+        return LocalBlobStore(parsed.path)
+    return LocalBlobStore(url)
+
+
+def get_blob_store_error(url):
+    """
+    Check that a blob store URL can be used.
+
+    :param url: the blob store URL.
+
+    :returns: an error message if the store cannot be used, otherwise None.
+    """
+    parsed = urlparse(url)
+    if parsed.scheme == "s3":
+        if not parsed.netloc:
+            return "S3 blob store URLs must be of the form s3://bucket/prefix"
+        if importlib.util.find_spec("boto3") is None:
+            return "S3 blob stores require auditree-plant[s3] to be installed"
+    elif parsed.scheme not in ("", "file"):
+        return f"Unsupported blob store URL {url}"
+
+
+def format_pointer(digest, size, location):
+    """
+    Provide the content of the pointer file committed for a stored blob.
+
+    :param digest: the hexadecimal SHA-256 digest of the blob content.
+    :param size: the blob size in bytes.
+    :param location: the blob location.
+
+    :returns: the pointer file content.
+    """
+    pointer = {
+        "pointer": POINTER_FORMAT,
+        "digest": f"sha256:{digest}",
+        "size": size,
+        "location": location,
+    }
+    return json.dumps(pointer, indent=2, sort_keys=True) + "\n"
+
+
+def read_pointer(path):
+    """
+    Read an evidence pointer file.
+
+    This is the reader API for downstream checks, used with ``open`` of the
+    blob store of the pointer ``location`` to read evidence stored in a blob
+    store.
+
+    :param path: the path to the evidence file.
+
+    :returns: the pointer details, or None if the file is not a pointer file.
+    """
+    with open(path, "rb") as f:
+        content = f.read(4096)
+    try:
+        pointer = json.loads(content)
+    except ValueError:
+        return None
+    if not isinstance(pointer, dict) or pointer.get("pointer") != POINTER_FORMAT:
+        return None
+    return pointer
@@ -13,20 +13,54 @@
 # limitations under the License.
 """Plant command line interface."""
 
+import hashlib
 import json
 import os
 import shutil
+import signal
+import subprocess  # nosec B404: starts background spool flushes.
+import sys
 import tempfile
+import time
+from contextlib import ExitStack
+from functools import partial
+from itertools import islice
 from urllib.parse import urlparse
 
-from compliance.evidence import ExternalEvidence, YEAR
-from compliance.utils.credentials import Config
-from compliance.config import get_config
-
 from ilcli import Command
 
 from plant import __version__ as version
-from plant.locker import PlantLocker
+from plant.blobstore import get_blob_store, get_blob_store_error
+from plant.compression import CODECS, get_codec_error
+from plant.manifest import (
+    Manifest,
+    ManifestError,
+    expand,
+    preflight,
+    to_evidence,
+)
+from plant.progress import PlantProgress
+from plant.report import (
+    ADD,
+    METADATA,
+    PLANTED,
+    REFRESHED,
+    RESUMED,
+    RunReport,
+    SKIPPED,
+    UNCHANGED,
+    UPDATE,
+)
+from plant.spool import FLUSH_LOG, Spool
+from plant.utils import CHUNK_SIZE, batched, ordered_map
+
+BLOB_THRESHOLD = 100 * 1024 * 1024
+MAX_REQUEST_BYTES = 1024 * 1024
+
+
+def _get_preflight_error(checked):
+    problems = "\n".join(f"  {problem}" for problem in checked.problems)
+    return f"ERROR: Preflight found {len(checked.problems)} problems:\n{problems}"
 
 
 class _CorePlantCommand(Command):
@@ -35,25 +69,30 @@ class _CorePlantCommand(Command):
             "locker",
             help=(
                 "the URL to the evidence locker repository, "
-                "as an example https://github.com/my-org/my-repo"
+                "as an example https://github.com/my-org/my-repo - "
+                "multiple locker URLs can be provided"
             ),
+            nargs="*",
         )
         self.add_argument(
-            "--branch", help="Branch name for locker repository", default=False
-        )
-        self.add_argument(
-            "--creds",
-            metavar="~/path/creds",
-            help="the path to credentials file - defaults to %(default)s",
-            default="~/.credentials",
+            "--lockers-file",
+            help=(
+                "path to a file containing evidence locker URLs, one per line, "
+                "to plant evidence into in addition to any locker arguments"
+            ),
+            metavar="~/path/to/lockers_file.txt",
+            default=False,
         )
         self.add_argument(
             "--config",
             help=(
                 "JSON evidence-path/detail pairs needed to plant evidence.  "
-                "Evidence path must be the absolute path to the file.  The "
-                "detail is a dictionary of category, ttl, and description.  "
-                "Only the category is required."
+                "Evidence path must be the absolute path to the file, or to a "
+                "directory or a glob pattern of files sharing the same detail.  "
+                "The detail is a dictionary of category, ttl, and description.  "
+                "Only the category is required.  Directory and glob pattern "
+                "details can also include include/exclude file name patterns, "
+                "recursive and subdir_category."
             ),
             type=json.loads,
             metavar=(
@@ -64,10 +103,46 @@ class _CorePlantCommand(Command):
         )
         self.add_argument(
             "--config-file",
-            help="path to a file containing the files (with config) to plant",
+            help=(
+                "path to a file containing the files (with config) to plant - "
+                "files with a .jsonl or .ndjson extension are read as JSON Lines, "
+                "one evidence path/detail pair per line, and planted while read"
+            ),
             metavar="~/path/to/config_file.json",
             default=False,
         )
+        self.add_argument(
+            "--skip-preflight",
+            help=(
+                "plant without first checking every evidence file and its "
+                "details before the locker is cloned - checks read the whole "
+                "config file, skip them to plant a large JSON Lines config "
+                "file with a flat memory footprint"
+            ),
+            action="store_true",
+        )
+        self._init_plant_arguments()
+
+    def _init_plant_arguments(self):
+        self.add_argument(
+            "--locker-workers",
+            help=(
+                "the number of lockers planted into concurrently when "
+                "multiple lockers are provided - defaults to %(default)s"
+            ),
+            metavar="N",
+            type=int,
+            default=4,
+        )
+        self.add_argument(
+            "--branch", help="Branch name for locker repository", default=False
+        )
+        self.add_argument(
+            "--creds",
+            metavar="~/path/creds",
+            help="the path to credentials file - defaults to %(default)s",
+            default="~/.credentials",
+        )
         self.add_argument(
             "--git-config",
             help="JSON git configuration for signing commits",
@@ -95,81 +170,584 @@ class _CorePlantCommand(Command):
             metavar="~/path/evidence-locker",
             default=None,
         )
+        self.add_argument(
+            "--resume",
+            help=(
+                "resume an interrupted run using the journal kept in the "
+                "--repo-path locker - only evidence the interrupted run did "
+                "not complete is planted"
+            ),
+            action="store_true",
+        )
+        self.add_argument(
+            "--cache-dir",
+            help=(
+                "the operating system location of a directory used to keep "
+                "a persistent clone per locker and branch - cached clones are "
+                "synced with the remote rather than cloned on every run"
+            ),
+            metavar="~/path/plant-cache",
+            default=None,
+        )
+        self.add_argument(
+            "--sparse",
+            help=(
+                "clone the locker shallow, without file content and with a "
+                "sparse checkout of only the external evidence categories "
+                "being planted"
+            ),
+            action="store_true",
+        )
+        self.add_argument(
+            "--direct",
+            help=(
+                "write evidence straight into git objects of a sparse locker "
+                "clone instead of writing evidence files to the local locker "
+                "and adding them to git"
+            ),
+            action="store_true",
+        )
+        self.add_argument(
+            "--refresh-ttl",
+            help=(
+                "refresh the metadata (last update) of evidence whose content "
+                "is unchanged - unchanged evidence is skipped otherwise"
+            ),
+            action="store_true",
+        )
+        self.add_argument(
+            "--push-retries",
+            help=(
+                "the number of times a push rejected because of concurrent "
+                "changes to the remote locker is retried - defaults to "
+                "%(default)s"
+            ),
+            metavar="N",
+            type=int,
+            default=3,
+        )
+        self.add_argument(
+            "--commit-batch-size",
+            help=(
+                "commit planted evidence to the local locker every N config "
+                "entries rather than in a single commit"
+            ),
+            metavar="N",
+            type=int,
+            default=0,
+        )
+        self.add_argument(
+            "--commit-batch-bytes",
+            help=(
+                "commit planted evidence to the local locker every time the "
+                "evidence files of the batch add up to BYTES"
+            ),
+            metavar="BYTES",
+            type=int,
+            default=0,
+        )
+        self.add_argument(
+            "--push-batches",
+            help="push each commit batch to the remote locker as it is committed",
+            action="store_true",
+        )
+        self.add_argument(
+            "--background-push",
+            help=(
+                "push commit batches in the background while later batches "
+                "are planted - requires --push-batches"
+            ),
+            action="store_true",
+        )
+        self.add_argument(
+            "--progress-file",
+            help=(
+                "path to a file recording the config entries pushed in batches "
+                "- an interrupted run started again with the same progress "
+                "file and config resumes after the last pushed batch"
+            ),
+            metavar="~/path/to/progress.json",
+            default=None,
+        )
+        self.add_argument(
+            "--report",
+            help=(
+                "provide a machine readable run report with time, file and "
+                "byte counts per run phase and per evidence"
+            ),
+            choices=["json"],
+            default=None,
+        )
+        self.add_argument(
+            "--report-file",
+            help=(
+                "path to a file to write the run report to instead of stdout, "
+                "other output goes to stderr when the report goes to stdout"
+            ),
+            metavar="~/path/to/report.json",
+            default=None,
+        )
+        self.add_argument(
+            "--profile",
+            help="path to a file to write cProfile stats for the run to",
+            metavar="~/path/to/plant.prof",
+            default=None,
+        )
+        self.add_argument(
+            "--workers",
+            help=(
+                "the number of threads used to validate evidence files and "
+                "copy them into the local locker - defaults to %(default)s"
+            ),
+            metavar="N",
+            type=int,
+            default=1,
+        )
+        self.add_argument(
+            "--link",
+            help=(
+                "hard link evidence files into the local locker instead of "
+                "copying them when both are on the same file system"
+            ),
+            action="store_true",
+        )
+        self.add_argument(
+            "--compress",
+            help=(
+                "compress evidence files with the codec provided unless their "
+                "config sets compress - zstd requires auditree-plant[zstd]"
+            ),
+            choices=CODECS,
+            default=None,
+        )
+        self.add_argument(
+            "--blob-store",
+            help=(
+                "store evidence files larger than --blob-threshold in this blob "
+                "store, a directory or an s3://bucket/prefix URL, and commit a "
+                "pointer file in their place - s3 requires auditree-plant[s3]"
+            ),
+            metavar="~/path/plant-blobs",
+            default=None,
+        )
+        self.add_argument(
+            "--blob-store-endpoint",
+            help="the URL of an S3 compatible endpoint for an s3 blob store",
+            metavar="https://s3.example.com",
+            default=None,
+        )
+        self.add_argument(
+            "--blob-threshold",
+            help=(
+                "the size in bytes above which evidence files are stored in the "
+                "blob store - defaults to %(default)s"
+            ),
+            metavar="BYTES",
+            type=int,
+            default=BLOB_THRESHOLD,
+        )
 
     def _validate_arguments(self, args):
-        parsed = urlparse(args.locker)
-        if not (parsed.scheme and parsed.hostname and parsed.path):
-            return "ERROR: locker url must be of the form " "https://hostname/org/repo"
+        if args.lockers_file:
+            if not os.path.isfile(os.path.expanduser(args.lockers_file)):
+                return f"ERROR: Lockers file {args.lockers_file} not found."
+        lockers = self._get_lockers(args)
+        if not lockers:
+            return "ERROR: Provide at least one locker or a --lockers-file."
+        for locker in lockers:
+            parsed = urlparse(locker)
+            if not (parsed.scheme and parsed.hostname and parsed.path):
+                return (
+                    "ERROR: locker url must be of the form " "https://hostname/org/repo"
+                )
         if bool(args.config) == bool(args.config_file):
             return "ERROR: Provide either a --config or a --config-file."
+        return self._validate_plant_arguments(args, lockers)
+
+    def _validate_plant_arguments(self, args, lockers):
         if args.git_config and args.git_config_file:
             return "ERROR: Provide either a --git-config or a --git-config-file."
+        if args.repo_path and args.cache_dir:
+            return "ERROR: Provide either a --repo-path or a --cache-dir."
+        if args.repo_path and args.sparse:
+            return "ERROR: --sparse cannot be used with --repo-path."
+        if args.repo_path and args.direct:
+            return "ERROR: --direct cannot be used with --repo-path."
+        if args.link and args.direct:
+            return "ERROR: --link cannot be used with --direct."
+        if args.resume and not args.repo_path:
+            return "ERROR: --resume requires --repo-path."
+        if args.repo_path and len(lockers) > 1:
+            return "ERROR: --repo-path cannot be used with multiple lockers."
+        if args.workers < 1:
+            return "ERROR: --workers must be a positive integer."
+        if args.locker_workers < 1:
+            return "ERROR: --locker-workers must be a positive integer."
+        if args.report_file and not args.report:
+            return "ERROR: --report-file requires --report."
+        if args.compress and get_codec_error(args.compress):
+            return f"ERROR: {get_codec_error(args.compress)}."
+        if args.blob_store and get_blob_store_error(args.blob_store):
+            return f"ERROR: {get_blob_store_error(args.blob_store)}."
+        if args.blob_threshold < 0:
+            return "ERROR: --blob-threshold must not be negative."
+        if args.push_retries < 0:
+            return "ERROR: --push-retries must not be negative."
+        if args.commit_batch_size < 0 or args.commit_batch_bytes < 0:
+            return "ERROR: Commit batch sizes must not be negative."
+        batches = args.commit_batch_size or args.commit_batch_bytes
+        if args.push_batches and not batches:
+            return "ERROR: --push-batches requires a commit batch size."
+        if args.background_push and not args.push_batches:
+            return "ERROR: --background-push requires --push-batches."
+        if args.progress_file and not args.push_batches:
+            return "ERROR: --progress-file requires --push-batches."
 
     def _run(self, args):
+        if not (args.report and not args.report_file):
+            return self._run_profiled(args)
+        # The run report is the only output to stdout, so it can be parsed.
+        self._report_out, self._out = self._out, self._err
+        try:
+            return self._run_profiled(args)
+        finally:
+            self._out = self._report_out
+
+    def _run_profiled(self, args):
+        if not args.profile:
+            return self._run_plant(args)
+        import cProfile
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            return self._run_plant(args)
+        finally:
+            profiler.disable()
+            profiler.dump_stats(os.path.expanduser(args.profile))
+
+    def _run_plant(self, args):
+        start = time.perf_counter()
         self.out(self.intro_msg)
-        gitconfig = None
+        files = args.config.items() if args.config else Manifest(args.config_file)
+        checked = None
+        if not args.skip_preflight:
+            checked = self._preflight(files, args.workers)
+            if checked.problems:
+                return _get_preflight_error(checked)
+        gitconfig = self._get_gitconfig(args)
+        progress = None
+        if args.progress_file and self.push:
+            progress = PlantProgress(args.progress_file, self._get_config_digest(args))
+            if progress.discarded:
+                self.out("Progress file is for another config, starting over...")
+        plants = {repo: files for repo in self._get_lockers(args)}
+        try:
+            results = self._plant_lockers(args, gitconfig, plants, progress)
+        except ManifestError as e:
+            return f"ERROR: {e}"
+        self.out(self.outro_msg)
+        if args.report:
+            seconds = time.perf_counter() - start
+            self._write_report(args, results, seconds, checked)
+        if any(error for _, _, error in results):
+            return 1
+
+    def _preflight(self, files, workers=1):
+        start = time.perf_counter()
+        checked = preflight(files, workers)
+        seconds = time.perf_counter() - start
+        self.out(
+            f"Preflight checked {checked.files} evidence files, "
+            f"{checked.bytes} bytes, in {seconds:.3f}s..."
+        )
+        return checked
+
+    def _plant_lockers(self, args, gitconfig, plants, progress=None):
+        if len(plants) == 1:
+            ((repo, files),) = plants.items()
+            report = RunReport(evidence=bool(args.report))
+            self._plant(repo, args, gitconfig, files, report, progress)
+            return [(repo, report, None)]
+        plant = partial(
+            self._plant_safely, args=args, gitconfig=gitconfig, progress=progress
+        )
+        results = list(ordered_map(plant, plants.items(), args.locker_workers))
+        self.out("\nLocker results:")
+        for repo, report, error in results:
+            if error:
+                self.out(f"  {repo}: FAILED - {error}")
+            else:
+                self.out(f"  {repo}: {self._get_summary(report)}")
+        return results
+
+    def _get_gitconfig(self, args):
+        self._set_branch(args)
         if args.git_config or args.git_config_file:
-            gitconfig = args.git_config or json.loads(open(args.git_config_file).read())
+            return args.git_config or json.loads(open(args.git_config_file).read())
+
+    def _set_branch(self, args):
+        from compliance.config import get_config
+
         if args.branch:
             c = get_config()
             c.load()
             c.raw_config["locker"]["default_branch"] = args.branch
-        # self.name drives the Locker push mode.
-        #   - dry-run translates to locker no-push mode
-        #   - push-remote translates to locker full-remote mode
-        locker_args = [args.locker, args.creds, self.name, gitconfig, args.repo_path]
-        files = args.config
-        if not files:
-            files = json.loads(open(args.config_file).read())
-        with self._get_locker(*locker_args) as locker:
-            self.out(f"Local locker location is {locker.local_path}")
-            for file_path, details in files.items():
-                evidence = ExternalEvidence(
-                    file_path.rsplit("/", 1).pop(),
-                    details["category"],
-                    details.get("ttl", YEAR),
-                    details.get("description", ""),
-                )
-                evidence.set_content(open(file_path).read())
-                locker.add_evidence(evidence)
-                self.out(
-                    f"\nEvidence {file_path} added to "
-                    f'external/{details["category"]}, metadata applied...'
-                )
-        self.out(self.outro_msg)
 
-    def _get_locker(self, repo, creds, mode, gitconfig=None, repo_path=None):
+    def _write_report(self, args, results, seconds, checked=None):
+        report = {
+            "version": version,
+            "mode": self.name,
+            "seconds": round(seconds, 6),
+            "lockers": [
+                dict(locker=repo, error=error, **report.as_dict())
+                for repo, report, error in results
+            ],
+        }
+        if checked:
+            report["preflight"] = {"files": checked.files, "bytes": checked.bytes}
+        content = json.dumps(report, indent=2)
+        if not args.report_file:
+            self._report_out.write(f"{content}\n")
+            self._report_out.flush()
+            return
+        with open(os.path.expanduser(args.report_file), "w") as f:
+            f.write(content)
+        self.out(f"Run report written to {args.report_file}")
+
+    def _get_summary(self, report):
+        summary = (
+            f"planted {report.counts.get(PLANTED, 0)}, "
+            f"refreshed {report.counts.get(REFRESHED, 0)}"
+        )
+        if report.counts.get(RESUMED):
+            summary += (
+                f", skipped {report.counts.get(SKIPPED, 0)} "
+                f"and resumed {report.counts[RESUMED]}"
+            )
+        else:
+            summary += f" and skipped {report.counts.get(SKIPPED, 0)}"
+        return summary
+
+    def _get_push_msg(self, push):
+        msg = f"Pushed {push['files']} objects, {push['bytes']} bytes"
+        if push["seconds"]:
+            rate = push["bytes"] / push["seconds"] / 1024**2
+            msg += f" in {push['seconds']:.3f}s ({rate:.2f} MiB/s)"
+        return f"{msg}..."
+
+    def _get_lockers(self, args):
+        lockers = list(args.locker)
+        if args.lockers_file:
+            with open(os.path.expanduser(args.lockers_file)) as f:
+                for line in f:
+                    line = line.strip()
+                    if line and not line.startswith("#"):
+                        lockers.append(line)
+        return list(dict.fromkeys(lockers))
+
+    def _plant_safely(self, plant, args, gitconfig, progress=None):
+        repo, files = plant
+        report = RunReport(evidence=bool(args.report))
+        try:
+            self._plant(repo, args, gitconfig, files, report, progress, True)
+            return repo, report, None
+        except Exception as e:
+            return repo, report, f"{e.__class__.__name__}: {e}"
+
+    def _plant(
+        self, repo, args, gitconfig, files, report, progress=None, multiple=False
+    ):
+        out = self._get_locker_out(repo) if multiple else self.out
+        entries = expand(files)
+        done = 0
+        if progress:
+            done = progress.get(self._get_locker_dir_name(repo))
+            if done:
+                out(f"Resuming after {done} config entries already pushed...")
+                entries = islice(entries, done, None)
+        batches = [entries]
+        batching = bool(args.commit_batch_size or args.commit_batch_bytes)
+        if batching:
+            batches = batched(
+                entries,
+                args.commit_batch_size,
+                args.commit_batch_bytes,
+                lambda entry: os.path.getsize(entry[0]),
+            )
+        with self._get_locker(repo, args, gitconfig, report, out, multiple) as locker:
+            out(f"Local locker location is {locker.local_path}")
+            write = partial(self._write_evidence, locker, args.link, args.compress)
+            with report.phase("plant"):
+                for batch_number, batch in enumerate(batches, 1):
+                    for file_path, details, evidence, written in ordered_map(
+                        write, batch, args.workers
+                    ):
+                        status = locker.index_evidence(
+                            evidence, written, args.refresh_ttl
+                        )
+                        msg = self._get_status_msg(status, details["category"])
+                        out(f"\nEvidence {file_path} {msg}")
+                        done += 1
+                    if not batching:
+                        continue
+                    pushed = None
+                    if progress:
+                        pushed = partial(
+                            progress.record, self._get_locker_dir_name(repo), done
+                        )
+                    locker.checkin_batch(push=args.push_batches, pushed=pushed)
+                    out(f"\nBatch {batch_number} committed, {done} config entries...")
+            out(f"\n{self._get_summary(report).capitalize()} evidence files...")
+        push = report.phases.get("push")
+        if push and push["files"]:
+            out(f"\n{self._get_push_msg(push)}")
+        if progress:
+            progress.clear(self._get_locker_dir_name(repo))
+
+    def _get_status_msg(self, status, category):
+        if status == PLANTED:
+            return f"added to external/{category}, metadata applied..."
+        if status == REFRESHED:
+            return f"unchanged in external/{category}, metadata refreshed..."
+        if status == RESUMED:
+            return f"already planted in external/{category} by the resumed run..."
+        return f"unchanged in external/{category}, skipped..."
+
+    def _write_evidence(self, locker, link, compress, item):
+        file_path, details = item
+        evidence = to_evidence(file_path, details)
+        written = locker.write_evidence_file(
+            evidence,
+            file_path,
+            link,
+            skip_unchanged=True,
+            compress=details.get("compress", compress) or None,
+        )
+        return file_path, details, evidence, written
+
+    def _get_locker(
+        self, repo, args, gitconfig=None, report=None, out=None, unique=False
+    ):
+        from compliance.utils.credentials import Config
+
+        from plant.locker import PlantLocker
+
+        out = out or self.out
         locker_name = "plant"
+        repo_path = args.repo_path
+        cached = False
+        if unique:
+            locker_name = f"plant-{self._get_locker_dir_name(repo)}"
         if repo_path:
             locker_name = repo_path.rsplit("/", 1).pop()
+        elif args.cache_dir:
+            # GitPython runs git in the locker, relative paths would break.
+            cache_dir = os.path.abspath(os.path.expanduser(args.cache_dir))
+            # Clones of different checkout modes are cached separately.
+            mode = "direct" if args.direct else "sparse" if args.sparse else None
+            repo_path = os.path.join(cache_dir, self._get_locker_dir_name(repo, mode))
+            locker_name = repo_path.rsplit("/", 1).pop()
+            cached = True
+            out(f"Using locker cache {repo_path}...")
         else:
             local_locker_path = f"{tempfile.gettempdir()}/{locker_name}"
             if os.path.isdir(local_locker_path):
-                self.out("Local locker found...")
-                self._remove_locker(local_locker_path)
-            self.out(
+                out("Local locker found...")
+                self._remove_locker(local_locker_path, out)
+            out(
                 f"Cloning local locker for {repo}.  Depending on the "
                 "size of your locker, this may take a while..."
             )
+        # self.push drives the Locker push mode.
+        #   - dry-run translates to locker no-push mode
+        #   - push-remote and flush translate to locker full-remote mode
         return PlantLocker(
             name=locker_name,
             repo_url=repo,
-            creds=Config(creds),
-            do_push=True if mode == "push-remote" else False,
+            creds=Config(args.creds),
+            do_push=self.push,
             gitconfig=gitconfig,
             repo_path=repo_path,
+            batch_index=True,
+            cached=cached,
+            sparse=args.sparse,
+            push_retries=args.push_retries,
+            report=report,
+            journal=bool(args.repo_path),
+            resume=args.resume,
+            blob_store=self._get_blob_store(args),
+            blob_threshold=args.blob_threshold,
+            direct=args.direct,
+            background_push=args.background_push,
         )
 
-    def _remove_locker(self, locker_path):
-        self.out("Removing local locker...")
+    def _get_blob_store(self, args):
+        if args.blob_store:
+            return get_blob_store(args.blob_store, args.blob_store_endpoint)
+
+    def _get_direct_locker(self, repo, args, gitconfig=None, **kwargs):
+        from compliance.utils.credentials import Config
+
+        from plant.locker import PlantLocker
+
+        # Direct clones are never shared with clones of other checkout modes.
+        locker_name = self._get_locker_dir_name(repo, "direct")
+        if args.cache_dir:
+            cache_dir = os.path.abspath(os.path.expanduser(args.cache_dir))
+            repo_path = os.path.join(cache_dir, locker_name)
+        else:
+            repo_path = os.path.join(tempfile.gettempdir(), f"plant-{locker_name}")
+            if os.path.isdir(repo_path):
+                shutil.rmtree(repo_path)
+        # Evidence is read from git objects, nothing is checked out.
+        return PlantLocker(
+            name=locker_name,
+            repo_url=repo,
+            creds=Config(args.creds),
+            gitconfig=gitconfig,
+            repo_path=repo_path,
+            cached=bool(args.cache_dir),
+            direct=True,
+            **kwargs,
+        )
+
+    def _get_config_digest(self, args):
+        digest = hashlib.sha256()
+        if args.config:
+            digest.update(json.dumps(args.config, sort_keys=True).encode())
+            return digest.hexdigest()
+        with open(os.path.expanduser(args.config_file), "rb") as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def _get_locker_out(self, repo):
+        prefix = f"[{self._get_locker_dir_name(repo)}]"
+        return lambda msg: self.out(f"{prefix} {msg.lstrip()}")
+
+    def _get_locker_dir_name(self, repo, mode=None):
+        from compliance.config import get_config
+
+        branch = get_config().get("locker.default_branch", default="master")
+        key = hashlib.sha256(f"{repo}#{branch}".encode()).hexdigest()[:16]
+        name = repo.rstrip("/").rsplit("/", 1).pop()
+        if mode:
+            return f"{name}-{key}-{mode}"
+        return f"{name}-{key}"
+
+    def _remove_locker(self, locker_path, out=None):
+        out = out or self.out
+        out("Removing local locker...")
         shutil.rmtree(locker_path)
-        self.out("Local locker has been removed...")
+        out("Local locker has been removed...")
 
 
 class DryRun(_CorePlantCommand):
     """Perform requested changes locally and show results of changes."""
 
     name = "dry-run"
+    push = False
     intro_msg = "This is a dry run.  Remote locker will not be updated..."
     outro_msg = "Remote locker was not updated..."
 
@@ -178,14 +756,871 @@ class PushToRemote(_CorePlantCommand):
     """Perform requested changes and push to the remote repository."""
 
     name = "push-remote"
+    push = True
     intro_msg = "This is an official run.  Remote locker will be updated..."
     outro_msg = "Remote locker was updated..."
 
 
+class Enqueue(Command):
+    """Add evidence to a spool directory to be planted by a later flush."""
+
+    name = "enqueue"
+
+    def _init_arguments(self):
+        self.add_argument(
+            "locker",
+            help=(
+                "the URL to the evidence locker repository to plant the "
+                "evidence into - multiple locker URLs can be provided"
+            ),
+            nargs="+",
+        )
+        self.add_argument(
+            "--spool-dir",
+            help="the operating system location of the spool directory",
+            metavar="~/path/plant-spool",
+            required=True,
+        )
+        self.add_argument(
+            "--config",
+            help=(
+                "JSON evidence-path/detail pairs, the same as the push-remote "
+                "--config option"
+            ),
+            type=json.loads,
+            metavar='\'{"/absolute/path/to/my/evidence.ext":{"category":"foo"}}\'',
+            default={},
+        )
+        self.add_argument(
+            "--config-file",
+            help=(
+                "path to a file containing the files (with config) to enqueue, "
+                "the same as the push-remote --config-file option"
+            ),
+            metavar="~/path/to/config_file.json",
+            default=False,
+        )
+        self.add_argument(
+            "--flush-count",
+            help="start a flush once the spool holds N evidence files",
+            metavar="N",
+            type=int,
+            default=0,
+        )
+        self.add_argument(
+            "--flush-bytes",
+            help="start a flush once the spooled evidence adds up to BYTES",
+            metavar="BYTES",
+            type=int,
+            default=0,
+        )
+        self.add_argument(
+            "--flush-age",
+            help=(
+                "start a flush once the oldest spooled evidence was enqueued "
+                "SECONDS ago"
+            ),
+            metavar="SECONDS",
+            type=float,
+            default=0,
+        )
+        self.add_argument(
+            "--creds",
+            metavar="~/path/creds",
+            help=(
+                "the path to credentials file used by a flush started by "
+                "enqueue - defaults to %(default)s"
+            ),
+            default="~/.credentials",
+        )
+        self.add_argument(
+            "--git-config-file",
+            help=(
+                "path to a file containing the git configuration used by a "
+                "flush started by enqueue"
+            ),
+            metavar="~/path/to/git_config_file.json",
+            default=False,
+        )
+        self.add_argument(
+            "--cache-dir",
+            help="the locker cache directory used by a flush started by enqueue",
+            metavar="~/path/plant-cache",
+            default=None,
+        )
+
+    def _validate_arguments(self, args):
+        for locker in args.locker:
+            parsed = urlparse(locker)
+            if not (parsed.scheme and parsed.hostname and parsed.path):
+                return (
+                    "ERROR: locker url must be of the form " "https://hostname/org/repo"
+                )
+        if bool(args.config) == bool(args.config_file):
+            return "ERROR: Provide either a --config or a --config-file."
+        if min(args.flush_count, args.flush_bytes, args.flush_age) < 0:
+            return "ERROR: Flush thresholds must not be negative."
+
+    def _run(self, args):
+        spool = Spool(args.spool_dir)
+        files = args.config.items() if args.config else Manifest(args.config_file)
+        checked = preflight(files)
+        if checked.problems:
+            return _get_preflight_error(checked)
+        entries = (
+            (repo, path, details)
+            for repo in dict.fromkeys(args.locker)
+            for path, details in expand(files)
+        )
+        try:
+            count = spool.enqueue(entries)
+        except (ManifestError, OSError) as e:
+            return f"ERROR: {e}"
+        self.out(f"Enqueued {count} evidence files into {args.spool_dir}...")
+        if spool.is_due(args.flush_count, args.flush_bytes, args.flush_age):
+            self.out("Spool flush threshold reached, flushing in the background...")
+            self._start_flush(args)
+
+    def _start_flush(self, args):
+        cmd = [sys.executable, "-m", "plant.cli", "flush"]
+        cmd += ["--spool-dir", args.spool_dir, "--creds", args.creds]
+        if args.git_config_file:
+            cmd += ["--git-config-file", args.git_config_file]
+        if args.cache_dir:
+            cmd += ["--cache-dir", args.cache_dir]
+        log_path = os.path.join(os.path.expanduser(args.spool_dir), FLUSH_LOG)
+        with open(log_path, "a") as log:
+            subprocess.Popen(  # nosec B603: runs plant itself.
+                cmd,
+                stdin=subprocess.DEVNULL,
+                stdout=log,
+                stderr=subprocess.STDOUT,
+                start_new_session=True,
+            )
+
+
+class Flush(_CorePlantCommand):
+    """Plant all spooled evidence and push it to the remote repositories."""
+
+    name = "flush"
+    push = True
+    intro_msg = "Flushing spooled evidence.  Remote lockers will be updated..."
+    outro_msg = "Remote lockers were updated..."
+
+    def _init_arguments(self):
+        self.add_argument(
+            "--spool-dir",
+            help="the operating system location of the spool directory",
+            metavar="~/path/plant-spool",
+            required=True,
+        )
+        self._init_plant_arguments()
+
+    def _validate_arguments(self, args):
+        if not os.path.isdir(os.path.expanduser(args.spool_dir)):
+            return f"ERROR: Spool directory {args.spool_dir} not found."
+        if args.progress_file:
+            return "ERROR: --progress-file cannot be used with flush."
+        return self._validate_plant_arguments(args, Spool(args.spool_dir).lockers())
+
+    def _run_plant(self, args):
+        start = time.perf_counter()
+        spool = Spool(args.spool_dir)
+        with spool.lock() as locked:
+            if not locked:
+                self.out(f"Spool {args.spool_dir} is already being flushed...")
+                return
+            entries = spool.entries()
+            if not entries:
+                self.out(f"Spool {args.spool_dir} is empty...")
+                return
+            self.out(self.intro_msg)
+            plants = {}
+            for entry in entries:
+                # Evidence enqueued again supersedes the evidence spooled
+                # earlier for the same locker path, superseded entries are
+                # only removed with the locker flushed.
+                destination = (
+                    entry.details["category"],
+                    os.path.basename(entry.evidence),
+                )
+                files = plants.setdefault(entry.locker, {})
+                files.pop(destination, None)
+                files[destination] = (entry.evidence, entry.details)
+            plants = {repo: list(files.values()) for repo, files in plants.items()}
+            results = self._plant_lockers(args, self._get_gitconfig(args), plants)
+            flushed = {repo for repo, _, error in results if not error}
+            spool.remove([entry for entry in entries if entry.locker in flushed])
+        self.out(self.outro_msg)
+        if args.report:
+            self._write_report(args, results, time.perf_counter() - start)
+        if len(flushed) < len(results):
+            return 1
+
+
+class Serve(_CorePlantCommand):
+    """Keep lockers open and plant evidence on request."""
+
+    name = "serve"
+
+    def _init_arguments(self):
+        self.add_argument(
+            "locker",
+            help=(
+                "the URL to an evidence locker repository to serve plant "
+                "requests for - multiple locker URLs can be provided"
+            ),
+            nargs="+",
+        )
+        self.add_argument(
+            "--branch", help="Branch name for locker repository", default=False
+        )
+        self.add_argument(
+            "--creds",
+            metavar="~/path/creds",
+            help="the path to credentials file - defaults to %(default)s",
+            default="~/.credentials",
+        )
+        self.add_argument(
+            "--git-config",
+            help="JSON git configuration for signing commits",
+            type=json.loads,
+            metavar=(
+                '\'{"commit":{"gpgsign": true},'
+                '"user":{"signingKey":"...","email":"...","name":"..."}}\''
+            ),
+            default=False,
+        )
+        self.add_argument(
+            "--git-config-file",
+            help=(
+                "path to a file containing the git configuration for signing commits"
+            ),
+            metavar="~/path/to/git_config_file.json",
+            default=False,
+        )
+        self.add_argument(
+            "--socket",
+            help=(
+                "path to a Unix domain socket to listen for plant requests on, "
+                "only accessible to the user running the server - defaults to "
+                "plant.sock in the cache directory"
+            ),
+            metavar="~/path/plant.sock",
+            default=None,
+        )
+        self.add_argument(
+            "--tcp",
+            help=(
+                "listen for plant requests on --host and --port instead of a "
+                "Unix domain socket - requires a --token-file"
+            ),
+            action="store_true",
+        )
+        self.add_argument(
+            "--host",
+            help="the host to listen for plant requests on - defaults to 127.0.0.1",
+            default=None,
+        )
+        self.add_argument(
+            "--port",
+            help="the port to listen for plant requests on - defaults to 8080",
+            type=int,
+            default=None,
+        )
+        self.add_argument(
+            "--token-file",
+            help=(
+                "path to a file containing the token plant requests must "
+                "provide as an Authorization bearer token"
+            ),
+            metavar="~/path/plant-token",
+            default=None,
+        )
+        self.add_argument(
+            "--max-request-bytes",
+            help="the maximum plant request size - defaults to %(default)s",
+            metavar="BYTES",
+            type=int,
+            default=MAX_REQUEST_BYTES,
+        )
+        self.add_argument(
+            "--cache-dir",
+            help=(
+                "the operating system location of a directory used to keep "
+                "a persistent clone per locker and branch - if not provided, "
+                "clones are kept in $TMPDIR/plant-serve"
+            ),
+            metavar="~/path/plant-cache",
+            default=None,
+        )
+        self.add_argument(
+            "--sparse",
+            help=(
+                "clone lockers shallow, without file content and with a "
+                "sparse checkout of only the external evidence categories "
+                "being planted"
+            ),
+            action="store_true",
+        )
+        self.add_argument(
+            "--coalesce-seconds",
+            help=(
+                "the time to wait for more plant requests to commit and push "
+                "together with a plant request - defaults to %(default)s"
+            ),
+            metavar="SECONDS",
+            type=float,
+            default=1.0,
+        )
+        self.add_argument(
+            "--max-batch",
+            help=(
+                "the maximum number of plant requests committed and pushed "
+                "together - defaults to %(default)s"
+            ),
+            metavar="N",
+            type=int,
+            default=100,
+        )
+        self.add_argument(
+            "--push-retries",
+            help=(
+                "the number of times a push rejected because of concurrent "
+                "changes to the remote locker is retried - defaults to "
+                "%(default)s"
+            ),
+            metavar="N",
+            type=int,
+            default=3,
+        )
+        self.add_argument(
+            "--workers",
+            help=(
+                "the number of threads used to copy evidence files into "
+                "each local locker - defaults to %(default)s"
+            ),
+            metavar="N",
+            type=int,
+            default=1,
+        )
+        self.add_argument(
+            "--dry-run",
+            help="commit planted evidence to the local lockers only, never push",
+            action="store_true",
+        )
+
+    def _validate_arguments(self, args):
+        for locker in args.locker:
+            parsed = urlparse(locker)
+            if not (parsed.scheme and parsed.hostname and parsed.path):
+                return (
+                    "ERROR: locker url must be of the form " "https://hostname/org/repo"
+                )
+        if args.git_config and args.git_config_file:
+            return "ERROR: Provide either a --git-config or a --git-config-file."
+        if args.workers < 1 or args.max_batch < 1:
+            return "ERROR: --workers and --max-batch must be positive integers."
+        if args.coalesce_seconds < 0:
+            return "ERROR: --coalesce-seconds must not be negative."
+        if args.push_retries < 0:
+            return "ERROR: --push-retries must not be negative."
+        if args.tcp and args.socket:
+            return "ERROR: Provide either a --socket or --tcp."
+        if not args.tcp and (args.host or args.port):
+            return "ERROR: --host and --port can only be used with --tcp."
+        if args.tcp and not args.token_file:
+            return "ERROR: --tcp requires a --token-file."
+        if args.max_request_bytes < 1:
+            return "ERROR: --max-request-bytes must be a positive integer."
+        args.token = None
+        if args.token_file:
+            try:
+                with open(os.path.expanduser(args.token_file)) as f:
+                    args.token = f.read().strip()
+            except OSError as e:
+                return f"ERROR: Token file {args.token_file} cannot be read: {e}"
+            if not args.token:
+                return f"ERROR: Token file {args.token_file} is empty."
+
+    def _run(self, args):
+        from compliance.utils.credentials import Config
+
+        from plant.locker import PlantLocker
+        from plant.server import LockerWorker, create_server
+
+        gitconfig = self._get_gitconfig(args)
+        creds = Config(args.creds)
+        cache_dir = os.path.expanduser(
+            args.cache_dir or os.path.join(tempfile.gettempdir(), "plant-serve")
+        )
+        workers = {}
+        with ExitStack() as stack:
+            for repo in dict.fromkeys(args.locker):
+                self.out(f"Opening locker {repo}...")
+                locker_name = self._get_locker_dir_name(
+                    repo, "sparse" if args.sparse else None
+                )
+                locker = PlantLocker(
+                    name=locker_name,
+                    repo_url=repo,
+                    creds=creds,
+                    do_push=not args.dry_run,
+                    gitconfig=gitconfig,
+                    repo_path=os.path.join(cache_dir, locker_name),
+                    batch_index=True,
+                    cached=True,
+                    sparse=args.sparse,
+                    push_retries=args.push_retries,
+                )
+                stack.enter_context(locker)
+                workers[repo] = LockerWorker(
+                    locker,
+                    push=not args.dry_run,
+                    coalesce=args.coalesce_seconds,
+                    max_batch=args.max_batch,
+                    workers=args.workers,
+                )
+                workers[repo].start()
+            socket_path = None
+            if not args.tcp:
+                socket_path = os.path.expanduser(
+                    args.socket or os.path.join(cache_dir, "plant.sock")
+                )
+            server = create_server(
+                workers,
+                socket_path,
+                args.host or "127.0.0.1",
+                8080 if args.port is None else args.port,
+                token=args.token,
+                max_request_bytes=args.max_request_bytes,
+            )
+            address = socket_path or "http://{}:{}".format(*server.server_address)
+            self.out(f"Serving plant requests on {address}...")
+            signal.signal(signal.SIGTERM, signal.default_int_handler)
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                self.out("Stopping...")
+            finally:
+                server.server_close()
+                if socket_path and os.path.exists(socket_path):
+                    os.remove(socket_path)
+                for worker in workers.values():
+                    worker.stop()
+                for worker in workers.values():
+                    worker.join()
+
+
+class Status(_CorePlantCommand):
+    """Report expired and expiring planted evidence."""
+
+    name = "status"
+    sweep = False
+
+    def _init_arguments(self):
+        self.add_argument(
+            "locker",
+            help=(
+                "the URL to an evidence locker repository to check planted "
+                "evidence expiry in - multiple locker URLs can be provided"
+            ),
+            nargs="+",
+        )
+        self.add_argument(
+            "--within",
+            help=(
+                "report evidence expiring within SECONDS as expiring - "
+                "defaults to %(default)s"
+            ),
+            metavar="SECONDS",
+            type=int,
+            default=86400,
+        )
+        self.add_argument(
+            "--all",
+            help="report all planted evidence, not only expired and expiring",
+            action="store_true",
+        )
+        self.add_argument(
+            "--format",
+            help="the report format - defaults to %(default)s",
+            choices=["text", "json"],
+            default="text",
+        )
+        self.add_argument(
+            "--locker-workers",
+            help=(
+                "the number of lockers checked concurrently when multiple "
+                "lockers are provided - defaults to %(default)s"
+            ),
+            metavar="N",
+            type=int,
+            default=4,
+        )
+        self.add_argument(
+            "--branch", help="Branch name for locker repository", default=False
+        )
+        self.add_argument(
+            "--creds",
+            metavar="~/path/creds",
+            help="the path to credentials file - defaults to %(default)s",
+            default="~/.credentials",
+        )
+        self.add_argument(
+            "--git-config",
+            help="JSON git configuration for signing commits",
+            type=json.loads,
+            metavar=(
+                '\'{"commit":{"gpgsign": true},'
+                '"user":{"signingKey":"...","email":"...","name":"..."}}\''
+            ),
+            default=False,
+        )
+        self.add_argument(
+            "--git-config-file",
+            help=(
+                "path to a file containing the git configuration for signing commits"
+            ),
+            metavar="~/path/to/git_config_file.json",
+            default=False,
+        )
+        self.add_argument(
+            "--cache-dir",
+            help=(
+                "the operating system location of a directory used to keep "
+                "a persistent clone per locker and branch"
+            ),
+            metavar="~/path/plant-cache",
+            default=None,
+        )
+        self._init_sweep_arguments()
+
+    def _init_sweep_arguments(self):
+        pass
+
+    def _validate_arguments(self, args):
+        for locker in args.locker:
+            parsed = urlparse(locker)
+            if not (parsed.scheme and parsed.hostname and parsed.path):
+                return (
+                    "ERROR: locker url must be of the form " "https://hostname/org/repo"
+                )
+        if args.git_config and args.git_config_file:
+            return "ERROR: Provide either a --git-config or a --git-config-file."
+        if args.within < 0:
+            return "ERROR: --within must not be negative."
+        if args.locker_workers < 1:
+            return "ERROR: --locker-workers must be a positive integer."
+
+    def _run(self, args):
+        gitconfig = self._get_gitconfig(args)
+        lockers = list(dict.fromkeys(args.locker))
+        check = partial(self._check_safely, args=args, gitconfig=gitconfig)
+        results = list(ordered_map(check, lockers, args.locker_workers))
+        if args.format == "json":
+            self.out(json.dumps({"lockers": results}, indent=2))
+        else:
+            for result in results:
+                self._out_status(result, args)
+        if any(result["error"] for result in results):
+            return 1
+
+    def _check_safely(self, repo, args, gitconfig):
+        result = {"locker": repo, "error": None, "removed": [], "evidence": []}
+        try:
+            self._check(repo, args, gitconfig, result)
+        except Exception as e:
+            result["error"] = f"{e.__class__.__name__}: {e}"
+        return result
+
+    def _check(self, repo, args, gitconfig, result):
+        from plant.expiry import CURRENT, EXPIRED, expiry_index
+
+        start = time.perf_counter()
+        locker = self._get_direct_locker(
+            repo,
+            args,
+            gitconfig,
+            do_push=self._do_push(args),
+            push_retries=getattr(args, "push_retries", 0),
+        )
+        with locker:
+            indexes = locker.read_indexes()
+            entries = expiry_index(
+                indexes, within=args.within, tolerance=locker.ttl_tolerance
+            )
+            if self.sweep:
+                for entry in entries:
+                    if entry.status == EXPIRED:
+                        locker.remove(entry.path)
+                result["removed"] = list(locker.removed)
+        result["indexes"] = len(indexes)
+        result["counts"] = {}
+        for entry in entries:
+            result["counts"][entry.status] = result["counts"].get(entry.status, 0) + 1
+            if args.all or entry.status != CURRENT:
+                result["evidence"].append(
+                    {
+                        "path": entry.path,
+                        "status": entry.status,
+                        "last_update": entry.last_update.isoformat(),
+                        "ttl": entry.ttl,
+                        "expires": entry.expires.isoformat(),
+                        "planted_by": entry.planted_by,
+                    }
+                )
+        result["seconds"] = round(time.perf_counter() - start, 6)
+
+    def _do_push(self, args):
+        return False
+
+    def _out_status(self, result, args):
+        repo = result["locker"]
+        if result["error"]:
+            self.out(f"{repo}: FAILED - {result['error']}")
+            return
+        counts = result["counts"]
+        self.out(
+            f"{repo}: {sum(counts.values())} evidence in {result['indexes']} "
+            f"index files, {counts.get('expired', 0)} expired, "
+            f"{counts.get('expiring', 0)} expiring within {args.within}s, "
+            f"checked in {result['seconds']:.3f}s"
+        )
+        for evidence in result["evidence"]:
+            self.out(
+                f"  {evidence['status']:<8}  {evidence['expires']}  "
+                f"{evidence['path']}"
+            )
+        if result["removed"]:
+            self.out(f"Removed {len(result['removed'])} expired evidence...")
+
+
+class Sweep(Status):
+    """Remove expired planted evidence in a single commit."""
+
+    name = "sweep"
+    sweep = True
+
+    def _init_sweep_arguments(self):
+        self.add_argument(
+            "--push-retries",
+            help=(
+                "the number of times a push rejected because of concurrent "
+                "changes to the remote locker is retried - defaults to "
+                "%(default)s"
+            ),
+            metavar="N",
+            type=int,
+            default=3,
+        )
+        self.add_argument(
+            "--dry-run",
+            help="commit the removal to the local lockers only, never push",
+            action="store_true",
+        )
+
+    def _validate_arguments(self, args):
+        if args.push_retries < 0:
+            return "ERROR: --push-retries must not be negative."
+        return super()._validate_arguments(args)
+
+    def _do_push(self, args):
+        return not args.dry_run
+
+
+class PlanChanges(_CorePlantCommand):
+    """Show the changes planting evidence would make, without planting."""
+
+    name = "plan"
+
+    def _init_plant_arguments(self):
+        self.add_argument(
+            "--locker-workers",
+            help=(
+                "the number of lockers planned concurrently when multiple "
+                "lockers are provided - defaults to %(default)s"
+            ),
+            metavar="N",
+            type=int,
+            default=4,
+        )
+        self.add_argument(
+            "--branch", help="Branch name for locker repository", default=False
+        )
+        self.add_argument(
+            "--creds",
+            metavar="~/path/creds",
+            help="the path to credentials file - defaults to %(default)s",
+            default="~/.credentials",
+        )
+        self.add_argument(
+            "--cache-dir",
+            help=(
+                "the operating system location of a directory used to keep "
+                "a persistent clone per locker and branch"
+            ),
+            metavar="~/path/plant-cache",
+            default=None,
+        )
+        self.add_argument(
+            "--refresh-ttl",
+            help="plan refreshing the metadata of evidence whose content is unchanged",
+            action="store_true",
+        )
+        self.add_argument(
+            "--workers",
+            help=(
+                "the number of threads used to compare evidence files with the "
+                "locker - defaults to %(default)s"
+            ),
+            metavar="N",
+            type=int,
+            default=1,
+        )
+        self.add_argument(
+            "--compress",
+            help="plan compressing evidence files with the codec provided",
+            choices=CODECS,
+            default=None,
+        )
+        self.add_argument(
+            "--blob-store",
+            help="plan storing evidence files larger than --blob-threshold",
+            metavar="~/path/plant-blobs",
+            default=None,
+        )
+        self.add_argument(
+            "--blob-store-endpoint",
+            help="the URL of an S3 compatible endpoint for an s3 blob store",
+            metavar="https://s3.example.com",
+            default=None,
+        )
+        self.add_argument(
+            "--blob-threshold",
+            help=(
+                "the size in bytes above which evidence files are stored in the "
+                "blob store - defaults to %(default)s"
+            ),
+            metavar="BYTES",
+            type=int,
+            default=BLOB_THRESHOLD,
+        )
+        self.add_argument(
+            "--all",
+            help="list unchanged evidence as well",
+            action="store_true",
+        )
+        self.add_argument(
+            "--format",
+            help="the plan format - defaults to %(default)s",
+            choices=["text", "json"],
+            default="text",
+        )
+
+    def _validate_plant_arguments(self, args, lockers):
+        if args.workers < 1:
+            return "ERROR: --workers must be a positive integer."
+        if args.locker_workers < 1:
+            return "ERROR: --locker-workers must be a positive integer."
+        if args.compress and get_codec_error(args.compress):
+            return f"ERROR: {get_codec_error(args.compress)}."
+        if args.blob_store and get_blob_store_error(args.blob_store):
+            return f"ERROR: {get_blob_store_error(args.blob_store)}."
+        if args.blob_threshold < 0:
+            return "ERROR: --blob-threshold must not be negative."
+
+    def _run(self, args):
+        files = args.config.items() if args.config else Manifest(args.config_file)
+        if not args.skip_preflight:
+            checked = preflight(files, args.workers)
+            if checked.problems:
+                return _get_preflight_error(checked)
+        try:
+            entries = list(expand(files))
+        except (ManifestError, OSError) as e:
+            return f"ERROR: {e}"
+        self._set_branch(args)
+        plan = partial(self._plan_safely, args=args, entries=entries)
+        results = list(ordered_map(plan, self._get_lockers(args), args.locker_workers))
+        if args.format == "json":
+            self.out(json.dumps({"lockers": results}, indent=2))
+        else:
+            for result in results:
+                self._out_plan(result)
+        if any(result["error"] for result in results):
+            return 1
+
+    def _plan_safely(self, repo, args, entries):
+        result = {"locker": repo, "error": None, "counts": {}, "evidence": []}
+        try:
+            self._plan_changes(repo, args, entries, result)
+        except Exception as e:
+            result["error"] = f"{e.__class__.__name__}: {e}"
+        return result
+
+    def _plan_changes(self, repo, args, entries, result):
+        start = time.perf_counter()
+        locker = self._get_direct_locker(
+            repo,
+            args,
+            blob_store=self._get_blob_store(args),
+            blob_threshold=args.blob_threshold,
+        )
+        with locker:
+            locker.read_indexes({details["category"] for _, details in entries})
+            plan = partial(self._plan_evidence, locker, args)
+            for file_path, evidence, status in ordered_map(plan, entries, args.workers):
+                result["counts"][status] = result["counts"].get(status, 0) + 1
+                if args.all or status != UNCHANGED:
+                    result["evidence"].append(
+                        {"path": file_path, "evidence": evidence, "status": status}
+                    )
+        result["seconds"] = round(time.perf_counter() - start, 6)
+
+    def _plan_evidence(self, locker, args, item):
+        file_path, details = item
+        evidence = to_evidence(file_path, details)
+        status = locker.plan(
+            evidence,
+            file_path,
+            args.refresh_ttl,
+            compress=details.get("compress", args.compress) or None,
+        )
+        return file_path, evidence.path, status
+
+    def _out_plan(self, result):
+        repo = result["locker"]
+        if result["error"]:
+            self.out(f"{repo}: FAILED - {result['error']}")
+            return
+        counts = result["counts"]
+        self.out(
+            f"{repo}: {counts.get(ADD, 0)} to add, {counts.get(UPDATE, 0)} to "
+            f"update, {counts.get(METADATA, 0)} metadata only, "
+            f"{counts.get(UNCHANGED, 0)} unchanged, planned in "
+            f"{result['seconds']:.3f}s"
+        )
+        for evidence in result["evidence"]:
+            self.out(
+                f"  {evidence['status']:<9}  {evidence['path']} -> "
+                f"{evidence['evidence']}"
+            )
+
+
 class Plant(Command):
     """The plant CLI base command."""
 
-    subcommands = [DryRun, PushToRemote]
+    subcommands = [
+        DryRun,
+        PushToRemote,
+        PlanChanges,
+        Enqueue,
+        Flush,
+        Serve,
+        Status,
+        Sweep,
+    ]
 
     def _init_arguments(self):
         self.add_argument(
@@ -0,0 +1,99 @@
+# Copyright (c) 2020 IBM Corp. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Plant evidence compression."""
+
+import gzip
+import hashlib
+import importlib.util
+import shutil
+
+from plant.utils import CHUNK_SIZE
+
+GZIP = "gzip"
+ZSTD = "zstd"
+CODECS = (GZIP, ZSTD)
+COMPRESSION_KEYS = ("codec", "original_size", "original_digest")
+
+
+def get_codec_error(codec):
+    """
+    Check that evidence can be compressed with a codec.
+
+    :param codec: the compression codec name.
+
+    :returns: an error message if the codec cannot be used, otherwise None.
+    """
+    if codec not in CODECS:
+        return f"compress must be one of {', '.join(CODECS)}"
+    if codec == ZSTD and importlib.util.find_spec("zstandard") is None:
+        return "zstd compression requires auditree-plant[zstd] to be installed"
+
+
+def compress_file(source, target, codec, chunk_size=CHUNK_SIZE):
+    """
+    Compress a file in chunks without loading it into memory.
+
+    Compressed content only depends on the file content, so the same file
+    compresses to the same git blob every time.
+
+    :param source: the path to the file to compress.
+    :param target: the path to write the compressed file to.
+    :param codec: the compression codec name, gzip or zstd.
+    :param chunk_size: the maximum number of bytes read at a time.
+    """
+    with open(source, "rb") as fsrc, open(target, "wb") as fdst:
+        if codec == GZIP:
+            with gzip.GzipFile(filename="", mode="wb", fileobj=fdst, mtime=0) as f:
+                shutil.copyfileobj(fsrc, f, chunk_size)
+            return
+        import zstandard
+
+        zstandard.ZstdCompressor().copy_stream(
+            fsrc, fdst, read_size=chunk_size, write_size=chunk_size
+        )
+
+
+def open_compressed(path, codec):
+    """
+    Open a compressed evidence file for reading its original content.
+
+    This is the reader API for downstream checks reading compressed evidence,
+    planting never decompresses evidence.
+
+    :param path: the path to the compressed file.
+    :param codec: the compression codec name recorded for the evidence.
+
+    :returns: a binary file object providing the original content.
+    """
+    if codec == GZIP:
+        return gzip.open(path, "rb")
+    import zstandard
+
+    return zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True)
+
+
+def file_digest(path, chunk_size=CHUNK_SIZE):
+    """
+    Provide the SHA-256 digest of a file without loading it into memory.
+
+    :param path: the path to the file.
+    :param chunk_size: the maximum number of bytes read at a time.
+
+    :returns: the hexadecimal digest of the file content.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
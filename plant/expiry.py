@@ -0,0 +1,74 @@
+# Copyright (c) 2020 IBM Corp. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Planted evidence expiry."""
+
+from collections import namedtuple
+from datetime import datetime as dt, timedelta
+from pathlib import PurePath
+
+EXPIRED = "expired"
+EXPIRING = "expiring"
+CURRENT = "current"
+
+Expiry = namedtuple(
+    "Expiry", ["path", "last_update", "ttl", "expires", "status", "planted_by"]
+)
+
+
+def expiry_index(indexes, now=None, within=0, tolerance=0):
+    """
+    Provide the expiry of all evidence recorded in index file metadata.
+
+    Evidence expires ``ttl`` seconds, less the ttl tolerance, after its last
+    update, the same as when the compliance framework checks evidence ttl.
+    Index entries without a last update or a ttl are not evidence metadata
+    and are left out.
+
+    :param indexes: a dictionary of index file path/metadata pairs, paths are
+      relative to the locker root.
+    :param now: the (naive UTC) time to compute the expiry status at,
+      defaults to the current time.
+    :param within: evidence expiring within this many seconds is expiring.
+    :param tolerance: the ttl tolerance in seconds.
+
+    :returns: a list of evidence expiry entries, soonest expiry first.
+    """
+    now = now or dt.utcnow()
+    entries = []
+    for index_path, metadata in indexes.items():
+        dir_path = PurePath(index_path).parent.as_posix()
+        for name, details in metadata.items():
+            try:
+                last_update = dt.fromisoformat(details["last_update"])
+                ttl = int(details["ttl"])
+            except (KeyError, TypeError, ValueError):
+                continue
+            expires = last_update + timedelta(seconds=ttl - tolerance)
+            if expires <= now:
+                status = EXPIRED
+            elif expires <= now + timedelta(seconds=within):
+                status = EXPIRING
+            else:
+                status = CURRENT
+            entries.append(
+                Expiry(
+                    f"{dir_path}/{name}",
+                    last_update,
+                    ttl,
+                    expires,
+                    status,
+                    details.get("planted_by"),
+                )
+            )
+    return sorted(entries, key=lambda entry: (entry.expires, entry.path))
@@ -0,0 +1,187 @@
+# Copyright (c) 2020 IBM Corp. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Plant write-ahead journal."""
+
+import json
+import os
+from threading import Lock
+
+JOURNAL_FILE = "plant-journal.jsonl"
+WRITTEN = "written"
+INDEXED = "indexed"
+COMMITTED = "committed"
+PUSHED = "pushed"
+
+
+class PlantJournal(object):
+    """
+    Write-ahead journal of the evidence planted into a local locker.
+
+    Each evidence file is recorded as written (along with its source path
+    and source digest) and as indexed.  Commits and pushes are recorded as
+    they happen.  A commit applies to all evidence indexed before it and a
+    push to all evidence committed in or before the pushed commit, so that
+    batches committed after a commit being pushed are not recorded as pushed
+    along with it.  Records are
+    appended as JSON Lines and flushed as they are written, commit and push
+    records are also synced to disk.
+
+    A journal loaded to resume a run provides the state reached by each
+    evidence file, as long as its source content did not change since.
+    """
+
+    def __init__(self, path, resume=False):
+        """
+        Construct and initialize the journal object.
+
+        :param path: the path to the journal file.
+        :param resume: if True, load the journal found at path and append to
+          it, otherwise start a new journal.
+        """
+        self.path = path
+        self._lock = Lock()
+        self._entries = {}
+        # Commits not pushed yet, in commit order.
+        self._commits = []
+        if resume:
+            self._load()
+        self._file = open(path, "a" if resume else "w")
+
+    def get(self, evidence_path, digest):
+        """
+        Provide the state reached by evidence according to the journal.
+
+        :param evidence_path: the evidence path in the locker.
+        :param digest: the current git blob digest of the evidence source.
+
+        :returns: the evidence state or None if the evidence is not in the
+          journal or its source content changed.
+        """
+        with self._lock:
+            entry = self._entries.get(evidence_path)
+        if entry is None or entry["digest"] != digest:
+            return None
+        return entry["state"]
+
+    def written(self, evidence_path, source, digest):
+        """
+        Record evidence as written to the local locker.
+
+        :param evidence_path: the evidence path in the locker.
+        :param source: the path to the evidence source file.
+        :param digest: the git blob digest of the evidence source.
+        """
+        self._append(
+            {
+                "state": WRITTEN,
+                "evidence": evidence_path,
+                "source": source,
+                "digest": digest,
+            }
+        )
+
+    def indexed(self, evidence_paths):
+        """
+        Record evidence as indexed and staged in the local locker.
+
+        :param evidence_paths: the evidence paths in the locker.
+        """
+        for evidence_path in evidence_paths:
+            self._append({"state": INDEXED, "evidence": evidence_path})
+
+    def committed(self, commit):
+        """
+        Record all indexed evidence as committed to the local locker.
+
+        :param commit: the commit hexsha.
+        """
+        self._append({"state": COMMITTED, "commit": commit}, sync=True)
+
+    def pushed(self, commit):
+        """
+        Record evidence committed up to a commit as pushed to the remote locker.
+
+        A commit that was not recorded as committed, such as a rebased commit,
+        is a push of all committed evidence.
+
+        :param commit: the pushed commit hexsha.
+        """
+        self._append({"state": PUSHED, "commit": commit}, sync=True)
+
+    def close(self, complete=False):
+        """
+        Close the journal.
+
+        :param complete: if True, the run is complete and the journal file
+          is removed.
+        """
+        with self._lock:
+            self._file.close()
+            if complete and os.path.exists(self.path):
+                os.remove(self.path)
+
+    def _append(self, record, sync=False):
+        with self._lock:
+            self._apply(record)
+            self._file.write(json.dumps(record) + "\n")
+            self._file.flush()
+            if sync:
+                os.fsync(self._file.fileno())
+
+    def _apply(self, record):
+        state = record["state"]
+        if state == WRITTEN:
+            self._entries[record["evidence"]] = {
+                "state": WRITTEN,
+                "digest": record["digest"],
+            }
+        elif state == INDEXED:
+            entry = self._entries.get(record["evidence"])
+            if entry:
+                entry["state"] = INDEXED
+        elif state == COMMITTED:
+            commit = record["commit"]
+            for entry in self._entries.values():
+                if entry["state"] == INDEXED:
+                    entry["state"] = COMMITTED
+                    entry["commit"] = commit
+            if commit not in self._commits:
+                self._commits.append(commit)
+        else:
+            commit = record["commit"]
+            pushed = self._commits
+            if commit in self._commits:
+                pushed = self._commits[: self._commits.index(commit) + 1]
+            self._commits = self._commits[len(pushed) :]
+            pushed = set(pushed)
+            for entry in self._entries.values():
+                if entry["state"] == COMMITTED and entry["commit"] in pushed:
+                    entry["state"] = PUSHED
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb+") as f:
+            offset = 0
+            for line in f:
+                try:
+                    if not line.endswith(b"\n"):
+                        raise ValueError("partial record")
+                    record = json.loads(line)
+                except ValueError:
+                    # A run interrupted while appending leaves a partial line.
+                    f.truncate(offset)
+                    break
+                self._apply(record)
+                offset += len(line)
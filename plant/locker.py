@@ -13,12 +13,109 @@
 # limitations under the License.
 """Plant Locker."""
 
+import fcntl
+import hashlib
 import json
 import os
+import random
+import re
+import shutil
+import tempfile
+import threading
 import time
+from collections import namedtuple
+from io import BytesIO
+from pathlib import Path, PurePath
 
-from compliance.locker import Locker
+from compliance.config import get_config
+from compliance.locker import INDEX_FILE, Locker, is_index_file
 from compliance.utils.data_parse import format_json
+from compliance.utils.exceptions import LockerPushError
+
+import git
+from gitdb import LooseObjectDB
+from gitdb.base import IStream
+
+from plant.journal import INDEXED, JOURNAL_FILE, PlantJournal, WRITTEN
+from plant.blobstore import BLOB_KEYS, format_pointer
+from plant.compression import COMPRESSION_KEYS, compress_file, file_digest
+from plant.report import (
+    ADD,
+    METADATA,
+    PLANTED,
+    REFRESHED,
+    RESUMED,
+    RunReport,
+    SKIPPED,
+    UNCHANGED,
+    UPDATE,
+)
+from plant.utils import CHUNK_SIZE
+
+CategoryPaths = namedtuple("CategoryPaths", ["dir_path", "local_dir", "index_file"])
+BLOB_MODE = "100644"
+NULL_SHA = "0" * 40
+STORAGE_KEYS = tuple(dict.fromkeys(COMPRESSION_KEYS + BLOB_KEYS))
+PUSH_BACKOFF = 2
+PUSH_BACKOFF_MAX = 60
+PUSH_PROGRESS_INTERVAL = 5
+PUSH_REF = "refs/plant/push"
+PUSH_STAGES = {
+    git.RemoteProgress.COUNTING: "counting objects",
+    git.RemoteProgress.COMPRESSING: "compressing objects",
+    git.RemoteProgress.WRITING: "writing objects",
+}
+SIZE_UNITS = {"bytes": 1, "KiB": 1024, "MiB": 1024**2, "GiB": 1024**3}
+SIZE = re.compile(r"([\d.]+) (bytes|KiB|MiB|GiB)")
+PUSH_FAILED = (
+    git.remote.PushInfo.REJECTED
+    | git.remote.PushInfo.REMOTE_REJECTED
+    | git.remote.PushInfo.REMOTE_FAILURE
+    | git.remote.PushInfo.ERROR
+)
+
+
+class PushProgress(git.RemoteProgress):
+    """
+    Log git push progress and count the objects and bytes pushed.
+
+    Progress is logged at most once per interval and at the end of each push
+    stage.  Git only reports the bytes written, and the rate they were
+    written at, once all objects are written.
+    """
+
+    def __init__(self, logger, interval=PUSH_PROGRESS_INTERVAL):
+        """
+        Construct and initialize the push progress object.
+
+        :param logger: the logger to log push progress with.
+        :param interval: the minimum seconds between progress logs.
+        """
+        super().__init__()
+        self.logger = logger
+        self.interval = interval
+        self.objects = 0
+        self.nbytes = 0
+        self._logged = 0
+
+    def update(self, op_code, cur_count, max_count=None, message=""):
+        """Log push progress and keep count of the objects and bytes written."""
+        stage = PUSH_STAGES.get(op_code & self.OP_MASK)
+        if not stage:
+            return
+        if op_code & self.OP_MASK == self.WRITING:
+            self.objects = int(cur_count)
+            size = SIZE.match(message or "")
+            if size:
+                self.nbytes = int(float(size.group(1)) * SIZE_UNITS[size.group(2)])
+        now = time.monotonic()
+        if not op_code & self.END and now - self._logged < self.interval:
+            return
+        self._logged = now
+        count = f"{int(cur_count)}/{int(max_count)}" if max_count else int(cur_count)
+        self.logger.info(
+            f"Push progress: {stage} {count}" + (f", {message}" if message else "")
+        )
 
 
 class PlantLocker(Locker):
@@ -32,8 +129,51 @@ class PlantLocker(Locker):
         do_push=False,
         gitconfig=None,
         repo_path=None,
+        batch_index=False,
+        cached=False,
+        sparse=False,
+        push_retries=0,
+        report=None,
+        journal=False,
+        resume=False,
+        blob_store=None,
+        blob_threshold=0,
+        direct=False,
+        background_push=False,
     ):
-        """Plant locker constructor to add external evidence."""
+        """
+        Plant locker constructor to add external evidence.
+
+        When ``batch_index`` is True, category index metadata is kept in
+        memory for the lifetime of the locker context and each touched
+        ``index.json`` is written and staged only once, on exit.
+
+        When ``cached`` is True, the repository found at ``repo_path`` is a
+        persistent clone of ``repo_url`` that is synced with the remote
+        instead of being used as is.
+
+        When ``journal`` is True, a write-ahead journal of planted evidence
+        is kept in the local repository git directory.  When ``resume`` is
+        also True, the journal of an interrupted run is picked up and only
+        evidence the interrupted run did not complete is planted.
+
+        When a ``blob_store`` is provided, evidence files larger than
+        ``blob_threshold`` bytes are stored in the blob store and only a
+        pointer file to the stored blob is committed in their place.
+
+        When ``direct`` is True, evidence content and index metadata are
+        written straight into git blob objects and staged without being
+        written to the working tree.  Direct lockers are sparse lockers whose
+        external evidence categories are never checked out, index metadata
+        is batched and read from the committed tree, and no journal is kept.
+        Commits hold the same content as commits of evidence written to the
+        working tree.
+
+        When ``background_push`` is True, batches committed with a push are
+        pushed in the background while later batches are planted.  A batch
+        that cannot be pushed in the background is pushed, rebased if need
+        be, by the next push.
+        """
         super().__init__(
             name=name,
             repo_url=repo_url,
@@ -44,21 +184,637 @@ class PlantLocker(Locker):
         if repo_path is not None:
             self.local_path = os.path.normpath(repo_path)
         self.planted = []
+        self.refreshed = []
+        self.removed = []
+        self.direct = direct
+        self.batch_index = batch_index or direct
+        self.cached = cached
+        self.sparse = sparse or direct
+        self._sparse_categories = set()
+        self._head_digests = {}
+        self.push_retries = push_retries
+        self.report = report if report is not None else RunReport()
+        self._written = {}
+        self._storage = {}
+        self._metadata = {}
+        self._dirty = []
+        self._unstaged = []
+        self._removed = []
+        self._checked_in = (0, 0, 0)
+        self.journal = None
+        self._journaled = journal and not direct
+        self._resume = resume
+        self._resumed = {}
+        self._journal_pending = []
+        self._planter = None
+        self._category_paths = {}
+        self._category_dirs = set()
+        self._stored = {}
+        self._objects = None
+        self.background_push = background_push
+        self._push_thread = None
+        self._cache_lock = None
+        self.blob_store = blob_store
+        self.blob_threshold = blob_threshold
+
+    def init(self):
+        """
+        Initialize the local git repository.
+
+        A cached locker clone is verified and reset to the remote branch
+        head.  It is removed and cloned afresh if it cannot be opened or
+        fails the integrity check, but kept if it cannot be synced.  Cached
+        clones are locked for the whole locker session so that runs sharing
+        a cache directory take turns.
+        """
+        if self.cached:
+            self._lock_cache()
+        try:
+            with self.report.phase("clone"):
+                self._init()
+            if self._journaled:
+                journal_file = Path(self.repo.git_dir, JOURNAL_FILE)
+                self.journal = PlantJournal(journal_file, self._resume)
+        except BaseException:
+            self._unlock_cache()
+            raise
+
+    def _lock_cache(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.local_path)), exist_ok=True)
+        # The lock file sits next to the clone, which may be removed.
+        self._cache_lock = open(f"{self.local_path}.lock", "w")
+        try:
+            fcntl.flock(self._cache_lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self.logger.info(f"Waiting for cached locker in {self.local_path}...")
+            fcntl.flock(self._cache_lock, fcntl.LOCK_EX)
+
+    def _unlock_cache(self):
+        if self._cache_lock is None:
+            return
+        fcntl.flock(self._cache_lock, fcntl.LOCK_UN)
+        self._cache_lock.close()
+        self._cache_lock = None
+
+    def _init(self):
+        local_git = Path(self.local_path, ".git")
+        if self.cached and self.repo_url_with_creds and local_git.is_dir():
+            try:
+                self._verify_cache()
+            except (git.exc.GitError, OSError) as e:
+                self.logger.warning(
+                    f"Cached locker in {self.local_path} is unusable "
+                    f"({e.__class__.__name__}: {e}), removing it and cloning..."
+                )
+                if hasattr(self, "repo"):
+                    self.repo.close()
+                    del self.repo
+                shutil.rmtree(self.local_path)
+            else:
+                # Failing to sync, e.g. on network errors, does not make the
+                # clone unusable, so it is kept for later runs.
+                self.refresh_cache()
+        super().init()
+
+    def _verify_cache(self):
+        self.repo = git.Repo(self.local_path)
+        self.repo.git.fsck("--connectivity-only", "--no-dangling", "--no-progress")
+
+    def refresh_cache(self):
+        """
+        Sync a cached locker clone with the remote repository.
+
+        The remote branch is fetched and the local branch is hard reset to
+        the remote branch head.  Any leftover local changes, including
+        commits from prior dry runs, are discarded.  The checkout mode is set
+        on every refresh, whatever mode the clone was left in by a prior run:
+        sparse and direct lockers start without any category checked out,
+        other lockers have the whole tree checked out.
+        """
+        self.logger.info(f"Refreshing cached locker in {self.local_path}...")
+        start = time.perf_counter()
+        remote = self.repo.remote()
+        remote.set_url(self.repo_url_with_creds)
+        remote.fetch(self.branch)
+        self.repo.git.checkout("-f", "-B", self.branch, f"{remote.name}/{self.branch}")
+        if self.sparse:
+            self.repo.git.sparse_checkout("set", "--cone")
+        else:
+            self.repo.git.sparse_checkout("disable")
+        self._sparse_categories = set()
+        self.repo.git.clean("-ffdx")
+        duration = time.perf_counter() - start
+        self.logger.info(f"Cached locker refreshed in {duration:.3f}s")
+
+    def get_locker_repo(self, locker="evidence locker"):
+        """
+        Pull (clone) the remote repository to the local git repository.
+
+        Sparse lockers are cloned shallow, without file content (blobs are
+        fetched on demand) and with only top level files checked out.
+
+        :param locker: the locker "name" used in logging
+        """
+        if not self.sparse or Path(self.local_path, ".git").is_dir():
+            super().get_locker_repo(locker)
+            return
+        self.logger.info(
+            f"Cloning sparse {locker} {self.repo_url} to {self.local_path}..."
+        )
+        start = time.perf_counter()
+        self.repo = git.Repo.clone_from(
+            self.repo_url_with_creds,
+            self.local_path,
+            single_branch=True,
+            branch=self.default_branch,
+            depth=self.clone_depth or 1,
+            filter="blob:none",
+            sparse=True,
+        )
+        duration = time.perf_counter() - start
+        self.logger.info(f"{locker.title()} cloned in {duration:.3f}s")
+        self._checkout_branch()
+
+    def include_category(self, category):
+        """
+        Materialize an external evidence category folder in a sparse locker.
+
+        Categories of direct lockers are never materialized.
+
+        :param category: the external evidence category.
+        """
+        if not self.sparse or self.direct:
+            return
+        with self.lock:
+            if category in self._sparse_categories:
+                return
+            self.repo.git.sparse_checkout("add", f"external/{category}")
+            self._sparse_categories.add(category)
+
+    def write_pkg_indexes(self):
+        """
+        Add package index files to the local git repository index.
+
+        Index files outside of a sparse checkout are not in the working tree
+        and are left as is.
+        """
+        if not self.sparse:
+            super().write_pkg_indexes()
+            return
+        self.repo.index.add(
+            [
+                f[0]
+                for f in self.repo.index.entries.keys()
+                if is_index_file(f[0]) and Path(self.local_path, f[0]).is_file()
+            ]
+        )
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         """Override check in routine with a custom plant commit message."""
         if exc_type:
             self.logger.error(" ".join([str(exc_type), str(exc_val)]))
-        planted_files = "\n".join(self.planted)
-        self.checkin(
-            (
-                "Planted external evidence at local time "
-                f"{time.ctime(time.time())}\n\n{planted_files}"
+        try:
+            self.checkin_batch()
+            if self.repo_url_with_creds:
+                self.push()
+            if self.journal:
+                self.journal.close(complete=not exc_type)
+        finally:
+            self._unlock_cache()
+        return
+
+    def checkin_batch(self, push=False, pushed=None):
+        """
+        Commit evidence planted since the last batch to the local locker.
+
+        Large plants can be committed, and pushed, in batches of evidence
+        rather than in a single commit when the locker context exits.  The
+        commit message only lists the evidence of the batch.  Evidence
+        digests and index metadata read during the session are read again
+        for the next batch.
+
+        :param push: push the local locker to the remote locker once the
+          batch is committed.
+        :param pushed: a callable called with the commit pushed once the
+          batch is pushed.
+        """
+        with self.report.phase("index"):
+            self.flush_index()
+        planted_count, refreshed_count, removed_count = self._checked_in
+        # Evidence planted more than once in a batch is listed once.
+        planted = list(dict.fromkeys(self.planted[planted_count:]))
+        refreshed = list(dict.fromkeys(self.refreshed[refreshed_count:]))
+        removed = list(dict.fromkeys(self.removed[removed_count:]))
+        self._checked_in = (len(self.planted), len(self.refreshed), len(self.removed))
+        action = "Removed" if removed and not (planted or refreshed) else "Planted"
+        files = "\n".join(planted or removed)
+        if refreshed:
+            refreshed_files = "\n".join(refreshed)
+            files += f"\n\nMetadata refreshed:\n{refreshed_files}"
+        if removed and action == "Planted":
+            removed_files = "\n".join(removed)
+            files += f"\n\nRemoved:\n{removed_files}"
+        with self.report.phase("checkin", len(planted) + len(refreshed) + len(removed)):
+            self.checkin(
+                (
+                    f"{action} external evidence at local time "
+                    f"{time.ctime(time.time())}\n\n{files}"
+                )
             )
-        )
-        if self.repo_url_with_creds:
+        if self.journal and self.repo.head.is_valid():
+            self.journal.committed(self.repo.head.commit.hexsha)
+        if push and self.repo_url_with_creds and self.background_push:
+            self._start_push(pushed)
+        elif push and self.repo_url_with_creds:
             self.push()
-        return
+            if pushed:
+                pushed(self.repo.head.commit.hexsha)
+            # Pushed evidence no longer needs conflict resolution.
+            self.planted = []
+            self.refreshed = []
+            self.removed = []
+            self._checked_in = (0, 0, 0)
+        # HEAD moved, possibly onto upstream changes, so session caches of
+        # committed digests and index metadata are stale.
+        with self.lock:
+            self._head_digests = {}
+            self._metadata = {}
+
+    def discard(self):
+        """
+        Discard evidence not pushed yet and sync with the remote repository.
+
+        The local locker is reset to the remote branch head and all evidence
+        planted since the last push is forgotten.
+        """
+        self.wait_push()
+        with self.lock:
+            self.planted = []
+            self.refreshed = []
+            self.removed = []
+            self._checked_in = (0, 0, 0)
+            self._written = {}
+            self._storage = {}
+            self._resumed = {}
+            self._metadata = {}
+            self._head_digests = {}
+            self._dirty = []
+            self._unstaged = []
+            self._removed = []
+            self._journal_pending = []
+            self._category_dirs = set()
+            self._stored = {}
+        self.refresh_cache()
+
+    def plant(
+        self,
+        evidence,
+        source,
+        link=False,
+        skip_unchanged=False,
+        refresh_ttl=False,
+        compress=None,
+    ):
+        """
+        Add external evidence to the locker from a source file.
+
+        :param evidence: the external evidence object.
+        :param source: the path to the file holding the evidence content.
+        :param link: hard link the source file into the locker when possible.
+        :param skip_unchanged: leave evidence identical to the locker version
+          as is.
+        :param refresh_ttl: refresh the metadata of unchanged evidence.
+        :param compress: the codec to compress the evidence file with.
+
+        :returns: the plant status, one of planted, refreshed or skipped.
+        """
+        written = self.write_evidence_file(
+            evidence, source, link, skip_unchanged, compress
+        )
+        return self.index_evidence(evidence, written, refresh_ttl)
+
+    def write_evidence_file(
+        self, evidence, source, link=False, skip_unchanged=False, compress=None
+    ):
+        """
+        Place a source file in the local locker as the evidence file.
+
+        The content is never held in memory as a whole.  It is either hard
+        linked, when requested and on the same file system, copied in fixed
+        size chunks or compressed in fixed size chunks.  Content is copied
+        byte for byte so binary evidence is preserved as is.
+
+        Evidence larger than the locker blob threshold is stored in the
+        locker blob store instead and a pointer file to the stored blob is
+        written in its place.  Such evidence is never compressed.
+
+        Compressed and stored evidence keeps its name.  The codec or blob
+        location, the original size and the original SHA-256 digest are
+        recorded in the evidence index metadata when the evidence is
+        indexed.
+
+        :param evidence: the external evidence object.
+        :param source: the path to the file holding the evidence content.
+        :param link: hard link the source file into the locker when possible.
+        :param skip_unchanged: do not write the file if its content is the
+          same as the evidence committed at the locker HEAD.
+        :param compress: the codec to compress the evidence file with, gzip
+          or zstd.  The file is not compressed if not provided.
+
+        :returns: True if the file was written, False if it was unchanged.
+        """
+        start = time.perf_counter()
+        path = self._get_path(evidence)
+        stat = os.stat(source)
+        storage = self._get_storage(source, stat, compress)
+        digest = git_blob_digest(source) if self.journal else None
+        state = self.journal.get(path, digest) if self.journal else None
+        if state == WRITTEN:
+            written = True
+        elif state:
+            self._resumed[path] = state
+            written = False
+        else:
+            written = self._write_evidence_file(
+                evidence, source, stat, link, skip_unchanged, digest, storage
+            )
+            if written and self.journal:
+                self.journal.written(path, source, digest)
+        if written and storage:
+            with self.lock:
+                self._storage[path] = storage
+        seconds = time.perf_counter() - start
+        nbytes = stat.st_size if written else 0
+        self.report.add("write", seconds, int(written), nbytes)
+        self._written[path] = (source, stat.st_size, seconds)
+        return written
+
+    def plan(self, evidence, source, refresh_ttl=False, compress=None):
+        """
+        Provide the change planting a source file as evidence would make.
+
+        Nothing is written.  The source file is compared with the evidence
+        committed at the locker HEAD the same way it is when planted with
+        unchanged evidence skipped, so evidence content is never fetched.
+
+        :param evidence: the external evidence object.
+        :param source: the path to the file holding the evidence content.
+        :param refresh_ttl: refresh the metadata of unchanged evidence.
+        :param compress: the codec to compress the evidence file with.
+
+        :returns: the plan status, one of add, update, metadata or unchanged.
+        """
+        storage = self._get_storage(source, os.stat(source), compress)
+        if self.get_head_digest(evidence) is None:
+            return ADD
+        if not self.is_unchanged(evidence, source, storage=storage):
+            return UPDATE
+        if refresh_ttl or self._metadata_changed(evidence):
+            return METADATA
+        return UNCHANGED
+
+    def is_unchanged(self, evidence, source, digest=None, storage=None):
+        """
+        Compare a source file with the evidence committed at the locker HEAD.
+
+        Only git object digests are compared so evidence content is never
+        fetched, even for partial clones.  Compressed and stored evidence is
+        compared using the codec or blob location and the original digest
+        recorded in its index metadata.
+
+        :param evidence: the external evidence object.
+        :param source: the path to the file holding the evidence content.
+        :param digest: the source file git blob digest, if already known.
+        :param storage: the compression or blob store metadata of the source
+          file, if it is to be compressed or stored in the blob store.
+
+        :returns: True if the source file content is the committed content.
+        """
+        head_digest = self.get_head_digest(evidence)
+        if head_digest is None:
+            return False
+        if storage:
+            with self.lock:
+                metadata = self._get_metadata(self.get_index_file(evidence))
+                current = metadata.get(evidence.name, {})
+            return all(current.get(k) == v for k, v in storage.items())
+        return head_digest == (digest or git_blob_digest(source))
+
+    def get_head_digest(self, evidence):
+        """
+        Provide the git blob digest of evidence committed at the locker HEAD.
+
+        Digests are read once per category for the locker session.
+
+        :param evidence: the evidence object.
+
+        :returns: the blob digest or None if the evidence is not committed.
+        """
+        dir_path = self._get_category_paths(evidence).dir_path
+        with self.lock:
+            if dir_path not in self._head_digests:
+                digests = {}
+                try:
+                    tree = self.repo.head.commit.tree / dir_path
+                    digests = {blob.name: blob.hexsha for blob in tree.blobs}
+                except (KeyError, ValueError):
+                    pass
+                self._head_digests[dir_path] = digests
+            return self._head_digests[dir_path].get(evidence.name)
+
+    def index_evidence(self, evidence, written=True, refresh_ttl=False):
+        """
+        Index external evidence based on whether its content was written.
+
+        Written evidence is fully indexed.  Unchanged evidence only has its
+        metadata refreshed, when requested or when its ttl or description
+        changed, otherwise it is left as is.  Evidence already indexed by an
+        interrupted run being resumed is left as is.
+
+        :param evidence: the external evidence object.
+        :param written: whether the evidence content was written.
+        :param refresh_ttl: refresh the metadata of unchanged evidence.
+
+        :returns: the plant status, one of planted, refreshed, skipped or
+          resumed.
+        """
+        start = time.perf_counter()
+        path = self._get_path(evidence)
+        resumed = self._resumed.pop(path, None)
+        if resumed:
+            # Uncommitted evidence is listed in the commit message still.
+            # Committed evidence is in a commit of the interrupted run, which
+            # a rebase resolves conflicts of from its own changes.
+            if resumed == INDEXED:
+                self.planted.append(path)
+            status = RESUMED
+        elif written:
+            self.index(evidence)
+            status = PLANTED
+        elif refresh_ttl or self._metadata_changed(evidence):
+            self.refresh(evidence)
+            status = REFRESHED
+        else:
+            status = SKIPPED
+        seconds = time.perf_counter() - start
+        self.report.add("index", seconds, int(status in [PLANTED, REFRESHED]))
+        source, nbytes, write_seconds = self._written.pop(path, (None, 0, 0))
+        self.report.add_evidence(
+            source,
+            status,
+            evidence=path,
+            bytes=nbytes,
+            write_seconds=round(write_seconds, 6),
+            index_seconds=round(seconds, 6),
+        )
+        return status
+
+    def push(self):
+        """
+        Push the local git repository to the remote repository.
+
+        The local branch is rebased onto the remote branch before pushing.
+        Rebase conflicts caused by concurrent plants are resolved by keeping
+        the planted version of evidence files and merging index files by
+        evidence key.  Rejected pushes are retried with a jittered backoff.
+        A background batch push in progress is waited for first.
+        """
+        if not self._do_push:
+            return
+        self.wait_push()
+        with self.report.phase("push"):
+            self._push()
+
+    def wait_push(self):
+        """Wait for a background batch push in progress to complete."""
+        if self._push_thread is not None:
+            self._push_thread.join()
+            self._push_thread = None
+
+    def _push(self):
+        remote = self.repo.remote()
+        attempt = 0
+        while True:
+            self.logger.info(
+                f"Syncing local locker with remote repo {self.repo_url}..."
+            )
+            remote.fetch()
+            if not self._new_branch:
+                self.rebase(f"{remote.name}/{self.branch}")
+            self._log_large_files()
+            self.logger.info(f"Pushing local locker to remote repo {self.repo_url}...")
+            progress = PushProgress(self.logger)
+            push_info = remote.push(
+                self.branch,
+                force=get_config().get("locker.force_push", default=False),
+                set_upstream=True,
+                progress=progress,
+            )[0]
+            if not push_info.flags & PUSH_FAILED:
+                self.report.add("push", 0, progress.objects, progress.nbytes)
+                # The branch exists remotely once pushed, later batch pushes
+                # must be rebased onto it.
+                self._new_branch = False
+                if self.journal:
+                    self.journal.pushed(self.repo.head.commit.hexsha)
+                return
+            attempt += 1
+            if attempt > self.push_retries:
+                raise LockerPushError(push_info)
+            backoff = min(PUSH_BACKOFF_MAX, PUSH_BACKOFF * 2**attempt)
+            delay = random.uniform(0, backoff)  # nosec B311: not for security.
+            self.logger.warning(
+                f"Push to {self.repo_url} failed ({push_info.summary.strip()}), "
+                f"retrying in {delay:.1f}s..."
+            )
+            time.sleep(delay)
+
+    def _start_push(self, pushed=None):
+        if not self._do_push:
+            return
+        self.wait_push()
+        commit = self.repo.head.commit.hexsha
+        self.repo.git.update_ref(PUSH_REF, commit)
+        self._push_thread = threading.Thread(
+            target=self._push_commit,
+            args=(commit, pushed),
+            name=f"push-{self.repo_url}",
+            daemon=True,
+        )
+        self._push_thread.start()
+
+    def _push_commit(self, commit, pushed=None):
+        # The commit is pushed through its own ref, never the branch, so the
+        # push does not race later batches being committed.
+        self.logger.info(f"Pushing {commit} to remote repo {self.repo_url}...")
+        start = time.perf_counter()
+        progress = PushProgress(self.logger)
+        try:
+            push_info = self.repo.remote().push(
+                f"{PUSH_REF}:refs/heads/{self.branch}", progress=progress
+            )[0]
+            error = push_info.summary.strip() if push_info.flags & PUSH_FAILED else None
+        except git.exc.GitError as e:
+            error = f"{e.__class__.__name__}: {e}"
+        seconds = time.perf_counter() - start
+        if error:
+            self.report.add("push", seconds)
+            self.logger.warning(
+                f"Background push of {commit} failed ({error}), "
+                "it is left to the next push..."
+            )
+            return
+        self.report.add("push", seconds, progress.objects, progress.nbytes)
+        self._new_branch = False
+        if self.journal:
+            self.journal.pushed(commit)
+        if pushed:
+            pushed(commit)
+
+    def rebase(self, upstream):
+        """
+        Rebase the local branch onto an upstream branch.
+
+        Conflicts are resolved for each commit replayed, based on the changes
+        of that commit, so that commits of earlier runs, such as a dry run or
+        an interrupted run being resumed, are resolved as well.  Conflicting
+        evidence files keep their planted version and conflicting index
+        files are merged by evidence key, where evidence metadata changed by
+        the commit wins.  Removed evidence changed upstream keeps its
+        upstream version.  Conflicts of direct lockers are resolved in the
+        git index only.  The rebase is aborted if it cannot be completed.
+
+        :param upstream: the upstream branch, for example origin/master.
+        """
+        try:
+            self.repo.git.rebase(upstream)
+            return
+        except git.exc.GitCommandError:
+            if not self._rebase_in_progress():
+                raise
+        self.logger.info("Resolving conflicts with concurrently planted evidence...")
+        try:
+            while self._rebase_in_progress():
+                resolved = []
+                for path, stages in self._get_conflicts().items():
+                    if is_index_file(path):
+                        resolved.append((path, self._merge_conflict_metadata(path)))
+                    elif "3" in stages:
+                        # While rebasing, "theirs" is the planted version.
+                        resolved.append((path, stages["3"]))
+                    else:
+                        # Removed by the commit, "ours" is the upstream version.
+                        resolved.append((path, stages["2"]))
+                self._stage_resolved(resolved)
+                try:
+                    self.repo.git.rebase("--continue", env={"GIT_EDITOR": "true"})
+                except git.exc.GitCommandError:
+                    if not self._rebase_in_progress():
+                        raise
+        except Exception:
+            if self._rebase_in_progress():
+                self.repo.git.rebase("--abort")
+            raise
 
     def index(self, evidence, checks=None, evidence_used=None):
         """
@@ -66,20 +822,475 @@ class PlantLocker(Locker):
 
         Overrides the base Locker index method called by add_evidence.
         """
+        paths = self._get_category_paths(evidence)
+        self._index(evidence, os.path.join(paths.local_dir, evidence.name))
+        self.planted.append(self._get_path(evidence))
+
+    def refresh(self, evidence):
+        """
+        Refresh the metadata of external evidence without touching its file.
+
+        :param evidence: the external evidence object.
+        """
+        self._index(evidence)
+        self.refreshed.append(self._get_path(evidence))
+
+    def remove(self, path):
+        """
+        Remove external evidence, its files and its index metadata.
+
+        Partitioned evidence has all of its partition files removed.  Index
+        files left empty are removed as well.  Like batched index metadata,
+        removals are staged when the index is flushed.
+
+        :param path: the evidence path relative to the locker root, as an
+          example external/foo/bar.json.
+        """
+        dir_path, name = path.rsplit("/", 1)
+        self.include_category(dir_path.split("/", 1).pop())
+        local_dir = os.path.join(self.local_path, dir_path)
+        index_file = os.path.join(local_dir, INDEX_FILE)
         with self.lock:
-            index_file = self.get_index_file(evidence)
-            if not os.path.exists(index_file):
-                metadata = {}
+            metadata = self._get_metadata(index_file)
+            self._metadata[index_file] = metadata
+            partitions = metadata.pop(name, {}).get("partitions", {})
+            names = [f"{part}_{name}" for part in partitions] or [name]
+            self._removed.extend(os.path.join(local_dir, n) for n in names)
+            if index_file not in self._dirty:
+                self._dirty.append(index_file)
+            self.removed.append(path)
+
+    def read_indexes(self, categories=None):
+        """
+        Read the metadata of every external evidence index file in one pass.
+
+        Index files are listed from the locker HEAD tree and read through a
+        single git object stream.  Index files not fetched yet by a partial
+        clone are all fetched with a single fetch rather than one at a time.
+        The metadata read is kept for the locker session so that evidence
+        can be removed or compared without reading it again.
+
+        :param categories: the external evidence categories to read the
+          index files of, all categories if not provided.
+
+        :returns: a dictionary of index file path/metadata pairs, paths are
+          relative to the locker root.
+        """
+        if not self.repo.head.is_valid():
+            return {}
+        hexshas = {}
+        listing = self.repo.git.ls_tree("-r", "-z", "HEAD", "--", "external")
+        for line in filter(None, listing.split("\0")):
+            info, path = line.split("\t", 1)
+            category = PurePath(path).parent.as_posix().split("/", 1).pop()
+            if is_index_file(path) and (categories is None or category in categories):
+                hexshas[path] = info.split().pop()
+        self._fetch_missing(hexshas.values())
+        indexes = {}
+        with self.lock:
+            for path, hexsha in hexshas.items():
+                index_file = os.path.join(self.local_path, path)
+                if index_file not in self._metadata:
+                    stream = self.repo.odb.stream(bytes.fromhex(hexsha))
+                    self._metadata[index_file] = json.loads(stream.read())
+                indexes[path] = self._metadata[index_file]
+        return indexes
+
+    def _fetch_missing(self, hexshas):
+        listing = self.repo.git.rev_list(
+            "--objects", "--missing=print", "--no-walk", "HEAD"
+        )
+        missing = {line[1:] for line in listing.splitlines() if line[:1] == "?"}
+        wanted = [hexsha for hexsha in hexshas if hexsha in missing]
+        if not wanted:
+            return
+        self.logger.info(f"Fetching {len(wanted)} index files...")
+        with tempfile.TemporaryFile() as f:
+            f.write("\n".join(wanted).encode())
+            f.seek(0)
+            # The fetch git runs for a single missing object, for all of them.
+            self.repo.git(c="fetch.negotiationAlgorithm=noop").fetch(
+                self.repo.remote().name,
+                "--no-tags",
+                "--no-write-fetch-head",
+                "--filter=blob:none",
+                "--stdin",
+                istream=f,
+            )
+
+    def flush_index(self):
+        """
+        Write and stage all index files touched while batch indexing.
+
+        Each touched index file is written once and every touched path is
+        added to the git index with a single call.  Removed evidence files,
+        and index files left empty, are removed from the git index with a
+        single call as well.  Direct lockers stage the blob objects of touched
+        paths instead.
+        """
+        with self.lock:
+            if not self._dirty:
+                return
+            if self.direct:
+                self._stage_blobs()
             else:
-                metadata = json.loads(open(index_file).read())
-            planter = self.repo.config_reader().get_value("user", "email")
-            metadata[evidence.name] = {
+                removed = list(self._removed)
+                for index_file in self._dirty:
+                    if not self._metadata[index_file]:
+                        removed.append(index_file)
+                        continue
+                    with open(index_file, "w") as f:
+                        f.write(format_json(self._metadata[index_file]))
+                added = [f for f in self._dirty if f not in removed]
+                if added or self._unstaged:
+                    self.repo.index.add(added + self._unstaged)
+                if removed:
+                    self.repo.index.remove(removed, working_tree=True)
+            self._dirty = []
+            self._unstaged = []
+            self._removed = []
+            if self.journal:
+                self.journal.indexed(self._journal_pending)
+                self._journal_pending = []
+
+    def _write_evidence_file(
+        self, evidence, source, stat, link, skip_unchanged, digest=None, storage=None
+    ):
+        self.include_category(evidence.category)
+        if skip_unchanged and self.is_unchanged(evidence, source, digest, storage):
+            return False
+        if self.direct:
+            self._store_evidence_file(evidence, source, stat, storage)
+            return True
+        local_dir = self._get_category_paths(evidence).local_dir
+        if local_dir not in self._category_dirs:
+            os.makedirs(local_dir, exist_ok=True)
+            self._category_dirs.add(local_dir)
+        target = Path(local_dir, evidence.name)
+        # Never write through an existing file, it may be a hard link.
+        if target.exists() or target.is_symlink():
+            target.unlink()
+        if storage and "blob_location" in storage:
+            blob_digest = storage["original_digest"].split(":", 1).pop()
+            location = self.blob_store.put(source, blob_digest)
+            target.write_text(format_pointer(blob_digest, stat.st_size, location))
+            return True
+        if storage:
+            compress_file(source, target, storage["codec"])
+            return True
+        if link and stat.st_dev == os.stat(local_dir).st_dev:
+            try:
+                os.link(source, target)
+                return True
+            except OSError:
+                pass
+        copy_file(source, target)
+        return True
+
+    def _store_evidence_file(self, evidence, source, stat, storage=None):
+        target = os.path.join(
+            self._get_category_paths(evidence).local_dir, evidence.name
+        )
+        if storage and "blob_location" in storage:
+            blob_digest = storage["original_digest"].split(":", 1).pop()
+            location = self.blob_store.put(source, blob_digest)
+            pointer = format_pointer(blob_digest, stat.st_size, location).encode()
+            hexsha = self._store_blob(BytesIO(pointer), len(pointer))
+        elif storage:
+            with tempfile.NamedTemporaryFile(dir=self.repo.git_dir) as f:
+                compress_file(source, f.name, storage["codec"])
+                with open(f.name, "rb") as stream:
+                    hexsha = self._store_blob(stream, os.fstat(stream.fileno()).st_size)
+        else:
+            with open(source, "rb") as stream:
+                hexsha = self._store_blob(stream, stat.st_size)
+        with self.lock:
+            self._stored[target] = hexsha
+
+    def _store_blob(self, stream, size):
+        # Objects are written in process, the repository object database
+        # runs git hash-object for every object.
+        if self._objects is None:
+            self._objects = LooseObjectDB(os.path.join(self.repo.common_dir, "objects"))
+        return self._objects.store(IStream(git.Blob.type, size, stream)).binsha.hex()
+
+    def _stage_blobs(self):
+        entries = []
+        for index_file in self._dirty:
+            if not self._metadata[index_file]:
+                entries.append((index_file, None))
+                continue
+            content = format_json(self._metadata[index_file]).encode()
+            entries.append(
+                (index_file, self._store_blob(BytesIO(content), len(content)))
+            )
+        entries.extend((path, self._stored.pop(path)) for path in self._unstaged)
+        entries.extend((path, None) for path in self._removed)
+        self._update_index(
+            [
+                (os.path.relpath(path, self.local_path), hexsha)
+                for path, hexsha in entries
+            ]
+        )
+
+    def _update_index(self, entries):
+        with tempfile.TemporaryFile() as f:
+            for path, hexsha in entries:
+                # A zero mode and object name removes the path from the index.
+                entry = f"{BLOB_MODE} {hexsha}" if hexsha else f"0 {NULL_SHA}"
+                f.write(f"{entry}\t{path}\0".encode())
+            f.seek(0)
+            self.repo.git.update_index("-z", "--index-info", istream=f)
+        # Staged paths are outside the sparse checkout, never in the tree.
+        self.repo.git.sparse_checkout("reapply")
+
+    def get_planter(self):
+        """
+        Provide the planter identity recorded in evidence index metadata.
+
+        The identity is the git user email, read from the git configuration
+        once per locker session.
+
+        :returns: the planter email address.
+        """
+        if self._planter is None:
+            self._planter = self.repo.config_reader().get_value("user", "email")
+        return self._planter
+
+    def get_index_file(self, evidence):
+        """
+        Provide the full path to the index file of the given evidence.
+
+        Paths are resolved once per category for the locker session.
+
+        :param evidence: the evidence object to be used.
+        """
+        return self._get_category_paths(evidence).index_file
+
+    def _get_category_paths(self, evidence):
+        key = (evidence.rootdir, evidence.category)
+        paths = self._category_paths.get(key)
+        if paths is None:
+            dir_path = evidence.dir_path
+            local_dir = os.path.join(self.local_path, dir_path)
+            paths = CategoryPaths(
+                dir_path, local_dir, os.path.join(local_dir, INDEX_FILE)
+            )
+            self._category_paths[key] = paths
+        return paths
+
+    def _get_path(self, evidence):
+        return f"{self._get_category_paths(evidence).dir_path}/{evidence.name}"
+
+    def _get_storage(self, source, stat, compress=None):
+        if self.blob_store and stat.st_size > self.blob_threshold:
+            digest = file_digest(source)
+            return {
+                "blob_location": self.blob_store.get_location(digest),
+                "original_size": stat.st_size,
+                "original_digest": f"sha256:{digest}",
+            }
+        if compress:
+            return {
+                "codec": compress,
+                "original_size": stat.st_size,
+                "original_digest": f"sha256:{file_digest(source)}",
+            }
+
+    def _index(self, evidence, evidence_file=None):
+        self.include_category(evidence.category)
+        with self.lock:
+            index_file = self.get_index_file(evidence)
+            metadata = self._get_metadata(index_file)
+            path = self._get_path(evidence)
+            entry = {
                 "last_update": self.commit_date,
                 "ttl": evidence.ttl,
-                "planted_by": planter,
+                "planted_by": self.get_planter(),
                 "description": evidence.description,
             }
-            with open(index_file, "w") as f:
-                f.write(format_json(metadata))
-            self.repo.index.add([index_file, self.get_file(evidence.path)])
-            self.planted.append(evidence.path)
+            if evidence_file:
+                entry.update(self._storage.pop(path, {}))
+            else:
+                # Refreshed evidence keeps its file, compressed or stored.
+                current = metadata.get(evidence.name, {})
+                entry.update({k: current[k] for k in STORAGE_KEYS if k in current})
+            metadata[evidence.name] = entry
+            paths = [evidence_file] if evidence_file else []
+            if self.batch_index:
+                if index_file not in self._dirty:
+                    self._dirty.append(index_file)
+                self._unstaged.extend(paths)
+                if self.journal and evidence_file:
+                    self._journal_pending.append(path)
+            else:
+                with open(index_file, "w") as f:
+                    f.write(format_json(metadata))
+                self.repo.index.add([index_file] + paths)
+                if self.journal and evidence_file:
+                    self.journal.indexed([path])
+
+    def _metadata_changed(self, evidence):
+        self.include_category(evidence.category)
+        with self.lock:
+            metadata = self._get_metadata(self.get_index_file(evidence))
+            current = metadata.get(evidence.name, {})
+        return (
+            current.get("ttl") != evidence.ttl
+            or current.get("description") != evidence.description
+        )
+
+    def _rebase_in_progress(self):
+        git_dir = Path(self.repo.git_dir)
+        return (git_dir / "rebase-merge").is_dir() or (
+            git_dir / "rebase-apply"
+        ).is_dir()
+
+    def _get_conflicts(self):
+        conflicts = {}
+        listing = self.repo.git.ls_files("-u", "-z")
+        for line in filter(None, listing.split("\0")):
+            info, path = line.split("\t", 1)
+            _, hexsha, stage = info.split()
+            conflicts.setdefault(path, {})[stage] = hexsha
+        return conflicts
+
+    def _merge_conflict_metadata(self, path):
+        base = self._get_conflict_metadata(path, 1)
+        planted = self._get_conflict_metadata(path, 3)
+        # Only the evidence changed by the commit being replayed is merged.
+        names = {name for name in planted if planted[name] != base.get(name)}
+        removed = {name for name in base if name not in planted}
+        metadata = merge_index_metadata(
+            self._get_conflict_metadata(path, 2), planted, names, removed, base
+        )
+        return format_json(metadata).encode() if metadata else None
+
+    def _stage_resolved(self, resolved):
+        """
+        Stage conflict resolutions.
+
+        :param resolved: path/resolution pairs, a resolution is either the
+          resolved content, the object name of the version kept or None if
+          the path is removed.
+        """
+        if self.direct:
+            self._stage_resolved_objects(resolved)
+            return
+        for path, resolution in resolved:
+            local_file = Path(self.local_path, path)
+            # Conflicts can be outside of the categories of a sparse checkout.
+            if resolution is None:
+                self.repo.git.rm("-q", "--sparse", "--", path)
+                continue
+            if isinstance(resolution, str):
+                resolution = self.repo.odb.stream(bytes.fromhex(resolution)).read()
+            local_file.parent.mkdir(parents=True, exist_ok=True)
+            local_file.write_bytes(resolution)
+            self.repo.git.add("--sparse", "--", path)
+
+    def _stage_resolved_objects(self, resolved):
+        # Direct locker categories are never checked out, resolutions are
+        # staged as git objects.
+        entries = []
+        for path, resolution in resolved:
+            if isinstance(resolution, bytes):
+                resolution = self._store_blob(BytesIO(resolution), len(resolution))
+            entries.append((path, resolution))
+            # Conflicting files are written to the working tree, even outside
+            # of the sparse checkout, and would be left behind.
+            local_file = os.path.join(self.local_path, path)
+            if os.path.lexists(local_file):
+                os.remove(local_file)
+        self._update_index(entries)
+
+    def _get_conflict_metadata(self, path, stage):
+        try:
+            return json.loads(self.repo.git.show(f":{stage}:{path}"))
+        except git.exc.GitCommandError:
+            return {}
+
+    def _get_metadata(self, index_file):
+        if index_file in self._metadata:
+            return self._metadata[index_file]
+        metadata = {}
+        if not self.direct and os.path.exists(index_file):
+            metadata = json.loads(open(index_file).read())
+        else:
+            # Index files not in the working tree are read from the committed
+            # tree, an index file is only empty if it is not committed either.
+            path = os.path.relpath(index_file, self.local_path)
+            try:
+                blob = self.repo.head.commit.tree / path
+                metadata = json.loads(blob.data_stream.read())
+            except (KeyError, ValueError):
+                pass
+        if self.batch_index:
+            self._metadata[index_file] = metadata
+        return metadata
+
+
+def merge_index_metadata(upstream, planted, names, removed=(), base=None):
+    """
+    Merge index file metadata changed both upstream and by a plant.
+
+    Removed evidence metadata is only removed if it is unchanged upstream.
+
+    :param upstream: the upstream index file metadata.
+    :param planted: the planted index file metadata.
+    :param names: the names of the evidence planted.
+    :param removed: the names of the evidence removed.
+    :param base: the index file metadata both changes are based on.
+
+    :returns: the upstream metadata updated with planted evidence metadata.
+    """
+    metadata = dict(upstream)
+    for name in names:
+        if name in planted:
+            metadata[name] = planted[name]
+    base = base or {}
+    for name in removed:
+        if name not in planted and metadata.get(name) == base.get(name):
+            metadata.pop(name, None)
+    return metadata
+
+
+def copy_file(source, target, chunk_size=CHUNK_SIZE):
+    """
+    Copy a file in chunks without loading it into memory.
+
+    Uses ``os.copy_file_range`` where available, letting the kernel copy the
+    data (or reflink it on file systems that support it), and falls back to a
+    buffered chunked copy.
+
+    :param source: the path to the file to copy.
+    :param target: the path to copy the file to.
+    :param chunk_size: the maximum number of bytes copied per operation.
+    """
+    with open(source, "rb") as fsrc, open(target, "wb") as fdst:
+        if hasattr(os, "copy_file_range"):
+            try:
+                while os.copy_file_range(fsrc.fileno(), fdst.fileno(), chunk_size):
+                    pass
+                return
+            except OSError:
+                fsrc.seek(0)
+                fdst.seek(0)
+                fdst.truncate()
+        shutil.copyfileobj(fsrc, fdst, chunk_size)
+
+
+def git_blob_digest(path, chunk_size=CHUNK_SIZE):
+    """
+    Provide the git blob object digest of a file without loading it.
+
+    :param path: the path to the file.
+    :param chunk_size: the maximum number of bytes read at a time.
+
+    :returns: the hexadecimal digest git would assign to the file content.
+    """
+    digest = hashlib.sha1(f"blob {os.path.getsize(path)}\0".encode())  # nosec B324
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
@@ -0,0 +1,335 @@
+# Copyright (c) 2020 IBM Corp. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Plant manifest (config file) parsing."""
+
+import fnmatch
+import json
+import os
+import stat
+from collections import namedtuple
+from pathlib import Path
+
+from plant.compression import get_codec_error
+from plant.utils import ordered_map
+
+JSONL_EXTENSIONS = (".jsonl", ".ndjson")
+EXPANSION_OPTIONS = ("include", "exclude", "recursive", "subdir_category")
+MAGIC = ("*", "?", "[")
+
+Preflight = namedtuple("Preflight", ["files", "bytes", "problems"])
+
+
+class ManifestError(ValueError):
+    """Raised when a plant manifest cannot be parsed."""
+
+
+class Manifest(object):
+    """
+    Evidence path/detail pairs provided by a plant config file.
+
+    A JSON config file holds a single dictionary of evidence path/detail
+    pairs and is parsed as a whole.  A JSON Lines config file (``.jsonl`` or
+    ``.ndjson``) holds one JSON object per line and is parsed one line at a
+    time while iterating, so memory use does not grow with the file size.
+    Each line is either a dictionary of evidence path/detail pairs or an
+    evidence detail dictionary that includes the evidence ``path``.
+
+    A manifest can be iterated over multiple times.
+    """
+
+    def __init__(self, path):
+        """
+        Construct and initialize the manifest object.
+
+        :param path: the path to the config file.
+        """
+        self.path = os.path.expanduser(path)
+
+    @property
+    def is_jsonl(self):
+        """Manifest JSON Lines format status."""
+        return self.path.lower().endswith(JSONL_EXTENSIONS)
+
+    def __iter__(self):
+        """Provide evidence path/detail pairs."""
+        return self.entries()
+
+    def entries(self, errors=None):
+        """
+        Provide evidence path/detail pairs.
+
+        :param errors: a list that the errors of invalid JSON Lines lines are
+          appended to.  Invalid lines are then skipped rather than raising a
+          ManifestError, so that every invalid line is found.
+
+        :returns: an iterator of evidence path/detail pairs.
+        """
+        if self.is_jsonl:
+            return self._iter_jsonl(errors)
+        return iter(json.loads(open(self.path).read()).items())
+
+    def _iter_jsonl(self, errors):
+        with open(self.path) as f:
+            for line_number, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield from self._parse_line(line_number, line)
+                except ManifestError as e:
+                    if errors is None:
+                        raise
+                    errors.append(str(e))
+
+    def _parse_line(self, line_number, line):
+        try:
+            entry = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise self._error(line_number, f"invalid JSON, {e.msg}")
+        if not isinstance(entry, dict):
+            raise self._error(line_number, "entry must be a JSON object")
+        if "path" in entry:
+            entry = {entry.pop("path"): entry}
+        for file_path, details in entry.items():
+            if not isinstance(details, dict) or "category" not in details:
+                raise self._error(
+                    line_number, f"{file_path} details must have a category"
+                )
+        return entry.items()
+
+    def _error(self, line_number, msg):
+        return ManifestError(f"{self.path} line {line_number}: {msg}")
+
+
+def expand(entries):
+    """
+    Expand directory and glob pattern entries into evidence file entries.
+
+    Entries whose path is a directory or a glob pattern are expanded into an
+    entry per file found, all sharing the entry details.  Existing file paths
+    are never treated as glob patterns, even if they contain ``*``, ``?`` or
+    ``[`` characters.  Files are found
+    lazily, one directory at a time, in a deterministic (sorted) order.  The
+    entry details can also include the following options:
+
+    - ``include``: a list of file name patterns, only matching files are kept.
+    - ``exclude``: a list of file name patterns, matching files are dropped.
+    - ``recursive``: if True, also find files in sub-directories of a
+      directory entry.  Glob patterns are recursive when they contain ``**``.
+    - ``subdir_category``: if True, files found in a sub-directory are
+      planted in a category sub-folder named after the sub-directory.
+
+    :param entries: an iterable of evidence path/detail pairs.
+
+    :returns: a generator of evidence file path/detail pairs.
+    """
+    for path, details in entries:
+        is_glob = any(c in path for c in MAGIC)
+        if os.path.isfile(path) or not (is_glob or Path(path).is_dir()):
+            yield path, details
+            continue
+        options = {k: details.get(k) for k in EXPANSION_OPTIONS}
+        for k in ("include", "exclude"):
+            if options[k] is None:
+                options[k] = []
+            elif isinstance(options[k], str):
+                options[k] = [options[k]]
+            elif not isinstance(options[k], list):
+                raise ManifestError(f"{path}: {k} must be a list of file patterns")
+        shared = {k: v for k, v in details.items() if k not in EXPANSION_OPTIONS}
+        if is_glob:
+            root, recursive = _glob_root(path)
+            matches = _glob_matcher(path)
+        else:
+            root, recursive = path, bool(options["recursive"])
+            matches = None
+        for file_path in _walk(root, recursive):
+            if matches and not matches(file_path):
+                continue
+            name = os.path.basename(file_path)
+            if options["include"] and not _match_any(name, options["include"]):
+                continue
+            if _match_any(name, options["exclude"]):
+                continue
+            file_details = dict(shared)
+            subdir = os.path.relpath(os.path.dirname(file_path), root)
+            if options["subdir_category"] and subdir != os.curdir:
+                subdir = subdir.replace(os.sep, "/")
+                file_details["category"] = f'{shared["category"]}/{subdir}'
+            yield file_path, file_details
+
+
+def to_evidence(path, details):
+    """
+    Provide the external evidence planted from an evidence path/detail pair.
+
+    :param path: the evidence file path.
+    :param details: the evidence detail dictionary.
+
+    :returns: the external evidence object.
+    """
+    from compliance.evidence import ExternalEvidence, YEAR
+
+    return ExternalEvidence(
+        path.rsplit("/", 1).pop(),
+        details["category"],
+        details.get("ttl", YEAR),
+        details.get("description", ""),
+    )
+
+
+def preflight(entries, workers=1):
+    """
+    Validate evidence path/detail pairs before planting any of them.
+
+    Entry details must be a dictionary with a non-empty ``category`` string,
+    an optional positive integer ``ttl`` and an optional ``description``
+    string.  Directory and glob pattern entries are expanded and every
+    evidence file found must be a readable regular file.  Directory and glob
+    pattern entries must provide at least one evidence file.  No two evidence
+    files can be planted with the same name in the same category.  All
+    problems found, including every invalid line of a JSON Lines manifest,
+    are reported rather than only the first one.
+
+    Every entry is read and every evidence destination is kept while
+    checking, so memory use grows with the number of evidence files even for
+    a JSON Lines manifest.
+
+    :param entries: an iterable of evidence path/detail pairs.
+    :param workers: the number of threads checking evidence files.
+
+    :returns: a preflight summary with the number of evidence files, their
+      total size in bytes and a list of problems found.
+    """
+    files = total = 0
+    problems = []
+    destinations = {}
+    empty = []
+    if isinstance(entries, Manifest):
+        entries = entries.entries(problems)
+    checked = _check_details(entries, problems)
+    try:
+        for path, details, size, problem in ordered_map(
+            _check_file, _expand_each(checked, empty), workers
+        ):
+            if problem:
+                problems.append(f"{path}: {problem}")
+                continue
+            files += 1
+            total += size
+            name = os.path.basename(path)
+            destination = f'external/{details["category"]}/{name}'
+            if destination in destinations:
+                problems.append(
+                    f"{path}: planted as {destination} "
+                    f"by {destinations[destination]} as well"
+                )
+                continue
+            destinations[destination] = path
+    except (ManifestError, OSError) as e:
+        problems.append(str(e))
+    problems.extend(f"{path}: no evidence files found" for path in empty)
+    return Preflight(files, total, problems)
+
+
+def _expand_each(entries, empty):
+    for entry in entries:
+        found = False
+        for expanded in expand([entry]):
+            found = True
+            yield expanded
+        if not found:
+            empty.append(entry[0])
+
+
+def _check_details(entries, problems):
+    for path, details in entries:
+        if not isinstance(details, dict):
+            problems.append(f"{path}: details must be a JSON object")
+            continue
+        category = details.get("category")
+        if not (isinstance(category, str) and category.strip("/")):
+            problems.append(f"{path}: details must have a category")
+            continue
+        ttl = details.get("ttl")
+        if ttl is not None and (
+            isinstance(ttl, bool) or not isinstance(ttl, int) or ttl <= 0
+        ):
+            problems.append(f"{path}: ttl must be a positive number of seconds")
+            continue
+        if not isinstance(details.get("description", ""), str):
+            problems.append(f"{path}: description must be a string")
+            continue
+        codec = details.get("compress")
+        if codec and get_codec_error(codec):
+            problems.append(f"{path}: {get_codec_error(codec)}")
+            continue
+        yield path, details
+
+
+def _check_file(entry):
+    path, details = entry
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return path, details, 0, "evidence file not found"
+    except OSError as e:
+        return path, details, 0, e.strerror or str(e)
+    if not stat.S_ISREG(st.st_mode):
+        return path, details, 0, "evidence is not a regular file"
+    if not os.access(path, os.R_OK):
+        return path, details, 0, "evidence file is not readable"
+    return path, details, st.st_size, None
+
+
+def _walk(root, recursive):
+    try:
+        with os.scandir(root) as it:
+            entries = sorted(it, key=lambda entry: entry.name)
+    except (FileNotFoundError, NotADirectoryError):
+        return
+    for entry in entries:
+        if entry.is_dir():
+            if recursive:
+                yield from _walk(entry.path, recursive)
+        elif entry.is_file():
+            yield entry.path
+
+
+def _glob_root(pattern):
+    parts = pattern.split("/")
+    for i, part in enumerate(parts):
+        if any(c in part for c in MAGIC):
+            root = "/".join(parts[:i]) or "/"
+            recursive = "**" in pattern or i < len(parts) - 1
+            return root, recursive
+    return pattern, False
+
+
+def _glob_matcher(pattern):
+    if "**" in pattern:
+        return lambda path: fnmatch.fnmatchcase(path, pattern)
+    parts = pattern.split("/")
+
+    def matches(path):
+        path_parts = path.split("/")
+        return len(path_parts) == len(parts) and all(
+            fnmatch.fnmatchcase(p, m) for p, m in zip(path_parts, parts)
+        )
+
+    return matches
+
+
+def _match_any(name, patterns):
+    return any(fnmatch.fnmatchcase(name, pattern) for pattern in patterns)
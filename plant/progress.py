@@ -0,0 +1,104 @@
+# Copyright (c) 2020 IBM Corp. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Plant batch progress."""
+
+import json
+import os
+from datetime import datetime, timezone
+from threading import Lock
+
+
+class PlantProgress(object):
+    """
+    Progress of a batched plant run, persisted to a file.
+
+    For each locker, the number of config entries already pushed to the
+    locker is recorded along with the pushed commit.  Progress only applies
+    to the config it was recorded for, progress recorded for any other
+    config is discarded.
+    """
+
+    def __init__(self, path, config_digest):
+        """
+        Construct and initialize the plant progress object.
+
+        :param path: the path to the progress file.
+        :param config_digest: the digest identifying the plant config.
+        """
+        self.path = os.path.expanduser(path)
+        self.config_digest = config_digest
+        self.discarded = False
+        self._lock = Lock()
+        self._lockers = self._load()
+
+    def get(self, locker):
+        """
+        Provide the number of config entries already pushed to a locker.
+
+        :param locker: the locker key.
+
+        :returns: the number of config entries pushed.
+        """
+        with self._lock:
+            return self._lockers.get(locker, {}).get("entries", 0)
+
+    def record(self, locker, entries, commit=None):
+        """
+        Record the number of config entries pushed to a locker.
+
+        :param locker: the locker key.
+        :param entries: the number of config entries pushed.
+        :param commit: the pushed commit hexsha.
+        """
+        with self._lock:
+            self._lockers[locker] = {
+                "entries": entries,
+                "commit": commit,
+                "updated": datetime.now(timezone.utc).isoformat(),
+            }
+            self._save()
+
+    def clear(self, locker):
+        """
+        Remove the progress of a locker once all of its entries are pushed.
+
+        The progress file is removed when no locker progress is left.
+
+        :param locker: the locker key.
+        """
+        with self._lock:
+            if self._lockers.pop(locker, None) is not None or self.discarded:
+                self._save()
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                progress = json.load(f)
+        except FileNotFoundError:
+            return {}
+        if progress.get("config") != self.config_digest:
+            self.discarded = True
+            return {}
+        return progress.get("lockers", {})
+
+    def _save(self):
+        if not self._lockers:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            return
+        progress = {"config": self.config_digest, "lockers": self._lockers}
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(json.dumps(progress, indent=2))
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,107 @@
+# Copyright (c) 2020 IBM Corp. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Plant run reporting."""
+
+import time
+from contextlib import contextmanager
+from threading import Lock
+
+PLANTED = "planted"
+REFRESHED = "refreshed"
+SKIPPED = "skipped"
+RESUMED = "resumed"
+ADD = "add"
+UPDATE = "update"
+METADATA = "metadata"
+UNCHANGED = "unchanged"
+
+
+class RunReport(object):
+    """
+    Plant run timings, file counts and byte counts.
+
+    Time, files and bytes are accumulated per run phase (clone, write,
+    index, checkin, push, ...).  Phases recorded from multiple threads add
+    up the time spent in each thread.  Evidence level details are only kept
+    when requested.
+    """
+
+    def __init__(self, evidence=False):
+        """
+        Construct and initialize the run report object.
+
+        :param evidence: if True, keep a record for each evidence planted.
+        """
+        self.phases = {}
+        self.counts = {}
+        self.evidence = [] if evidence else None
+        self._lock = Lock()
+
+    @contextmanager
+    def phase(self, name, files=0, nbytes=0):
+        """
+        Time a run phase.
+
+        :param name: the phase name.
+        :param files: the number of files processed by the phase.
+        :param nbytes: the number of bytes processed by the phase.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start, files, nbytes)
+
+    def add(self, name, seconds, files=0, nbytes=0):
+        """
+        Add time, files and bytes to a run phase.
+
+        :param name: the phase name.
+        :param seconds: the time spent in the phase.
+        :param files: the number of files processed by the phase.
+        :param nbytes: the number of bytes processed by the phase.
+        """
+        with self._lock:
+            phase = self.phases.setdefault(
+                name, {"seconds": 0.0, "files": 0, "bytes": 0}
+            )
+            phase["seconds"] += seconds
+            phase["files"] += files
+            phase["bytes"] += nbytes
+
+    def add_evidence(self, path, status, **details):
+        """
+        Record the outcome of planting an evidence file.
+
+        :param path: the evidence source file path.
+        :param status: the plant status (planted, refreshed or skipped).
+        :param details: additional evidence details, like timings and size.
+        """
+        with self._lock:
+            self.counts[status] = self.counts.get(status, 0) + 1
+            if self.evidence is not None:
+                self.evidence.append(dict(path=path, status=status, **details))
+
+    def as_dict(self):
+        """Provide the report as a JSON serializable dictionary."""
+        report = {
+            "phases": {
+                name: dict(phase, seconds=round(phase["seconds"], 6))
+                for name, phase in self.phases.items()
+            },
+            "counts": dict(self.counts),
+        }
+        if self.evidence is not None:
+            report["evidence"] = list(self.evidence)
+        return report
@@ -0,0 +1,339 @@
+# Copyright (c) 2020 IBM Corp. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Plant server."""
+
+import hmac
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from functools import partial
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from socketserver import ThreadingMixIn, UnixStreamServer
+
+from plant.manifest import ManifestError, expand, preflight, to_evidence
+from plant.utils import ordered_map
+
+logger = logging.getLogger("plant.server")
+
+MAX_REQUEST_BYTES = 1024 * 1024
+
+
+class PlantRequestError(ValueError):
+    """Raised when a plant request is invalid."""
+
+
+class PlantRequest(object):
+    """A plant request waiting to be planted into a locker."""
+
+    def __init__(self, entries, refresh_ttl=False):
+        """
+        Construct and initialize the plant request object.
+
+        :param entries: the evidence path/detail pairs to plant, with
+          directories and glob patterns already expanded.
+        :param refresh_ttl: refresh the metadata of unchanged evidence.
+        """
+        self.entries = entries
+        self.refresh_ttl = refresh_ttl
+        self.future = Future()
+
+
+class LockerWorker(threading.Thread):
+    """
+    Plant requests into a locker kept open for the lifetime of the worker.
+
+    Requests that arrive within the coalesce window of the first request
+    waiting are planted together, in a single commit and push.
+    """
+
+    def __init__(self, locker, push=True, coalesce=1.0, max_batch=100, workers=1):
+        """
+        Construct and initialize the locker worker thread.
+
+        :param locker: the initialized plant locker.
+        :param push: push each commit to the remote locker.
+        :param coalesce: the seconds to wait for more requests to plant
+          together with a request.
+        :param max_batch: the maximum number of requests planted together.
+        :param workers: the number of threads writing evidence files.
+        """
+        super().__init__(name=f"plant-{locker.repo_url}", daemon=True)
+        self.locker = locker
+        self.push = push
+        self.coalesce = coalesce
+        self.max_batch = max_batch
+        self.workers = workers
+        self.requests = queue.Queue()
+
+    def submit(self, request):
+        """
+        Queue a plant request.
+
+        :param request: the plant request.
+
+        :returns: the future plant request result.
+        """
+        self.requests.put(request)
+        return request.future
+
+    def stop(self):
+        """Stop the worker once queued requests are planted."""
+        self.requests.put(None)
+
+    def run(self):
+        """Plant queued requests in batches until stopped."""
+        stopped = False
+        while not stopped:
+            request = self.requests.get()
+            if request is None:
+                break
+            batch = [request]
+            deadline = time.monotonic() + self.coalesce
+            while len(batch) < self.max_batch:
+                try:
+                    request = self.requests.get(
+                        timeout=max(0, deadline - time.monotonic())
+                    )
+                except queue.Empty:
+                    break
+                if request is None:
+                    stopped = True
+                    break
+                batch.append(request)
+            self.plant(batch)
+
+    def plant(self, batch):
+        """
+        Plant a batch of requests in a single commit.
+
+        If the batch cannot be planted, every request of the batch fails and
+        the local locker is reset to the remote locker.
+
+        :param batch: the plant requests.
+        """
+        locker = self.locker
+        write = partial(_write_evidence, locker)
+        try:
+            results = []
+            for request in batch:
+                statuses = []
+                for path, evidence, written in ordered_map(
+                    write, request.entries, self.workers
+                ):
+                    status = locker.index_evidence(
+                        evidence, written, request.refresh_ttl
+                    )
+                    statuses.append(
+                        {"path": path, "evidence": evidence.path, "status": status}
+                    )
+                results.append(statuses)
+            locker.checkin_batch(push=self.push)
+            commit = locker.repo.head.commit.hexsha
+        except Exception as e:
+            logger.exception(f"Planting into {locker.repo_url} failed")
+            for request in batch:
+                request.future.set_exception(e)
+            try:
+                locker.discard()
+            except Exception:
+                logger.exception(f"Resetting {locker.local_path} failed")
+            return
+        for request, statuses in zip(batch, results):
+            request.future.set_result(
+                {
+                    "locker": locker.repo_url,
+                    "commit": commit,
+                    "pushed": self.push,
+                    "requests": len(batch),
+                    "evidence": statuses,
+                }
+            )
+
+
+class PlantRequestHandler(BaseHTTPRequestHandler):
+    """
+    Handle plant HTTP requests.
+
+    ``POST /plant`` plants evidence.  The request body is a JSON object with
+    a ``config`` of evidence path/detail pairs, the same as the plant
+    ``--config`` option, the ``locker`` URL (optional when a single locker is
+    served) and an optional ``refresh_ttl`` flag.  The response holds the
+    commit evidence was planted in and the status of each evidence.
+
+    ``GET /health`` provides the lockers served.
+
+    When the server has a token, every request must provide it as an
+    ``Authorization: Bearer <token>`` header.
+    """
+
+    server_version = "plant"
+
+    def do_GET(self):
+        """Provide the plant server health."""
+        if not self._authorized():
+            return
+        if self.path != "/health":
+            self._respond(HTTPStatus.NOT_FOUND, {"error": "Not found."})
+            return
+        self._respond(HTTPStatus.OK, {"lockers": list(self.server.plant_workers)})
+
+    def do_POST(self):
+        """Plant evidence."""
+        if not self._authorized():
+            return
+        if self.path != "/plant":
+            self._respond(HTTPStatus.NOT_FOUND, {"error": "Not found."})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+        except ValueError:
+            length = -1
+        if length < 0 or length > self.server.plant_max_request_bytes:
+            self.close_connection = True
+            self._respond(
+                HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                {
+                    "error": "Plant requests must be at most "
+                    f"{self.server.plant_max_request_bytes} bytes."
+                },
+            )
+            return
+        try:
+            worker, request = self._get_request(length)
+        except PlantRequestError as e:
+            self._respond(HTTPStatus.BAD_REQUEST, {"error": str(e)})
+            return
+        try:
+            result = worker.submit(request).result()
+        except Exception as e:
+            self._respond(
+                HTTPStatus.INTERNAL_SERVER_ERROR,
+                {"error": f"{e.__class__.__name__}: {e}"},
+            )
+            return
+        self._respond(HTTPStatus.OK, result)
+
+    def log_message(self, format, *args):
+        """Log requests through the plant server logger."""
+        logger.info(format % args)
+
+    def _authorized(self):
+        token = self.server.plant_token
+        if token is None:
+            return True
+        provided = self.headers.get("Authorization", "")
+        if hmac.compare_digest(provided.encode(), f"Bearer {token}".encode()):
+            return True
+        self.close_connection = True
+        self._respond(HTTPStatus.UNAUTHORIZED, {"error": "Unauthorized."})
+        return False
+
+    def _get_request(self, length):
+        try:
+            body = json.loads(self.rfile.read(length))
+            config = body["config"]
+            if not isinstance(config, dict):
+                raise ValueError("config must be a JSON object")
+        except (KeyError, TypeError, ValueError) as e:
+            raise PlantRequestError(f"Invalid plant request: {e}")
+        workers = self.server.plant_workers
+        locker = body.get("locker")
+        if locker is None and len(workers) == 1:
+            locker = next(iter(workers))
+        if locker not in workers:
+            raise PlantRequestError(f"Locker {locker} is not served.")
+        checked = preflight(config.items())
+        if checked.problems:
+            raise PlantRequestError("; ".join(checked.problems))
+        try:
+            entries = list(expand(config.items()))
+        except (ManifestError, OSError) as e:
+            raise PlantRequestError(str(e))
+        request = PlantRequest(entries, bool(body.get("refresh_ttl", False)))
+        return workers[locker], request
+
+    def _respond(self, status, content):
+        body = json.dumps(content, indent=2).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class UnixHTTPServer(ThreadingMixIn, UnixStreamServer):
+    """HTTP server listening on a Unix domain socket."""
+
+    daemon_threads = True
+
+    def get_request(self):
+        """Accept a connection, Unix sockets provide no client address."""
+        request, _ = super().get_request()
+        return request, ("local", 0)
+
+
+def create_server(
+    workers,
+    socket_path=None,
+    host="127.0.0.1",
+    port=0,
+    token=None,
+    max_request_bytes=MAX_REQUEST_BYTES,
+):
+    """
+    Create a plant HTTP server.
+
+    The Unix domain socket is only accessible to the user running the
+    server.  Anyone who can connect to a TCP server can plant evidence
+    unless a token is required.
+
+    :param workers: the locker workers by locker URL.
+    :param socket_path: the path of a Unix domain socket to listen on.
+    :param host: the host to listen on when no socket path is provided.
+    :param port: the port to listen on when no socket path is provided.
+    :param token: the token requests must provide as a bearer token.
+    :param max_request_bytes: the maximum plant request body size.
+
+    :returns: the HTTP server.
+    """
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        umask = os.umask(0o177)
+        try:
+            server = UnixHTTPServer(socket_path, PlantRequestHandler)
+        finally:
+            os.umask(umask)
+        os.chmod(socket_path, 0o600)
+    else:
+        server = ThreadingHTTPServer((host, port), PlantRequestHandler)
+        server.daemon_threads = True
+    server.plant_workers = workers
+    server.plant_token = token
+    server.plant_max_request_bytes = max_request_bytes
+    return server
+
+
+def _write_evidence(locker, item):
+    path, details = item
+    evidence = to_evidence(path, details)
+    written = locker.write_evidence_file(
+        evidence, path, skip_unchanged=True, compress=details.get("compress") or None
+    )
+    return path, evidence, written
@@ -0,0 +1,180 @@
+# Copyright (c) 2020 IBM Corp. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Plant evidence spool."""
+
+import fcntl
+import json
+import os
+import shutil
+import time
+import uuid
+from collections import namedtuple
+from contextlib import contextmanager
+
+ENTRY_FILE = "entry.json"
+LOCK_FILE = "flush.lock"
+FLUSH_LOG = "flush.log"
+
+SpoolEntry = namedtuple(
+    "SpoolEntry", ["id", "locker", "evidence", "details", "size", "enqueued"]
+)
+
+
+class Spool(object):
+    """
+    Evidence files waiting to be planted, kept in a local spool directory.
+
+    Each spool entry is a directory holding a copy of an evidence file and
+    its details.  Entries are prepared in the ``tmp`` folder and moved into
+    the ``new`` folder once complete, so a flush never sees a partial entry.
+    Entries are named after the time they were enqueued so they are
+    flushed in the order they were enqueued.
+    """
+
+    def __init__(self, path):
+        """
+        Construct and initialize the spool object.
+
+        :param path: the path to the spool directory.
+        """
+        self.path = os.path.expanduser(path)
+        self.new_path = os.path.join(self.path, "new")
+        self.tmp_path = os.path.join(self.path, "tmp")
+
+    def enqueue(self, entries):
+        """
+        Add evidence files to the spool.
+
+        Either all evidence files are added or, if any cannot be added, none
+        of them are.
+
+        :param entries: an iterable of locker URL, evidence file path and
+          evidence details triplets.
+
+        :returns: the number of evidence files added.
+        """
+        os.makedirs(self.new_path, exist_ok=True)
+        os.makedirs(self.tmp_path, exist_ok=True)
+        staged = []
+        try:
+            for locker, path, details in entries:
+                entry_id = f"{time.time_ns():020d}-{uuid.uuid4().hex}"
+                entry_path = os.path.join(self.tmp_path, entry_id)
+                staged.append(entry_id)
+                os.makedirs(os.path.join(entry_path, "evidence"))
+                name = os.path.basename(path)
+                shutil.copyfile(path, os.path.join(entry_path, "evidence", name))
+                entry = {
+                    "locker": locker,
+                    "path": path,
+                    "name": name,
+                    "details": details,
+                    "size": os.path.getsize(path),
+                }
+                with open(os.path.join(entry_path, ENTRY_FILE), "w") as f:
+                    f.write(json.dumps(entry))
+        except BaseException:
+            for entry_id in staged:
+                shutil.rmtree(os.path.join(self.tmp_path, entry_id), True)
+            raise
+        for entry_id in staged:
+            os.rename(
+                os.path.join(self.tmp_path, entry_id),
+                os.path.join(self.new_path, entry_id),
+            )
+        return len(staged)
+
+    def entries(self):
+        """
+        Provide the spooled evidence in the order it was enqueued.
+
+        :returns: a list of spool entries.
+        """
+        entries = []
+        for entry_id in self._entry_ids():
+            entry_path = os.path.join(self.new_path, entry_id)
+            with open(os.path.join(entry_path, ENTRY_FILE)) as f:
+                entry = json.load(f)
+            entries.append(
+                SpoolEntry(
+                    entry_id,
+                    entry["locker"],
+                    os.path.join(entry_path, "evidence", entry["name"]),
+                    entry["details"],
+                    entry["size"],
+                    int(entry_id.split("-", 1)[0]) / 1e9,
+                )
+            )
+        return entries
+
+    def lockers(self):
+        """Provide the URLs of the lockers with spooled evidence."""
+        return list(dict.fromkeys(entry.locker for entry in self.entries()))
+
+    def is_due(self, count=0, nbytes=0, age=0):
+        """
+        Check whether the spool reached a flush threshold.
+
+        :param count: the number of spooled evidence files to flush at.
+        :param nbytes: the spooled evidence bytes to flush at.
+        :param age: the age in seconds of the oldest spooled evidence to
+          flush at.
+
+        :returns: True if any threshold provided is reached.
+        """
+        entry_ids = self._entry_ids()
+        if not entry_ids:
+            return False
+        if count and len(entry_ids) >= count:
+            return True
+        oldest = int(entry_ids[0].split("-", 1)[0]) / 1e9
+        if age and time.time() - oldest >= age:
+            return True
+        return bool(nbytes) and sum(e.size for e in self.entries()) >= nbytes
+
+    def remove(self, entries):
+        """
+        Remove flushed entries from the spool.
+
+        :param entries: the spool entries to remove.
+        """
+        for entry in entries:
+            shutil.rmtree(os.path.join(self.new_path, entry.id))
+
+    @contextmanager
+    def lock(self):
+        """
+        Lock the spool for a flush, without waiting for another flush.
+
+        :returns: a context manager providing True if the spool is locked,
+          False if another flush holds the lock.
+        """
+        os.makedirs(self.path, exist_ok=True)
+        with open(os.path.join(self.path, LOCK_FILE), "w") as f:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _entry_ids(self):
+        if not os.path.isdir(self.new_path):
+            return []
+        return sorted(
+            e.name for e in os.scandir(self.new_path) if not e.name.startswith(".")
+        )
@@ -0,0 +1,76 @@
+# Copyright (c) 2020 IBM Corp. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Plant utilities."""
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def ordered_map(func, iterable, workers=1):
+    """
+    Apply a function to every item of an iterable using worker threads.
+
+    Results are yielded in the same order as the items they were produced
+    from.  At most twice the number of workers items are in flight at any
+    time so the iterable is consumed lazily.
+
+    :param func: the function to apply to each item.
+    :param iterable: the items to process.
+    :param workers: the number of worker threads.  When 1 or less, items
+      are processed in the calling thread.
+
+    :returns: a generator of function results.
+    """
+    if workers <= 1:
+        yield from map(func, iterable)
+        return
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for item in iterable:
+            pending.append(executor.submit(func, item))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def batched(iterable, size=0, limit=0, weight=None):
+    """
+    Group the items of an iterable into batches.
+
+    A batch is complete when it holds ``size`` items or when the weight of
+    its items adds up to at least ``limit``, whichever comes first.  The
+    iterable is consumed lazily, one batch at a time.
+
+    :param iterable: the items to group.
+    :param size: the maximum number of items in a batch, unlimited if 0.
+    :param limit: the weight a batch is complete at, unlimited if 0.
+    :param weight: the function providing the weight of an item.
+
+    :returns: a generator of item lists.
+    """
+    batch = []
+    total = 0
+    for item in iterable:
+        batch.append(item)
+        if limit:
+            total += weight(item)
+        if (size and len(batch) >= size) or (limit and total >= limit):
+            yield batch
+            batch = []
+            total = 0
+    if batch:
+        yield batch
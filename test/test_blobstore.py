@@ -0,0 +1,151 @@
+# Copyright (c) 2020 IBM Corp. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Plant blob store tests."""
+
+import hashlib
+import io
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+from plant.blobstore import (
+    BlobStore,
+    LocalBlobStore,
+    S3BlobStore,
+    format_pointer,
+    get_blob_store,
+    get_blob_store_error,
+    read_pointer,
+)
+
+
+class FakeS3Client(object):
+    """An in memory stand-in for an S3 client."""
+
+    def __init__(self):
+        """Construct and initialize the fake S3 client."""
+        self.objects = {}
+        self.uploads = 0
+
+    def list_objects_v2(self, Bucket, Prefix, MaxKeys):
+        """List the objects whose key starts with a prefix."""
+        keys = sorted(k for b, k in self.objects if b == Bucket)
+        return {"Contents": [{"Key": k} for k in keys if k.startswith(Prefix)]}
+
+    def upload_file(self, Filename, Bucket, Key):
+        """Upload a file."""
+        with open(Filename, "rb") as f:
+            self.objects[(Bucket, Key)] = f.read()
+        self.uploads += 1
+
+    def get_object(self, Bucket, Key):
+        """Download an object."""
+        return {"Body": io.BytesIO(self.objects[(Bucket, Key)])}
+
+
+class TestBlobStore(unittest.TestCase):
+    """Test blob stores."""
+
+    def setUp(self):
+        """Initialize supporting test objects before each test."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.content = bytes(range(256)) * 100
+        self.digest = hashlib.sha256(self.content).hexdigest()
+        self.source = os.path.join(self.tmpdir.name, "big.bin")
+        with open(self.source, "wb") as f:
+            f.write(self.content)
+
+    def tearDown(self):
+        """Cleanup supporting test objects after each test."""
+        self.tmpdir.cleanup()
+
+    def _check_store(self, store):
+        self.assertFalse(store.exists(self.digest))
+        location = store.put(self.source, self.digest)
+        self.assertTrue(location.endswith(f"/sha256/{self.digest[:2]}/{self.digest}"))
+        self.assertEqual(location, store.get_location(self.digest))
+        self.assertTrue(store.exists(self.digest))
+        self.assertEqual(store.put(self.source, self.digest), location)
+        with store.open(self.digest) as f:
+            self.assertEqual(f.read(), self.content)
+        return location
+
+    def test_abstract(self):
+        """Ensures blob stores must implement the blob store methods."""
+
+        class IncompleteBlobStore(BlobStore):
+            def exists(self, digest):
+                return False
+
+        with self.assertRaises(TypeError):
+            IncompleteBlobStore()
+
+    def test_local(self):
+        """Ensures blobs are stored once in a local directory."""
+        path = os.path.join(self.tmpdir.name, "blobs")
+        store = LocalBlobStore(path)
+        location = self._check_store(store)
+        self.assertEqual(
+            location, f"file://{path}/sha256/{self.digest[:2]}/{self.digest}"
+        )
+        self.assertEqual(
+            os.listdir(os.path.join(path, "sha256", self.digest[:2])), [self.digest]
+        )
+
+    def test_s3(self):
+        """Ensures blobs are stored once in an S3 bucket."""
+        client = FakeS3Client()
+        store = S3BlobStore("bucket", "/plant/", client=client)
+        location = self._check_store(store)
+        self.assertEqual(
+            location, f"s3://bucket/plant/sha256/{self.digest[:2]}/{self.digest}"
+        )
+        self.assertEqual(client.uploads, 1)
+
+    def test_get_blob_store(self):
+        """Ensures blob store URLs provide the matching blob store."""
+        store = get_blob_store(f"file://{self.tmpdir.name}/blobs")
+        self.assertEqual(store.path, f"{self.tmpdir.name}/blobs")
+        boto3_mock = MagicMock()
+        with patch.dict("sys.modules", boto3=boto3_mock):
+            store = get_blob_store("s3://bucket/plant", "http://localhost:9000")
+        self.assertEqual((store.bucket, store.prefix), ("bucket", "plant"))
+        boto3_mock.client.assert_called_once_with(
+            "s3", endpoint_url="http://localhost:9000"
+        )
+
+    def test_get_blob_store_error(self):
+        """Ensures unusable blob store URLs are reported."""
+        self.assertIsNone(get_blob_store_error("/foo/blobs"))
+        self.assertIn("s3://bucket/prefix", get_blob_store_error("s3:///plant"))
+        self.assertIn("Unsupported", get_blob_store_error("ftp://foo/blobs"))
+        with patch("plant.blobstore.importlib.util.find_spec", return_value=None):
+            self.assertIn("auditree-plant[s3]", get_blob_store_error("s3://b/p"))
+
+    def test_pointer(self):
+        """Ensures pointer files are read back and other files are not."""
+        path = os.path.join(self.tmpdir.name, "pointer.json")
+        with open(path, "w") as f:
+            f.write(format_pointer(self.digest, 42, "s3://bucket/key"))
+        self.assertEqual(
+            read_pointer(path),
+            {
+                "pointer": "auditree-plant-blob/v1",
+                "digest": f"sha256:{self.digest}",
+                "size": 42,
+                "location": "s3://bucket/key",
+            },
+        )
+        self.assertIsNone(read_pointer(self.source))
@@ -13,13 +13,23 @@
 # limitations under the License.
 """Plant CLI tests."""
 
+import io
 import json
 import logging
+import os
+import subprocess
+import sys
 import tempfile
 import unittest
 from unittest.mock import MagicMock, mock_open, patch
 
+from compliance.utils.exceptions import LockerPushError
+
 from plant.cli import Plant
+from plant.manifest import Preflight, preflight
+
+HEAVY_MODULES = ("compliance", "git", "http")
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
 
 class TestPlantCLI(unittest.TestCase):
@@ -46,10 +56,15 @@ class TestPlantCLI(unittest.TestCase):
         self.locker_init_config_mock = self.lic_patcher.start()
         self.lci_patcher = patch("compliance.locker.Locker.checkin")
         self.locker_checkin_mock = self.lci_patcher.start()
-        self.lae_patcher = patch("compliance.locker.Locker.add_evidence")
-        self.locker_add_evidence_mock = self.lae_patcher.start()
+        self.lwe_patcher = patch("plant.locker.PlantLocker.write_evidence_file")
+        self.locker_write_evidence_mock = self.lwe_patcher.start()
+        self.li_patcher = patch("plant.locker.PlantLocker.index")
+        self.locker_index_mock = self.li_patcher.start()
         self.srm_patcher = patch("plant.cli.shutil.rmtree")
         self.shutil_rmtree_mock = self.srm_patcher.start()
+        self.pf_patcher = patch("plant.cli.preflight")
+        self.preflight_mock = self.pf_patcher.start()
+        self.preflight_mock.return_value = Preflight(1, 2, [])
         self.dry_run = [
             "dry-run",
             "https://github.com/foo/bar",
@@ -64,15 +79,18 @@ class TestPlantCLI(unittest.TestCase):
         self.grc_patcher.stop()
         self.lic_patcher.stop()
         self.lci_patcher.stop()
-        self.lae_patcher.stop()
+        self.lwe_patcher.stop()
+        self.li_patcher.stop()
         self.srm_patcher.stop()
+        self.pf_patcher.stop()
 
     def test_no_config_validation(self):
         """Ensures processing stops when no evidence config is provided."""
         self.plant.run(self.push_remote)
         self.git_repo_clone_from_mock.assert_not_called()
         self.locker_init_config_mock.assert_not_called()
-        self.locker_add_evidence_mock.assert_not_called()
+        self.locker_write_evidence_mock.assert_not_called()
+        self.locker_index_mock.assert_not_called()
         self.locker_checkin_mock.assert_not_called()
         self.git_remote_push_mock.assert_not_called()
         self.shutil_rmtree_mock.assert_not_called()
@@ -90,7 +108,8 @@ class TestPlantCLI(unittest.TestCase):
         )
         self.git_repo_clone_from_mock.assert_not_called()
         self.locker_init_config_mock.assert_not_called()
-        self.locker_add_evidence_mock.assert_not_called()
+        self.locker_write_evidence_mock.assert_not_called()
+        self.locker_index_mock.assert_not_called()
         self.locker_checkin_mock.assert_not_called()
         self.git_remote_push_mock.assert_not_called()
         self.shutil_rmtree_mock.assert_not_called()
@@ -108,7 +127,8 @@ class TestPlantCLI(unittest.TestCase):
         )
         self.git_repo_clone_from_mock.assert_not_called()
         self.locker_init_config_mock.assert_not_called()
-        self.locker_add_evidence_mock.assert_not_called()
+        self.locker_write_evidence_mock.assert_not_called()
+        self.locker_index_mock.assert_not_called()
         self.locker_checkin_mock.assert_not_called()
         self.git_remote_push_mock.assert_not_called()
         self.shutil_rmtree_mock.assert_not_called()
@@ -118,6 +138,10 @@ class TestPlantCLI(unittest.TestCase):
         config = {"/home/foo/bar.json": {"category": "foo", "description": "meh"}}
         with patch("plant.cli.open", mock_open(read_data="{}")):
             self.plant.run(self.dry_run + ["--config", json.dumps(config)])
+        evidence, source, link = self.locker_write_evidence_mock.call_args.args
+        self.assertEqual(evidence.path, "external/foo/bar.json")
+        self.assertEqual(source, "/home/foo/bar.json")
+        self.assertFalse(link)
         self.git_repo_clone_from_mock.assert_called_once_with(
             "https://1a2b3c4d5e6f7g8h9i0@github.com/foo/bar",
             f"{tempfile.gettempdir()}/plant",
@@ -125,7 +149,8 @@ class TestPlantCLI(unittest.TestCase):
             branch="master",
         )
         self.locker_init_config_mock.assert_called_once()
-        self.locker_add_evidence_mock.assert_called_once()
+        self.locker_write_evidence_mock.assert_called_once()
+        self.locker_index_mock.assert_called_once()
         self.git_remote_push_mock.assert_not_called()
         self.shutil_rmtree_mock.assert_not_called()
 
@@ -142,7 +167,8 @@ class TestPlantCLI(unittest.TestCase):
             branch="master",
         )
         self.locker_init_config_mock.assert_called_once()
-        self.locker_add_evidence_mock.assert_called_once()
+        self.locker_write_evidence_mock.assert_called_once()
+        self.locker_index_mock.assert_called_once()
         self.git_remote_push_mock.assert_not_called()
         self.shutil_rmtree_mock.assert_not_called()
 
@@ -170,7 +196,8 @@ class TestPlantCLI(unittest.TestCase):
             branch="master",
         )
         self.locker_init_config_mock.assert_called_once()
-        self.locker_add_evidence_mock.assert_called_once()
+        self.locker_write_evidence_mock.assert_called_once()
+        self.locker_index_mock.assert_called_once()
         self.git_remote_push_mock.assert_not_called()
         self.shutil_rmtree_mock.assert_not_called()
 
@@ -196,13 +223,15 @@ class TestPlantCLI(unittest.TestCase):
             branch="master",
         )
         self.locker_init_config_mock.assert_called_once()
-        self.locker_add_evidence_mock.assert_called_once()
+        self.locker_write_evidence_mock.assert_called_once()
+        self.locker_index_mock.assert_called_once()
         self.git_remote_push_mock.assert_not_called()
         self.shutil_rmtree_mock.assert_not_called()
 
+    @patch("plant.locker.PlantJournal")
     @patch("git.Repo")
     @patch("os.path.isdir")
-    def test_repo_path(self, isdir_mock, repo_mock):
+    def test_repo_path(self, isdir_mock, repo_mock, journal_mock):
         """Ensures providing a repo path does not clone a remote repo."""
         isdir_mock.return_value = True
         repo_mock.return_value = "REPO"
@@ -219,9 +248,12 @@ class TestPlantCLI(unittest.TestCase):
             )
         self.git_repo_clone_from_mock.assert_not_called()
         self.locker_init_config_mock.assert_called_once()
-        self.locker_add_evidence_mock.assert_called_once()
+        self.locker_write_evidence_mock.assert_called_once()
+        self.locker_index_mock.assert_called_once()
         self.git_remote_push_mock.assert_not_called()
         self.shutil_rmtree_mock.assert_not_called()
+        self.assertFalse(journal_mock.call_args.args[1])
+        journal_mock.return_value.close.assert_called_once_with(complete=True)
 
     def test_push_remote(self):
         """
@@ -240,6 +272,773 @@ class TestPlantCLI(unittest.TestCase):
             branch="master",
         )
         self.locker_init_config_mock.assert_called_once()
-        self.locker_add_evidence_mock.assert_called_once()
+        self.locker_write_evidence_mock.assert_called_once()
+        self.locker_index_mock.assert_called_once()
         self.git_remote_push_mock.assert_called_once()
         self.shutil_rmtree_mock.assert_not_called()
+
+    @patch("plant.locker.time.sleep")
+    def test_push_remote_retry(self, sleep_mock):
+        """Ensures a rejected push is retried up to the requested times."""
+        rejected = MagicMock(flags=8)
+        self.git_remote_push_mock.return_value = [rejected]
+        config = {"/home/foo/bar.json": {"category": "foo", "description": "meh"}}
+        with self.assertRaises(LockerPushError):
+            self.plant.run(
+                self.push_remote
+                + ["--config", json.dumps(config), "--push-retries", "2"]
+            )
+        self.assertEqual(self.git_remote_push_mock.call_count, 3)
+        self.assertEqual(sleep_mock.call_count, 2)
+
+    def test_workers_validation(self):
+        """Ensures processing stops when a non-positive worker count is given."""
+        config = {"/home/foo/bar.json": {"category": "foo"}}
+        self.plant.run(
+            self.dry_run + ["--config", json.dumps(config), "--workers", "0"]
+        )
+        self.git_repo_clone_from_mock.assert_not_called()
+        self.locker_write_evidence_mock.assert_not_called()
+        self.locker_index_mock.assert_not_called()
+        self.locker_checkin_mock.assert_not_called()
+
+    def test_dry_run_workers(self):
+        """Ensures evidence written by worker threads is indexed in order."""
+        config = {
+            f"/home/foo/bar_{i}.json": {"category": "foo", "description": "meh"}
+            for i in range(10)
+        }
+        with patch("plant.cli.open", mock_open(read_data="{}")):
+            self.plant.run(
+                self.dry_run + ["--config", json.dumps(config), "--workers", "4"]
+            )
+        self.assertEqual(
+            [c.args[0].name for c in self.locker_index_mock.call_args_list],
+            [f"bar_{i}.json" for i in range(10)],
+        )
+        self.locker_checkin_mock.assert_called_once()
+        self.git_remote_push_mock.assert_not_called()
+
+    def test_cache_dir(self):
+        """Ensures a cache directory clone is used and never removed."""
+        config = {"/home/foo/bar.json": {"category": "foo", "description": "meh"}}
+        with patch("plant.locker.PlantLocker.init", autospec=True) as init_mock:
+            self.plant.run(
+                self.dry_run + ["--config", json.dumps(config), "--cache-dir", "/cache"]
+            )
+        init_mock.assert_called_once()
+        locker = init_mock.call_args.args[0]
+        self.assertTrue(locker.cached)
+        self.assertRegex(locker.local_path, r"^/cache/bar-[0-9a-f]{16}$")
+        self.git_repo_clone_from_mock.assert_not_called()
+        self.locker_index_mock.assert_called_once()
+        self.shutil_rmtree_mock.assert_not_called()
+
+    def test_cache_dir_modes(self):
+        """Ensures sparse and direct clones are cached apart from full clones."""
+        config = {"/home/foo/bar.json": {"category": "foo", "description": "meh"}}
+        args = self.dry_run + ["--config", json.dumps(config), "--cache-dir", "/cache"]
+        with patch("plant.locker.PlantLocker.init", autospec=True) as init_mock:
+            self.plant.run(args)
+            self.plant.run(args + ["--sparse"])
+            self.plant.run(args + ["--direct"])
+        full, sparse, direct = [c.args[0].local_path for c in init_mock.call_args_list]
+        self.assertEqual(sparse, f"{full}-sparse")
+        self.assertEqual(direct, f"{full}-direct")
+
+    def test_cache_dir_repo_path_validation(self):
+        """Ensures processing stops when both cache dir and repo path given."""
+        config = {"/home/foo/bar.json": {"category": "foo"}}
+        self.plant.run(
+            self.dry_run
+            + [
+                "--config",
+                json.dumps(config),
+                "--cache-dir",
+                "/cache",
+                "--repo-path",
+                "/repo",
+            ]
+        )
+        self.git_repo_clone_from_mock.assert_not_called()
+        self.locker_index_mock.assert_not_called()
+
+    def test_sparse_repo_path_validation(self):
+        """Ensures processing stops when sparse is used with a repo path."""
+        config = {"/home/foo/bar.json": {"category": "foo"}}
+        self.plant.run(
+            self.dry_run
+            + ["--config", json.dumps(config), "--sparse", "--repo-path", "/repo"]
+        )
+        self.git_repo_clone_from_mock.assert_not_called()
+        self.locker_index_mock.assert_not_called()
+
+    def test_refresh_ttl(self):
+        """Ensures unchanged evidence metadata is refreshed when requested."""
+        self.locker_write_evidence_mock.return_value = False
+        config = {"/home/foo/bar.json": {"category": "foo", "description": "meh"}}
+        with patch("plant.locker.PlantLocker.refresh") as refresh_mock:
+            self.plant.run(
+                self.dry_run + ["--config", json.dumps(config), "--refresh-ttl"]
+            )
+        self.assertTrue(
+            self.locker_write_evidence_mock.call_args.kwargs["skip_unchanged"]
+        )
+        refresh_mock.assert_called_once()
+        self.locker_index_mock.assert_not_called()
+
+    def test_push_remote_multiple_lockers(self):
+        """Ensures evidence is planted into each locker provided."""
+        config = {"/home/foo/bar.json": {"category": "foo", "description": "meh"}}
+        with tempfile.NamedTemporaryFile("w", suffix=".txt") as lockers_file:
+            lockers_file.write(
+                "# more lockers\nhttps://github.com/foo/baz\n\n"
+                "https://github.com/foo/bar\n"
+            )
+            lockers_file.flush()
+            retval = self.plant.run(
+                self.push_remote
+                + [
+                    "--config",
+                    json.dumps(config),
+                    "--lockers-file",
+                    lockers_file.name,
+                ]
+            )
+        self.assertIsNone(retval)
+        clone_calls = self.git_repo_clone_from_mock.call_args_list
+        self.assertEqual(
+            sorted(c.args[0] for c in clone_calls),
+            [
+                "https://1a2b3c4d5e6f7g8h9i0@github.com/foo/bar",
+                "https://1a2b3c4d5e6f7g8h9i0@github.com/foo/baz",
+            ],
+        )
+        for c in clone_calls:
+            name = c.args[0].rsplit("/", 1).pop()
+            self.assertRegex(
+                c.args[1], rf"^{tempfile.gettempdir()}/plant-{name}-[0-9a-f]{{16}}$"
+            )
+        self.assertEqual(self.locker_index_mock.call_count, 2)
+        self.assertEqual(self.git_remote_push_mock.call_count, 2)
+
+    def test_multiple_lockers_failure(self):
+        """Ensures a failing locker does not stop planting into the others."""
+        repo_mock = self.git_repo_clone_from_mock.return_value
+
+        def clone_from(url, *args, **kwargs):
+            if url.endswith("/baz"):
+                raise ValueError("no baz")
+            return repo_mock
+
+        self.git_repo_clone_from_mock.side_effect = clone_from
+        config = {"/home/foo/bar.json": {"category": "foo", "description": "meh"}}
+        retval = self.plant.run(
+            self.push_remote[:2]
+            + ["https://github.com/foo/baz"]
+            + self.push_remote[2:]
+            + ["--config", json.dumps(config)]
+        )
+        self.assertEqual(retval, 1)
+        self.assertEqual(self.git_repo_clone_from_mock.call_count, 2)
+        self.git_remote_push_mock.assert_called_once()
+
+    def test_multiple_lockers_repo_path_validation(self):
+        """Ensures processing stops when repo path is used with many lockers."""
+        config = {"/home/foo/bar.json": {"category": "foo"}}
+        self.plant.run(
+            self.dry_run[:2]
+            + ["https://github.com/foo/baz"]
+            + self.dry_run[2:]
+            + ["--config", json.dumps(config), "--repo-path", "/repo"]
+        )
+        self.git_repo_clone_from_mock.assert_not_called()
+        self.locker_index_mock.assert_not_called()
+
+    def test_dry_run_config_file_jsonl(self):
+        """Ensures dry-run mode works when a JSON Lines config file is provided."""
+        self.plant.run(
+            self.dry_run + ["--config-file", "./test/fixtures/faux_config.jsonl"]
+        )
+        self.assertEqual(
+            [c.args[1] for c in self.locker_write_evidence_mock.call_args_list],
+            ["/home/foo/bar.json", "/home/foo/baz.json"],
+        )
+        self.assertEqual(self.locker_index_mock.call_count, 2)
+        self.locker_checkin_mock.assert_called_once()
+
+    def test_config_file_jsonl_error(self):
+        """Ensures a JSON Lines config file error is reported by line."""
+        with tempfile.NamedTemporaryFile("w", suffix=".jsonl") as config_file:
+            config_file.write('{"/home/foo/bar.json": {"category": "foo"}}\n{\n')
+            config_file.flush()
+            retval = self.plant.run(self.dry_run + ["--config-file", config_file.name])
+        self.assertRegex(retval, r"^ERROR: .*\.jsonl line 2: invalid JSON")
+        self.locker_index_mock.assert_called_once()
+
+    def test_report_json(self):
+        """Ensures a JSON run report is written when requested."""
+        config = {"/home/foo/bar.json": {"category": "foo", "description": "meh"}}
+        with tempfile.TemporaryDirectory() as tmpdir:
+            report_file = f"{tmpdir}/report.json"
+            profile_file = f"{tmpdir}/plant.prof"
+            self.plant.run(
+                self.dry_run
+                + [
+                    "--config",
+                    json.dumps(config),
+                    "--report",
+                    "json",
+                    "--report-file",
+                    report_file,
+                    "--profile",
+                    profile_file,
+                ]
+            )
+            with open(report_file) as f:
+                report = json.load(f)
+            self.assertTrue(os.path.getsize(profile_file) > 0)
+        self.assertEqual(report["mode"], "dry-run")
+        self.assertEqual(report["preflight"], {"files": 1, "bytes": 2})
+        self.assertEqual(len(report["lockers"]), 1)
+        locker = report["lockers"][0]
+        self.assertEqual(locker["locker"], "https://github.com/foo/bar")
+        self.assertIsNone(locker["error"])
+        self.assertEqual(locker["counts"], {"planted": 1})
+        self.assertEqual(set(locker["phases"]), {"clone", "plant", "index", "checkin"})
+        self.assertEqual(locker["evidence"][0]["evidence"], "external/foo/bar.json")
+
+    def test_report_json_stdout(self):
+        """Ensures a JSON run report is the only output to stdout."""
+        config = {"/home/foo/bar.json": {"category": "foo"}}
+        out, err = io.StringIO(), io.StringIO()
+        plant = Plant(out=out, err=err)
+        plant.run(self.dry_run + ["--config", json.dumps(config), "--report", "json"])
+        report = json.loads(out.getvalue())
+        self.assertEqual(report["mode"], "dry-run")
+        self.assertIn("Evidence /home/foo/bar.json added", err.getvalue())
+        plant.run(self.dry_run + ["--config", json.dumps(config)])
+        self.assertIn("Evidence /home/foo/bar.json added", out.getvalue())
+
+    def test_report_file_validation(self):
+        """Ensures processing stops when a report file has no report format."""
+        config = {"/home/foo/bar.json": {"category": "foo"}}
+        self.plant.run(
+            self.dry_run + ["--config", json.dumps(config), "--report-file", "r.json"]
+        )
+        self.git_repo_clone_from_mock.assert_not_called()
+
+    def test_commit_batch_size(self):
+        """Ensures evidence is committed and pushed in batches."""
+        config = {f"/home/foo/bar_{i}.json": {"category": "foo"} for i in range(5)}
+        self.git_repo_clone_from_mock.return_value.head.commit.hexsha = "abc"
+        with patch("plant.cli.open", mock_open(read_data="{}")):
+            self.plant.run(
+                self.push_remote
+                + [
+                    "--config",
+                    json.dumps(config),
+                    "--commit-batch-size",
+                    "2",
+                    "--push-batches",
+                ]
+            )
+        self.assertEqual(self.locker_index_mock.call_count, 5)
+        self.assertEqual(self.locker_checkin_mock.call_count, 4)
+        self.assertEqual(self.git_remote_push_mock.call_count, 4)
+
+    def test_background_push(self):
+        """Ensures batches are pushed in the background, then rebased and pushed."""
+        config = {f"/home/foo/bar_{i}.json": {"category": "foo"} for i in range(5)}
+        self.git_repo_clone_from_mock.return_value.head.commit.hexsha = "abc"
+        with patch("plant.cli.open", mock_open(read_data="{}")):
+            self.plant.run(
+                self.push_remote
+                + [
+                    "--config",
+                    json.dumps(config),
+                    "--commit-batch-size",
+                    "2",
+                    "--push-batches",
+                    "--background-push",
+                ]
+            )
+        self.assertEqual(self.locker_checkin_mock.call_count, 4)
+        self.assertEqual(
+            [c.args[0] for c in self.git_remote_push_mock.call_args_list],
+            ["refs/plant/push:refs/heads/master"] * 3 + ["master"],
+        )
+        retval = self.plant.run(
+            self.push_remote + ["--config", json.dumps(config), "--background-push"]
+        )
+        self.assertEqual(retval, "ERROR: --background-push requires --push-batches.")
+
+    def test_progress_file_resume(self):
+        """Ensures a run resumes after the entries recorded as pushed."""
+        config = {f"/home/foo/bar_{i}.json": {"category": "foo"} for i in range(5)}
+        self.git_repo_clone_from_mock.return_value.head.commit.hexsha = "abc"
+        args = self.push_remote + [
+            "--config",
+            json.dumps(config),
+            "--commit-batch-size",
+            "2",
+            "--push-batches",
+        ]
+        self.locker_index_mock.side_effect = [None, None, None, ValueError("meh")]
+        with tempfile.TemporaryDirectory() as tmpdir:
+            progress_file = f"{tmpdir}/progress.json"
+            args += ["--progress-file", progress_file]
+            with self.assertRaises(ValueError):
+                self.plant.run(args)
+            with open(progress_file) as f:
+                progress = json.load(f)
+            self.assertEqual([p["entries"] for p in progress["lockers"].values()], [2])
+            self.locker_index_mock.reset_mock(side_effect=True)
+            self.plant.run(args)
+            self.assertFalse(os.path.exists(progress_file))
+        self.assertEqual(
+            [c.args[0].name for c in self.locker_index_mock.call_args_list],
+            ["bar_2.json", "bar_3.json", "bar_4.json"],
+        )
+
+    def test_commit_batch_validation(self):
+        """Ensures batch push and progress options require batches."""
+        config = {"/home/foo/bar.json": {"category": "foo"}}
+        for options in [
+            ["--push-batches"],
+            ["--commit-batch-size", "2", "--progress-file", "p.json"],
+            ["--commit-batch-bytes", "-1"],
+        ]:
+            self.plant.run(
+                self.push_remote + ["--config", json.dumps(config)] + options
+            )
+        self.git_repo_clone_from_mock.assert_not_called()
+
+    def test_resume_validation(self):
+        """Ensures processing stops when resuming without a repo path."""
+        config = {"/home/foo/bar.json": {"category": "foo"}}
+        self.plant.run(self.dry_run + ["--config", json.dumps(config), "--resume"])
+        self.git_repo_clone_from_mock.assert_not_called()
+        self.locker_write_evidence_mock.assert_not_called()
+
+    @patch("plant.cli.subprocess.Popen")
+    def test_enqueue(self, popen_mock):
+        """Ensures enqueue spools evidence and starts a flush when due."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            evidence = os.path.join(tmpdir, "bar.json")
+            with open(evidence, "w") as f:
+                f.write("{}")
+            spool_dir = os.path.join(tmpdir, "spool")
+            args = [
+                "enqueue",
+                "https://github.com/foo/bar",
+                "--spool-dir",
+                spool_dir,
+                "--config",
+                json.dumps({evidence: {"category": "foo"}}),
+                "--flush-count",
+                "2",
+            ]
+            self.assertIsNone(self.plant.run(args))
+            popen_mock.assert_not_called()
+            self.assertIsNone(self.plant.run(args))
+            self.assertEqual(len(os.listdir(os.path.join(spool_dir, "new"))), 2)
+        popen_mock.assert_called_once()
+        self.assertEqual(
+            popen_mock.call_args.args[0][3:6], ["flush", "--spool-dir", spool_dir]
+        )
+        self.git_repo_clone_from_mock.assert_not_called()
+
+    def test_enqueue_validation(self):
+        """Ensures nothing is spooled when evidence cannot be enqueued."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            spool_dir = os.path.join(tmpdir, "spool")
+            retval = self.plant.run(
+                [
+                    "enqueue",
+                    "https://github.com/foo/bar",
+                    "--spool-dir",
+                    spool_dir,
+                    "--config",
+                    json.dumps({f"{tmpdir}/nope.json": {"category": "foo"}}),
+                ]
+            )
+            self.assertEqual(os.listdir(os.path.join(spool_dir, "new")), [])
+        self.assertTrue(retval.startswith("ERROR: "))
+
+    def test_flush(self):
+        """Ensures flush plants the newest spooled evidence in a single push."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            evidence = os.path.join(tmpdir, "bar.json")
+            with open(evidence, "w") as f:
+                f.write("{}")
+            spool_dir = os.path.join(tmpdir, "spool")
+            for category in ["foo", "foo", "baz"]:
+                self.plant.run(
+                    [
+                        "enqueue",
+                        "https://github.com/foo/bar",
+                        "--spool-dir",
+                        spool_dir,
+                        "--config",
+                        json.dumps({evidence: {"category": category}}),
+                    ]
+                )
+            flush = ["flush", "--spool-dir", spool_dir] + self.dry_run[2:]
+            self.assertIsNone(self.plant.run(flush))
+            new_dir = os.path.join(spool_dir, "new")
+            removed = [
+                c.args[0]
+                for c in self.shutil_rmtree_mock.mock_calls
+                if c.args[0].startswith(new_dir)
+            ]
+            entry_ids = sorted(os.listdir(new_dir))
+            self.assertEqual(sorted(removed), [f"{new_dir}/{e}" for e in entry_ids])
+            planted = [
+                c.args[1] for c in self.locker_write_evidence_mock.call_args_list
+            ]
+            self.assertEqual(
+                planted,
+                [f"{new_dir}/{e}/evidence/bar.json" for e in entry_ids[1:]],
+            )
+        self.git_repo_clone_from_mock.assert_called_once()
+        self.locker_checkin_mock.assert_called_once()
+        self.git_remote_push_mock.assert_called_once()
+
+    def test_preflight(self):
+        """Ensures every preflight problem is reported before cloning."""
+        self.preflight_mock.side_effect = preflight
+        with tempfile.TemporaryDirectory() as tmpdir:
+            evidence = os.path.join(tmpdir, "bar.json")
+            with open(evidence, "w") as f:
+                f.write("{}")
+            os.mkdir(os.path.join(tmpdir, "baz"))
+            config = {
+                evidence: {"category": "foo"},
+                tmpdir: {"category": "foo", "include": ["*.json"]},
+                f"{tmpdir}/nope.json": {"category": "foo"},
+                f"{tmpdir}/ttl.json": {"category": "foo", "ttl": "1 day"},
+                f"{tmpdir}/none.json": {"description": "meh"},
+            }
+            retval = self.plant.run(
+                self.push_remote + ["--config", json.dumps(config), "--workers", "2"]
+            )
+        self.assertTrue(retval.startswith("ERROR: Preflight found 4 problems:"))
+        self.assertIn(f"{tmpdir}/nope.json: evidence file not found", retval)
+        self.assertIn(f"{tmpdir}/ttl.json: ttl must be", retval)
+        self.assertIn(f"{tmpdir}/none.json: details must have a category", retval)
+        self.assertIn(f"{evidence}: planted as external/foo/bar.json by", retval)
+        self.git_repo_clone_from_mock.assert_not_called()
+        self.locker_write_evidence_mock.assert_not_called()
+
+    def test_compress(self):
+        """Ensures evidence is compressed unless its config says otherwise."""
+        config = {
+            "/home/foo/bar.json": {"category": "foo"},
+            "/home/foo/baz.json": {"category": "foo", "compress": False},
+            "/home/foo/qux.json": {"category": "foo", "compress": "zstd"},
+        }
+        self.plant.run(
+            self.dry_run + ["--config", json.dumps(config), "--compress", "gzip"]
+        )
+        self.assertEqual(
+            [
+                c.kwargs["compress"]
+                for c in self.locker_write_evidence_mock.call_args_list
+            ],
+            ["gzip", None, "zstd"],
+        )
+
+    @patch("plant.compression.importlib.util.find_spec", return_value=None)
+    def test_compress_validation(self, find_spec_mock):
+        """Ensures processing stops when a codec is not available."""
+        config = {"/home/foo/bar.json": {"category": "foo"}}
+        retval = self.plant.run(
+            self.dry_run + ["--config", json.dumps(config), "--compress", "zstd"]
+        )
+        self.assertIn("auditree-plant[zstd]", retval)
+        self.git_repo_clone_from_mock.assert_not_called()
+
+    @patch("plant.cli.get_blob_store_error", return_value=None)
+    @patch("plant.cli.get_blob_store")
+    def test_blob_store(self, get_blob_store_mock, get_blob_store_error_mock):
+        """Ensures the blob store is provided to the locker."""
+        config = {"/home/foo/bar.json": {"category": "foo"}}
+        with patch("plant.locker.PlantLocker.init", autospec=True) as init_mock:
+            self.plant.run(
+                self.dry_run
+                + [
+                    "--config",
+                    json.dumps(config),
+                    "--blob-store",
+                    "s3://bucket/plant",
+                    "--blob-store-endpoint",
+                    "http://localhost:9000",
+                    "--blob-threshold",
+                    "1000",
+                ]
+            )
+        get_blob_store_mock.assert_called_once_with(
+            "s3://bucket/plant", "http://localhost:9000"
+        )
+        locker = init_mock.call_args.args[0]
+        self.assertEqual(locker.blob_store, get_blob_store_mock.return_value)
+        self.assertEqual(locker.blob_threshold, 1000)
+
+    @patch("plant.blobstore.importlib.util.find_spec", return_value=None)
+    def test_blob_store_validation(self, find_spec_mock):
+        """Ensures processing stops when a blob store cannot be used."""
+        config = {"/home/foo/bar.json": {"category": "foo"}}
+        for options in [
+            ["--blob-store", "s3://bucket/plant"],
+            ["--blob-store", "/foo/blobs", "--blob-threshold", "-1"],
+        ]:
+            retval = self.plant.run(
+                self.dry_run + ["--config", json.dumps(config)] + options
+            )
+            self.assertTrue(retval.startswith("ERROR: "))
+        self.git_repo_clone_from_mock.assert_not_called()
+
+    def test_direct(self):
+        """Ensures direct plants are requested from the locker."""
+        config = {"/home/foo/bar.json": {"category": "foo"}}
+        with patch("plant.locker.PlantLocker.init", autospec=True) as init_mock:
+            self.plant.run(self.dry_run + ["--config", json.dumps(config), "--direct"])
+        locker = init_mock.call_args.args[0]
+        self.assertTrue(locker.direct)
+        self.assertTrue(locker.sparse)
+
+    def test_direct_validation(self):
+        """Ensures processing stops when direct is used with a local copy."""
+        config = {"/home/foo/bar.json": {"category": "foo"}}
+        for options in [["--repo-path", "/repo"], ["--link"]]:
+            retval = self.plant.run(
+                self.dry_run + ["--config", json.dumps(config), "--direct"] + options
+            )
+            self.assertTrue(retval.startswith("ERROR: "))
+        self.git_repo_clone_from_mock.assert_not_called()
+
+    @patch("plant.cli.Status.out")
+    @patch("plant.locker.PlantLocker.read_indexes")
+    def test_status(self, read_indexes_mock, out_mock):
+        """Ensures expired and expiring evidence is reported."""
+        read_indexes_mock.return_value = {
+            "external/foo/index.json": {
+                "a.json": {"last_update": "2020-01-01T00:00:00", "ttl": 86400},
+                "b.json": {"last_update": "2999-01-01T00:00:00", "ttl": 86400},
+            }
+        }
+        status = ["status"] + self.dry_run[1:] + ["--format", "json"]
+        with patch("plant.locker.PlantLocker.remove") as remove_mock:
+            self.assertIsNone(self.plant.run(status))
+        remove_mock.assert_not_called()
+        self.git_remote_push_mock.assert_not_called()
+        self.assertTrue(self.git_repo_clone_from_mock.call_args.kwargs["sparse"])
+        (locker,) = json.loads(out_mock.call_args.args[0])["lockers"]
+        self.assertIsNone(locker["error"])
+        self.assertEqual(locker["counts"], {"expired": 1, "current": 1})
+        self.assertEqual(
+            [evidence["path"] for evidence in locker["evidence"]],
+            ["external/foo/a.json"],
+        )
+        self.assertEqual(locker["evidence"][0]["expires"], "2020-01-02T00:00:00")
+
+    @patch("plant.cli.Status.out")
+    @patch("plant.locker.PlantLocker.read_indexes")
+    def test_sweep(self, read_indexes_mock, out_mock):
+        """Ensures expired evidence is removed and the removal pushed."""
+        read_indexes_mock.return_value = {
+            "external/foo/index.json": {
+                "a.json": {"last_update": "2020-01-01T00:00:00", "ttl": 86400},
+                "b.json": {"last_update": "2999-01-01T00:00:00", "ttl": 86400},
+            }
+        }
+        sweep = ["sweep"] + self.dry_run[1:]
+        with patch("plant.locker.PlantLocker.remove") as remove_mock:
+            self.assertIsNone(self.plant.run(sweep))
+            remove_mock.assert_called_once_with("external/foo/a.json")
+            self.git_remote_push_mock.assert_called_once()
+            self.plant.run(sweep + ["--dry-run"])
+            self.assertEqual(remove_mock.call_count, 2)
+            self.git_remote_push_mock.assert_called_once()
+
+    @patch("plant.cli.PlanChanges.out")
+    @patch("plant.locker.PlantLocker.read_indexes")
+    def test_plan(self, read_indexes_mock, out_mock):
+        """Ensures planned changes are reported without planting."""
+        config = {
+            "/home/foo/bar.json": {"category": "foo"},
+            "/home/foo/baz.json": {"category": "foo/baz", "compress": "gzip"},
+        }
+        plan = ["plan"] + self.dry_run[1:] + ["--config", json.dumps(config)]
+        with patch("plant.locker.PlantLocker.plan") as plan_mock:
+            plan_mock.side_effect = ["unchanged", "update"]
+            self.assertIsNone(self.plant.run(plan + ["--format", "json"]))
+        read_indexes_mock.assert_called_once_with({"foo", "foo/baz"})
+        self.assertEqual(plan_mock.call_args.kwargs, {"compress": "gzip"})
+        self.locker_write_evidence_mock.assert_not_called()
+        self.locker_index_mock.assert_not_called()
+        self.git_remote_push_mock.assert_not_called()
+        self.assertTrue(self.git_repo_clone_from_mock.call_args.kwargs["sparse"])
+        (locker,) = json.loads(out_mock.call_args.args[0])["lockers"]
+        self.assertIsNone(locker["error"])
+        self.assertEqual(locker["counts"], {"unchanged": 1, "update": 1})
+        self.assertEqual(
+            locker["evidence"],
+            [
+                {
+                    "path": "/home/foo/baz.json",
+                    "evidence": "external/foo/baz/baz.json",
+                    "status": "update",
+                }
+            ],
+        )
+
+    @patch("plant.cli.PlanChanges.out")
+    @patch("plant.cli.Status.out")
+    @patch("plant.locker.PlantLocker.read_indexes")
+    def test_direct_cache_dir(self, read_indexes_mock, status_out, plan_out):
+        """Ensures plan, status and sweep clones are cached apart."""
+        read_indexes_mock.return_value = {}
+        config = {"/home/foo/bar.json": {"category": "foo"}}
+        cache = ["--cache-dir", "/cache"]
+        with patch("plant.locker.PlantLocker.init", autospec=True) as init_mock:
+            self.plant.run(self.dry_run + ["--config", json.dumps(config)] + cache)
+            self.plant.run(["status"] + self.dry_run[1:] + cache)
+            self.plant.run(["sweep"] + self.dry_run[1:] + cache + ["--dry-run"])
+            with patch("plant.locker.PlantLocker.plan", return_value="add"):
+                self.plant.run(
+                    ["plan"]
+                    + self.dry_run[1:]
+                    + ["--config", json.dumps(config)]
+                    + cache
+                )
+        full, *direct = [c.args[0].local_path for c in init_mock.call_args_list]
+        self.assertEqual(direct, [f"{full}-direct"] * 3)
+
+    def test_status_validation(self):
+        """Ensures processing stops when status options are invalid."""
+        for options in [["--within", "-1"], ["--locker-workers", "0"]]:
+            retval = self.plant.run(["status"] + self.dry_run[1:] + options)
+            self.assertTrue(retval.startswith("ERROR: "))
+        retval = self.plant.run(["sweep"] + self.dry_run[1:] + ["--push-retries", "-1"])
+        self.assertTrue(retval.startswith("ERROR: "))
+        self.git_repo_clone_from_mock.assert_not_called()
+
+    def test_serve_validation(self):
+        """Ensures processing stops when serve options are invalid."""
+        serve = ["serve"] + self.dry_run[1:]
+        with tempfile.NamedTemporaryFile("w") as token_file:
+            for options in [
+                ["--tcp"],
+                ["--tcp", "--socket", "plant.sock", "--token-file", token_file.name],
+                ["--port", "8080"],
+                ["--tcp", "--token-file", token_file.name],
+                ["--max-request-bytes", "0"],
+            ]:
+                retval = self.plant.run(serve + options)
+                self.assertTrue(retval.startswith("ERROR: "))
+        self.git_repo_clone_from_mock.assert_not_called()
+
+    @patch("plant.server.LockerWorker")
+    @patch("plant.server.create_server")
+    @patch("plant.locker.PlantLocker.__exit__")
+    @patch("plant.locker.PlantLocker.__enter__")
+    def test_serve(self, enter_mock, exit_mock, create_server_mock, worker_mock):
+        """Ensures the server listens on a Unix socket unless --tcp is used."""
+        create_server_mock.return_value.serve_forever.side_effect = KeyboardInterrupt
+        create_server_mock.return_value.server_address = ("127.0.0.1", 8080)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            serve = ["serve"] + self.dry_run[1:] + ["--cache-dir", tmpdir]
+            with patch("plant.cli.signal.signal"):
+                self.plant.run(serve)
+            create_server_mock.assert_called_once_with(
+                {"https://github.com/foo/bar": worker_mock.return_value},
+                os.path.join(tmpdir, "plant.sock"),
+                "127.0.0.1",
+                8080,
+                token=None,
+                max_request_bytes=1024 * 1024,
+            )
+            token_file = os.path.join(tmpdir, "token")
+            with open(token_file, "w") as f:
+                f.write("s3cret\n")
+            create_server_mock.reset_mock()
+            with patch("plant.cli.signal.signal"):
+                self.plant.run(serve + ["--tcp", "--token-file", token_file])
+            create_server_mock.assert_called_once_with(
+                {"https://github.com/foo/bar": worker_mock.return_value},
+                None,
+                "127.0.0.1",
+                8080,
+                token="s3cret",
+                max_request_bytes=1024 * 1024,
+            )
+
+    def test_skip_preflight(self):
+        """Ensures preflight can be skipped."""
+        config = {"/home/foo/bar.json": {"category": "foo"}}
+        with patch("plant.cli.open", mock_open(read_data="{}")):
+            self.plant.run(
+                self.dry_run + ["--config", json.dumps(config), "--skip-preflight"]
+            )
+        self.preflight_mock.assert_not_called()
+        self.locker_write_evidence_mock.assert_called_once()
+
+
+class TestPlantCLIStartup(unittest.TestCase):
+    """Test Plant CLI startup imports."""
+
+    def _get_imports(self, *args):
+        env = dict(os.environ, PYTHONPATH=ROOT)
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", *args],
+            capture_output=True,
+            cwd=ROOT,
+            env=env,
+            text=True,
+        )
+        return [
+            line.rsplit("|", 1).pop().strip()
+            for line in result.stderr.splitlines()
+            if line.startswith("import time:")
+        ]
+
+    def assertNoHeavyImports(self, *args):
+        """Ensures the framework and GitPython are not imported."""
+        imports = self._get_imports(*args)
+        self.assertIn("ilcli", imports)
+        heavy = [m for m in imports if m.split(".", 1)[0] in HEAVY_MODULES]
+        self.assertEqual(heavy, [])
+
+    def test_import(self):
+        """Ensures importing the CLI does not import locker modules."""
+        self.assertNoHeavyImports("-c", "import plant.cli")
+
+    def test_version(self):
+        """Ensures the version and help do not import locker modules."""
+        self.assertNoHeavyImports("-m", "plant.cli", "--version")
+        self.assertNoHeavyImports("-m", "plant.cli", "push-remote", "-h")
+
+    def test_validation_error(self):
+        """Ensures argument validation does not import locker modules."""
+        self.assertNoHeavyImports(
+            "-m", "plant.cli", "push-remote", "https://github.com/foo/bar"
+        )
+
+    def test_enqueue(self):
+        """Ensures enqueue does not import locker modules."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            evidence = os.path.join(tmpdir, "bar.json")
+            with open(evidence, "w") as f:
+                f.write("{}")
+            self.assertNoHeavyImports(
+                "-m",
+                "plant.cli",
+                "enqueue",
+                "https://github.com/foo/bar",
+                "--spool-dir",
+                os.path.join(tmpdir, "spool"),
+                "--config",
+                json.dumps({evidence: {"category": "foo"}}),
+            )
@@ -0,0 +1,84 @@
+# Copyright (c) 2020 IBM Corp. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Plant evidence compression tests."""
+
+import gzip
+import hashlib
+import importlib.util
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from plant.compression import (
+    compress_file,
+    file_digest,
+    get_codec_error,
+    open_compressed,
+)
+
+HAS_ZSTD = importlib.util.find_spec("zstandard") is not None
+
+
+class TestCompression(unittest.TestCase):
+    """Test evidence compression."""
+
+    def setUp(self):
+        """Initialize supporting test objects before each test."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.content = bytes(range(256)) * 4099
+        self.source = os.path.join(self.tmpdir.name, "foo.bin")
+        with open(self.source, "wb") as f:
+            f.write(self.content)
+
+    def tearDown(self):
+        """Cleanup supporting test objects after each test."""
+        self.tmpdir.cleanup()
+
+    def _roundtrip(self, codec):
+        targets = []
+        for name in ["a", "b"]:
+            target = os.path.join(self.tmpdir.name, f"{name}.{codec}")
+            compress_file(self.source, target, codec, chunk_size=1000)
+            targets.append(target)
+        with open(targets[0], "rb") as a, open(targets[1], "rb") as b:
+            self.assertEqual(a.read(), b.read())
+        with open_compressed(targets[0], codec) as f:
+            self.assertEqual(f.read(), self.content)
+        return targets[0]
+
+    def test_gzip(self):
+        """Ensures gzip output is standard and only depends on content."""
+        target = self._roundtrip("gzip")
+        with gzip.open(target) as f:
+            self.assertEqual(f.read(), self.content)
+
+    @unittest.skipUnless(HAS_ZSTD, "zstandard is not installed")
+    def test_zstd(self):
+        """Ensures zstd output only depends on content."""
+        self._roundtrip("zstd")
+
+    def test_get_codec_error(self):
+        """Ensures unknown and unavailable codecs are reported."""
+        self.assertIsNone(get_codec_error("gzip"))
+        self.assertIn("must be one of gzip, zstd", get_codec_error("bz2"))
+        with patch("plant.compression.importlib.util.find_spec", return_value=None):
+            self.assertIn("auditree-plant[zstd]", get_codec_error("zstd"))
+
+    def test_file_digest(self):
+        """Ensures file digests are SHA-256 digests of the content."""
+        self.assertEqual(
+            file_digest(self.source, chunk_size=1000),
+            hashlib.sha256(self.content).hexdigest(),
+        )
@@ -0,0 +1,66 @@
+# Copyright (c) 2020 IBM Corp. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Plant evidence expiry tests."""
+
+import unittest
+from datetime import datetime as dt
+
+from plant.expiry import CURRENT, EXPIRED, EXPIRING, expiry_index
+
+
+class TestExpiry(unittest.TestCase):
+    """Test planted evidence expiry."""
+
+    def setUp(self):
+        """Initialize supporting test objects before each test."""
+        self.now = dt(2020, 1, 2)
+        self.indexes = {
+            "external/foo/index.json": {
+                "a.json": {"last_update": "2020-01-01T00:00:00.000001", "ttl": 3600},
+                "b.json": {"last_update": "2020-01-01T12:00:00", "ttl": 86400},
+                "c.json": {"last_update": "2020-01-01T00:00:00", "ttl": 86400},
+            },
+            "external/foo/bar/index.json": {
+                "d.json": {
+                    "last_update": "2020-01-01T23:00:00",
+                    "ttl": 7200,
+                    "planted_by": "foo@example.com",
+                },
+                "e.json": {"ttl": 3600},
+                "f.json": "not evidence metadata",
+            },
+        }
+
+    def test_expiry_index(self):
+        """Ensures evidence expiry is provided soonest expiry first."""
+        entries = expiry_index(self.indexes, self.now, within=3600)
+        self.assertEqual(
+            [(entry.path, entry.status) for entry in entries],
+            [
+                ("external/foo/a.json", EXPIRED),
+                ("external/foo/c.json", EXPIRED),
+                ("external/foo/bar/d.json", EXPIRING),
+                ("external/foo/b.json", CURRENT),
+            ],
+        )
+        self.assertEqual(entries[2].expires, dt(2020, 1, 2, 1))
+        self.assertEqual(entries[2].ttl, 7200)
+        self.assertEqual(entries[2].planted_by, "foo@example.com")
+
+    def test_expiry_index_tolerance(self):
+        """Ensures evidence expires ttl less the ttl tolerance after update."""
+        entries = expiry_index(self.indexes, self.now, tolerance=3600)
+        self.assertEqual(
+            [entry.status for entry in entries], [EXPIRED, EXPIRED, EXPIRED, CURRENT]
+        )
@@ -0,0 +1,93 @@
+# Copyright (c) 2020 IBM Corp. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Plant journal tests."""
+
+import os
+import tempfile
+import unittest
+
+from plant.journal import COMMITTED, INDEXED, PUSHED, PlantJournal, WRITTEN
+
+
+class TestPlantJournal(unittest.TestCase):
+    """Test PlantJournal."""
+
+    def setUp(self):
+        """Initialize supporting test objects before each test."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "journal.jsonl")
+
+    def tearDown(self):
+        """Cleanup supporting test objects after each test."""
+        self.tmpdir.cleanup()
+
+    def _journal(self):
+        journal = PlantJournal(self.path)
+        for name in ["a", "b", "c", "d"]:
+            journal.written(f"external/foo/{name}.json", f"/{name}.json", name)
+        journal.indexed(["external/foo/a.json", "external/foo/b.json"])
+        journal.committed("abc")
+        journal.pushed("abc")
+        journal.indexed(["external/foo/c.json"])
+        journal.committed("def")
+        return journal
+
+    def test_resume(self):
+        """Ensures the state reached by each evidence is read back."""
+        self._journal().close()
+        journal = PlantJournal(self.path, resume=True)
+        self.assertEqual(journal.get("external/foo/a.json", "a"), PUSHED)
+        self.assertEqual(journal.get("external/foo/c.json", "c"), COMMITTED)
+        self.assertEqual(journal.get("external/foo/d.json", "d"), WRITTEN)
+        self.assertIsNone(journal.get("external/foo/d.json", "changed"))
+        self.assertIsNone(journal.get("external/foo/e.json", "e"))
+        journal.indexed(["external/foo/d.json"])
+        journal.close()
+        journal = PlantJournal(self.path, resume=True)
+        self.assertEqual(journal.get("external/foo/d.json", "d"), INDEXED)
+
+    def test_pushed_commit(self):
+        """Ensures a push only applies to evidence committed up to its commit."""
+        journal = self._journal()
+        journal.indexed(["external/foo/d.json"])
+        journal.committed("ghi")
+        journal.pushed("def")
+        journal.close()
+        journal = PlantJournal(self.path, resume=True)
+        self.assertEqual(journal.get("external/foo/c.json", "c"), PUSHED)
+        self.assertEqual(journal.get("external/foo/d.json", "d"), COMMITTED)
+        # A rebased commit holds every commit.
+        journal.pushed("rebased")
+        self.assertEqual(journal.get("external/foo/d.json", "d"), PUSHED)
+        journal.close()
+
+    def test_new_journal(self):
+        """Ensures a journal not resumed starts over."""
+        self._journal().close()
+        journal = PlantJournal(self.path)
+        self.assertIsNone(journal.get("external/foo/a.json", "a"))
+        journal.close(complete=True)
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_partial_record(self):
+        """Ensures a partially written last record is discarded."""
+        self._journal().close()
+        with open(self.path, "a") as f:
+            f.write('{"state": "indexed", "evidence": "external/fo')
+        journal = PlantJournal(self.path, resume=True)
+        self.assertEqual(journal.get("external/foo/d.json", "d"), WRITTEN)
+        journal.indexed(["external/foo/d.json"])
+        journal.close()
+        journal = PlantJournal(self.path, resume=True)
+        self.assertEqual(journal.get("external/foo/d.json", "d"), INDEXED)
@@ -0,0 +1,314 @@
+# Copyright (c) 2020 IBM Corp. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Plant manifest tests."""
+
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import ANY
+
+from plant.manifest import Manifest, ManifestError, expand, preflight
+
+
+class TestManifest(unittest.TestCase):
+    """Test Manifest parsing."""
+
+    def _write(self, content, extension=".jsonl"):
+        f = tempfile.NamedTemporaryFile("w", suffix=extension, delete=False)
+        self.addCleanup(os.remove, f.name)
+        with f:
+            f.write(content)
+        return f.name
+
+    def test_json(self):
+        """Ensures a JSON config file is parsed as a whole."""
+        manifest = Manifest("./test/fixtures/faux_config.json")
+        self.assertFalse(manifest.is_jsonl)
+        self.assertEqual(
+            list(manifest),
+            [("/home/foo/bar.json", {"category": "foo", "description": "meh"})],
+        )
+
+    def test_jsonl(self):
+        """Ensures a JSON Lines config file is parsed one line at a time."""
+        manifest = Manifest("./test/fixtures/faux_config.jsonl")
+        self.assertTrue(manifest.is_jsonl)
+        expected = [
+            ("/home/foo/bar.json", {"category": "foo", "description": "meh"}),
+            ("/home/foo/baz.json", {"category": "foo", "ttl": 86400}),
+        ]
+        self.assertEqual(list(manifest), expected)
+        self.assertEqual(list(manifest), expected)
+
+    def test_jsonl_lazy(self):
+        """Ensures entries are provided before bad lines are parsed."""
+        path = self._write('{"/foo.json": {"category": "foo"}}\nnot json\n')
+        entries = iter(Manifest(path))
+        self.assertEqual(next(entries), ("/foo.json", {"category": "foo"}))
+        with self.assertRaises(ManifestError) as cm:
+            next(entries)
+        self.assertEqual(
+            str(cm.exception),
+            f"{path} line 2: invalid JSON, Expecting value",
+        )
+
+    def test_jsonl_errors(self):
+        """Ensures entry errors name the offending line."""
+        bad_lines = {
+            "[1, 2]": "entry must be a JSON object",
+            '{"/foo.json": "foo"}': "/foo.json details must have a category",
+            '{"path": "/foo.json", "ttl": 1}': (
+                "/foo.json details must have a category"
+            ),
+        }
+        for line, msg in bad_lines.items():
+            path = self._write(f'{{"/bar.json": {{"category": "bar"}}}}\n\n{line}\n')
+            with self.assertRaises(ManifestError) as cm:
+                list(Manifest(path))
+            self.assertEqual(str(cm.exception), f"{path} line 3: {msg}")
+
+    def test_jsonl_errors_collected(self):
+        """Ensures invalid lines are skipped when errors are collected."""
+        path = self._write(
+            '[1, 2]\n{"/bar.json": {"category": "bar"}}\n{"/foo.json": 1}\n'
+        )
+        errors = []
+        self.assertEqual(
+            list(Manifest(path).entries(errors)), [("/bar.json", {"category": "bar"})]
+        )
+        self.assertEqual(
+            errors,
+            [
+                f"{path} line 1: entry must be a JSON object",
+                f"{path} line 3: /foo.json details must have a category",
+            ],
+        )
+
+
+class TestExpand(unittest.TestCase):
+    """Test directory and glob pattern expansion."""
+
+    def setUp(self):
+        """Initialize an evidence directory tree before each test."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.root = self.tmpdir.name
+        for path in [
+            "b.json",
+            "a.json",
+            "c.log",
+            "sub/d.json",
+            "sub/deeper/e.json",
+            "other/f.json",
+        ]:
+            path = os.path.join(self.root, path)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w") as f:
+                f.write("{}")
+
+    def tearDown(self):
+        """Cleanup supporting test objects after each test."""
+        self.tmpdir.cleanup()
+
+    def _expand(self, path, **details):
+        details = dict({"category": "foo", "ttl": 1}, **details)
+        return [
+            (os.path.relpath(p, self.root), d)
+            for p, d in expand([(os.path.join(self.root, path), details)])
+        ]
+
+    def test_file(self):
+        """Ensures file entries are provided as is."""
+        entries = [("/home/foo/bar.json", {"category": "foo"})]
+        self.assertEqual(list(expand(entries)), entries)
+
+    def test_directory(self):
+        """Ensures a directory entry provides the files directly in it."""
+        self.assertEqual(
+            self._expand(""),
+            [
+                ("a.json", {"category": "foo", "ttl": 1}),
+                ("b.json", {"category": "foo", "ttl": 1}),
+                ("c.log", {"category": "foo", "ttl": 1}),
+            ],
+        )
+
+    def test_directory_filters(self):
+        """Ensures include and exclude patterns filter files by name."""
+        self.assertEqual(
+            [p for p, _ in self._expand("", include=["*.json"], exclude="b*")],
+            ["a.json"],
+        )
+
+    def test_directory_recursive(self):
+        """Ensures sub-directories are walked and mapped to categories."""
+        entries = self._expand(
+            "", recursive=True, subdir_category=True, include=["*.json"]
+        )
+        self.assertEqual(
+            entries,
+            [
+                ("a.json", {"category": "foo", "ttl": 1}),
+                ("b.json", {"category": "foo", "ttl": 1}),
+                ("other/f.json", {"category": "foo/other", "ttl": 1}),
+                ("sub/d.json", {"category": "foo/sub", "ttl": 1}),
+                ("sub/deeper/e.json", {"category": "foo/sub/deeper", "ttl": 1}),
+            ],
+        )
+
+    def test_glob(self):
+        """Ensures glob patterns match files by path component."""
+        self.assertEqual([p for p, _ in self._expand("*.json")], ["a.json", "b.json"])
+        self.assertEqual(
+            [p for p, _ in self._expand("*/*.json")], ["other/f.json", "sub/d.json"]
+        )
+        self.assertEqual(
+            [p for p, _ in self._expand("sub/**.json")],
+            ["sub/d.json", "sub/deeper/e.json"],
+        )
+
+    def test_file_with_magic(self):
+        """Ensures existing files are not expanded as glob patterns."""
+        path = os.path.join(self.root, "report[1].json")
+        with open(path, "w") as f:
+            f.write("{}")
+        self.assertEqual(self._expand("report[1].json"), [("report[1].json", ANY)])
+
+    def test_invalid_filters(self):
+        """Ensures invalid include/exclude options are reported."""
+        with self.assertRaises(ManifestError):
+            self._expand("", include={"a": 1})
+
+
+class TestPreflight(unittest.TestCase):
+    """Test evidence validation before planting."""
+
+    def setUp(self):
+        """Initialize an evidence directory before each test."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.root = self.tmpdir.name
+        for name in ["a.json", "b.json", "sub/a.json"]:
+            path = os.path.join(self.root, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w") as f:
+                f.write("{}" * 2)
+
+    def tearDown(self):
+        """Cleanup supporting test objects after each test."""
+        self.tmpdir.cleanup()
+
+    def test_valid(self):
+        """Ensures valid entries are counted and sized."""
+        for workers in [1, 4]:
+            checked = preflight(
+                [
+                    (self.root, {"category": "foo", "ttl": 60}),
+                    (f"{self.root}/sub/a.json", {"category": "bar"}),
+                ],
+                workers,
+            )
+            self.assertEqual(checked.problems, [])
+            self.assertEqual(checked.files, 3)
+            self.assertEqual(checked.bytes, 12)
+
+    def test_details(self):
+        """Ensures invalid details are all reported."""
+        path = f"{self.root}/a.json"
+        checked = preflight(
+            [
+                (path, "foo"),
+                (path, {"ttl": 1}),
+                (path, {"category": ""}),
+                (path, {"category": "foo", "ttl": True}),
+                (path, {"category": "foo", "ttl": -1}),
+                (path, {"category": "foo", "description": 1}),
+                (path, {"category": "foo", "compress": "bz2"}),
+            ]
+        )
+        self.assertEqual(checked.files, 0)
+        self.assertEqual(
+            checked.problems,
+            [
+                f"{path}: details must be a JSON object",
+                f"{path}: details must have a category",
+                f"{path}: details must have a category",
+                f"{path}: ttl must be a positive number of seconds",
+                f"{path}: ttl must be a positive number of seconds",
+                f"{path}: description must be a string",
+                f"{path}: compress must be one of gzip, zstd",
+            ],
+        )
+
+    def test_files(self):
+        """Ensures missing, non-regular and duplicate evidence is reported."""
+        checked = preflight(
+            [
+                (f"{self.root}/nope.json", {"category": "foo"}),
+                (f"{self.root}/sub", {"category": "foo"}),
+                (f"{self.root}/a.json", {"category": "foo"}),
+                (f"{self.root}/sub/*.json", {"category": "bar"}),
+            ]
+        )
+        self.assertEqual(checked.files, 3)
+        self.assertEqual(
+            checked.problems,
+            [
+                f"{self.root}/nope.json: evidence file not found",
+                f"{self.root}/a.json: planted as external/foo/a.json "
+                f"by {self.root}/sub/a.json as well",
+            ],
+        )
+
+    def test_no_files_found(self):
+        """Ensures directory and glob entries matching no file are reported."""
+        os.makedirs(f"{self.root}/empty")
+        checked = preflight(
+            [
+                (f"{self.root}/empty", {"category": "foo"}),
+                (f"{self.root}/*.log", {"category": "foo"}),
+                (self.root, {"category": "foo", "include": ["*.log"]}),
+                (f"{self.root}/a.json", {"category": "foo"}),
+            ]
+        )
+        self.assertEqual(checked.files, 1)
+        self.assertEqual(
+            checked.problems,
+            [
+                f"{self.root}/empty: no evidence files found",
+                f"{self.root}/*.log: no evidence files found",
+                f"{self.root}: no evidence files found",
+            ],
+        )
+
+    def test_manifest_error(self):
+        """Ensures config file errors are reported."""
+        checked = preflight([(self.root, {"category": "foo", "include": 1})])
+        self.assertEqual(len(checked.problems), 1)
+
+    def test_manifest_lines(self):
+        """Ensures every invalid JSON Lines manifest line is reported."""
+        path = os.path.join(self.root, "manifest.jsonl")
+        with open(path, "w") as f:
+            f.write("nope\n")
+            f.write(json.dumps({f"{self.root}/a.json": {"category": "foo"}}) + "\n")
+            f.write("[]\n")
+        checked = preflight(Manifest(path))
+        self.assertEqual(checked.files, 1)
+        self.assertEqual(
+            checked.problems,
+            [
+                f"{path} line 1: invalid JSON, Expecting value",
+                f"{path} line 3: entry must be a JSON object",
+            ],
+        )
@@ -13,14 +13,46 @@
 # limitations under the License.
 """Plant locker tests."""
 
+import fcntl
+import hashlib
+import json
 import logging
+import os
+import subprocess  # nosec B404: used to compare with git hash-object.
 import tempfile
 import unittest
-from unittest.mock import MagicMock, create_autospec, mock_open, patch
+from unittest.mock import ANY, MagicMock, call, create_autospec, mock_open, patch
 
 from compliance.evidence import ExternalEvidence
+from compliance.utils.exceptions import LockerPushError
 
-from plant.locker import PlantLocker
+import git
+
+from plant.blobstore import LocalBlobStore, read_pointer
+from plant.compression import open_compressed
+from plant.journal import PlantJournal
+from plant.locker import (
+    ADD,
+    METADATA,
+    PLANTED,
+    PlantLocker,
+    PushProgress,
+    REFRESHED,
+    RESUMED,
+    SKIPPED,
+    UNCHANGED,
+    UPDATE,
+    copy_file,
+    git_blob_digest,
+    merge_index_metadata,
+)
+
+
+def _repo_mock():
+    repo = MagicMock()
+    # Nothing is committed to the mocked locker.
+    repo.head.commit.tree.__truediv__.side_effect = KeyError
+    return repo
 
 
 class TestPlantLocker(unittest.TestCase):
@@ -35,7 +67,7 @@ class TestPlantLocker(unittest.TestCase):
         self.ctime_patcher = patch("plant.locker.time.ctime")
         self.ctime_mock = self.ctime_patcher.start()
         self.ctime_mock.return_value = "NOW"
-        self.push_patcher = patch("compliance.locker.Locker.push")
+        self.push_patcher = patch("plant.locker.PlantLocker.push")
         self.push_mock = self.push_patcher.start()
         self.checkin_patcher = patch("compliance.locker.Locker.checkin")
         self.checkin_mock = self.checkin_patcher.start()
@@ -104,7 +136,7 @@ class TestPlantLocker(unittest.TestCase):
         index_add_mock = MagicMock()
         index_mock = MagicMock()
         index_mock.add = index_add_mock
-        repo_mock = MagicMock()
+        repo_mock = _repo_mock()
         repo_mock.config_reader = MagicMock(return_value=config_reader_mock)
         repo_mock.index = index_mock
         evidence = ExternalEvidence("foo.json", "bar", description="meh")
@@ -153,7 +185,7 @@ class TestPlantLocker(unittest.TestCase):
         index_add_mock = MagicMock()
         index_mock = MagicMock()
         index_mock.add = index_add_mock
-        repo_mock = MagicMock()
+        repo_mock = _repo_mock()
         repo_mock.config_reader = MagicMock(return_value=config_reader_mock)
         repo_mock.index = index_mock
         evidence = ExternalEvidence("foo.json", "bar", description="meh")
@@ -185,3 +217,1059 @@ class TestPlantLocker(unittest.TestCase):
                 f"{tempfile.gettempdir()}/repo-foo/external/bar/foo.json",
             ]
         )
+
+    @patch("plant.locker.format_json")
+    def test_locker_batch_index(self, format_json_mock):
+        """Ensures batch indexing writes and stages each index file once."""
+        format_json_mock.side_effect = lambda metadata: sorted(metadata.keys())
+        mo = mock_open()
+        config_reader_mock = MagicMock()
+        config_reader_mock.get_value = MagicMock(return_value="this_guy")
+        index_add_mock = MagicMock()
+        repo_mock = _repo_mock()
+        repo_mock.config_reader = MagicMock(return_value=config_reader_mock)
+        repo_mock.index.add = index_add_mock
+        evidences = [
+            ExternalEvidence("foo.json", "bar"),
+            ExternalEvidence("baz.json", "bar"),
+            ExternalEvidence("meh.json", "other"),
+        ]
+        with patch("builtins.open", mo):
+            with PlantLocker("repo-foo", batch_index=True) as locker:
+                locker.repo = repo_mock
+                for evidence in evidences:
+                    locker.index(evidence)
+                index_add_mock.assert_not_called()
+                mo.assert_not_called()
+        local_path = f"{tempfile.gettempdir()}/repo-foo"
+        self.assertEqual(mo.call_count, 2)
+        mo.assert_any_call(f"{local_path}/external/bar/index.json", "w")
+        mo.assert_any_call(f"{local_path}/external/other/index.json", "w")
+        mo_handle = mo()
+        mo_handle.write.assert_any_call(["baz.json", "foo.json"])
+        mo_handle.write.assert_any_call(["meh.json"])
+        index_add_mock.assert_called_once_with(
+            [
+                f"{local_path}/external/bar/index.json",
+                f"{local_path}/external/other/index.json",
+                f"{local_path}/external/bar/foo.json",
+                f"{local_path}/external/bar/baz.json",
+                f"{local_path}/external/other/meh.json",
+            ]
+        )
+        self.assertEqual(
+            locker.planted,
+            [
+                "external/bar/foo.json",
+                "external/bar/baz.json",
+                "external/other/meh.json",
+            ],
+        )
+        self.checkin_mock.assert_called_once()
+
+    def test_write_evidence_file_copy(self):
+        """Ensures evidence content is copied byte for byte."""
+        content = bytes(range(256)) * 4099
+        with tempfile.TemporaryDirectory() as tmpdir:
+            source = os.path.join(tmpdir, "scan.pdf")
+            with open(source, "wb") as f:
+                f.write(content)
+            locker = PlantLocker("repo-foo", repo_path=os.path.join(tmpdir, "lkr"))
+            evidence = ExternalEvidence("scan.pdf", "bar")
+            locker.write_evidence_file(evidence, source)
+            target = os.path.join(tmpdir, "lkr", "external", "bar", "scan.pdf")
+            with open(target, "rb") as f:
+                self.assertEqual(f.read(), content)
+            self.assertNotEqual(os.stat(source).st_ino, os.stat(target).st_ino)
+
+    def test_write_evidence_file_link(self):
+        """Ensures evidence is hard linked without touching a prior link."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            old_source = os.path.join(tmpdir, "old.txt")
+            source = os.path.join(tmpdir, "new.txt")
+            with open(old_source, "w") as f:
+                f.write("old")
+            with open(source, "w") as f:
+                f.write("new")
+            locker = PlantLocker("repo-foo", repo_path=os.path.join(tmpdir, "lkr"))
+            target = os.path.join(tmpdir, "lkr", "external", "bar", "foo.txt")
+            evidence = ExternalEvidence("foo.txt", "bar")
+            locker.write_evidence_file(evidence, old_source, link=True)
+            self.assertEqual(os.stat(old_source).st_ino, os.stat(target).st_ino)
+            locker.write_evidence_file(evidence, source, link=True)
+            self.assertEqual(os.stat(source).st_ino, os.stat(target).st_ino)
+            with open(old_source) as f:
+                self.assertEqual(f.read(), "old")
+
+    @patch("os.copy_file_range", create=True)
+    def test_copy_file_fallback(self, copy_file_range_mock):
+        """Ensures a chunked copy is used when the kernel copy fails."""
+        copy_file_range_mock.side_effect = OSError("not supported")
+        with tempfile.TemporaryDirectory() as tmpdir:
+            source = os.path.join(tmpdir, "src.bin")
+            target = os.path.join(tmpdir, "dst.bin")
+            with open(source, "wb") as f:
+                f.write(b"\x00\xff" * 10)
+            copy_file(source, target, chunk_size=3)
+            with open(target, "rb") as f:
+                self.assertEqual(f.read(), b"\x00\xff" * 10)
+
+    @patch("plant.locker.shutil.rmtree")
+    @patch("plant.locker.git.Repo")
+    @patch("plant.locker.Path.is_dir")
+    def test_init_cached(self, is_dir_mock, repo_mock, rmtree_mock):
+        """Ensures a cached locker is verified and reset to the remote head."""
+        is_dir_mock.return_value = True
+        repo = repo_mock.return_value
+        remote = repo.remote.return_value
+        remote.name = "origin"
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache = os.path.join(tmpdir, "bar")
+            locker = PlantLocker(
+                "repo-foo",
+                repo_url="https://github.com/foo/bar",
+                repo_path=cache,
+                cached=True,
+            )
+            locker.init()
+            repo_mock.assert_called_once_with(cache)
+            repo.git.fsck.assert_called_once()
+            remote.set_url.assert_called_once_with("https://github.com/foo/bar")
+            remote.fetch.assert_called_once_with("master")
+            repo.git.checkout.assert_called_once_with(
+                "-f", "-B", "master", "origin/master"
+            )
+            repo.git.sparse_checkout.assert_called_once_with("disable")
+            repo.git.clean.assert_called_once_with("-ffdx")
+            rmtree_mock.assert_not_called()
+            self.init_mock.assert_called_once()
+            locker.__exit__(None, None, None)
+
+            repo.reset_mock()
+            sparse = PlantLocker(
+                "repo-foo",
+                repo_url="https://github.com/foo/bar",
+                repo_path=cache,
+                cached=True,
+                sparse=True,
+            )
+            sparse.init()
+            repo.git.sparse_checkout.assert_called_once_with("set", "--cone")
+            sparse.__exit__(None, None, None)
+
+    @patch("plant.locker.fcntl.flock")
+    @patch("plant.locker.git.Repo")
+    @patch("plant.locker.Path.is_dir")
+    def test_init_cached_lock(self, is_dir_mock, repo_mock, flock_mock):
+        """Ensures a cached locker is locked for the locker session."""
+        is_dir_mock.return_value = True
+        flock_mock.side_effect = [BlockingIOError(), None, None]
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache = os.path.join(tmpdir, "bar")
+            locker = PlantLocker(
+                "repo-foo",
+                repo_url="https://github.com/foo/bar",
+                repo_path=cache,
+                cached=True,
+            )
+            locker.logger = self.mock_logger
+            locker.init()
+            self.assertTrue(os.path.isfile(f"{cache}.lock"))
+            self.assertEqual(
+                [c[0][1] for c in flock_mock.call_args_list],
+                [fcntl.LOCK_EX | fcntl.LOCK_NB, fcntl.LOCK_EX],
+            )
+            self.mock_logger.info.assert_any_call(
+                f"Waiting for cached locker in {cache}..."
+            )
+            locker.__exit__(None, None, None)
+            self.assertEqual(flock_mock.call_args[0][1], fcntl.LOCK_UN)
+
+    @patch("plant.locker.shutil.rmtree")
+    @patch("plant.locker.git.Repo")
+    @patch("plant.locker.Path.is_dir")
+    def test_init_cached_corrupt(self, is_dir_mock, repo_mock, rmtree_mock):
+        """Ensures a corrupt cached locker is removed before cloning."""
+        is_dir_mock.return_value = True
+        repo_mock.return_value.git.fsck.side_effect = git.exc.GitCommandError("fsck")
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache = os.path.join(tmpdir, "bar")
+            for error in [None, git.exc.InvalidGitRepositoryError(cache)]:
+                repo_mock.side_effect = error
+                self.mock_logger.reset_mock()
+                rmtree_mock.reset_mock()
+                self.init_mock.reset_mock()
+                locker = PlantLocker(
+                    "repo-foo",
+                    repo_url="https://github.com/foo/bar",
+                    repo_path=cache,
+                    cached=True,
+                )
+                locker.logger = self.mock_logger
+                locker.init()
+                self.mock_logger.warning.assert_called_once()
+                rmtree_mock.assert_called_once_with(cache)
+                self.assertFalse(hasattr(locker, "repo"))
+                self.init_mock.assert_called_once()
+                repo_mock.return_value.remote.return_value.fetch.assert_not_called()
+                locker._unlock_cache()
+
+    @patch("plant.locker.shutil.rmtree")
+    @patch("plant.locker.git.Repo")
+    @patch("plant.locker.Path.is_dir")
+    def test_init_cached_fetch_error(self, is_dir_mock, repo_mock, rmtree_mock):
+        """Ensures a cached locker is kept when it cannot be synced."""
+        is_dir_mock.return_value = True
+        remote = repo_mock.return_value.remote.return_value
+        remote.fetch.side_effect = git.exc.GitCommandError("fetch")
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache = os.path.join(tmpdir, "bar")
+            locker = PlantLocker(
+                "repo-foo",
+                repo_url="https://github.com/foo/bar",
+                repo_path=cache,
+                cached=True,
+            )
+            locker.logger = self.mock_logger
+            with self.assertRaises(git.exc.GitCommandError):
+                locker.init()
+            self.mock_logger.warning.assert_not_called()
+            rmtree_mock.assert_not_called()
+            self.init_mock.assert_not_called()
+            self.assertIsNone(locker._cache_lock)
+
+    @patch("plant.locker.git.Repo.clone_from")
+    def test_get_locker_repo_sparse(self, clone_from_mock):
+        """Ensures a sparse locker is cloned shallow with a blob filter."""
+        clone_from_mock.return_value.active_branch.name = "master"
+        locker = PlantLocker(
+            "repo-foo",
+            repo_url="https://github.com/foo/bar",
+            repo_path="/tmp/sparse",  # nosec B108: clone is mocked.
+            sparse=True,
+        )
+        locker.get_locker_repo()
+        clone_from_mock.assert_called_once_with(
+            "https://github.com/foo/bar",
+            "/tmp/sparse",  # nosec B108: clone is mocked.
+            single_branch=True,
+            branch="master",
+            depth=1,
+            filter="blob:none",
+            sparse=True,
+        )
+
+    def test_include_category(self):
+        """Ensures a category is added to a sparse checkout only once."""
+        locker = PlantLocker("repo-foo", sparse=True)
+        locker.repo = _repo_mock()
+        locker.include_category("foo")
+        locker.include_category("foo")
+        locker.include_category("bar")
+        self.assertEqual(
+            locker.repo.git.sparse_checkout.call_args_list,
+            [
+                call("add", "external/foo"),
+                call("add", "external/bar"),
+            ],
+        )
+        not_sparse = PlantLocker("repo-foo")
+        not_sparse.repo = _repo_mock()
+        not_sparse.include_category("foo")
+        not_sparse.repo.git.sparse_checkout.assert_not_called()
+
+    def test_write_pkg_indexes_sparse(self):
+        """Ensures index files outside of a sparse checkout are skipped."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            os.makedirs(os.path.join(tmpdir, "external", "foo"))
+            with open(os.path.join(tmpdir, "external", "foo", "index.json"), "w"):
+                pass
+            locker = PlantLocker("repo-foo", repo_path=tmpdir, sparse=True)
+            locker.repo = _repo_mock()
+            locker.repo.index.entries = {
+                ("external/foo/index.json", 0): None,
+                ("external/foo/foo.json", 0): None,
+                ("external/bar/index.json", 0): None,
+            }
+            locker.write_pkg_indexes()
+        locker.repo.index.add.assert_called_once_with(["external/foo/index.json"])
+
+    def test_git_blob_digest(self):
+        """Ensures file digests match the git blob object digest."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "foo.bin")
+            with open(path, "wb") as f:
+                f.write(bytes(range(256)) * 10)
+            expected = subprocess.run(  # nosec B603 B607: fixed git command.
+                ["git", "hash-object", path], capture_output=True, check=True
+            )
+            self.assertEqual(
+                git_blob_digest(path, chunk_size=100), expected.stdout.decode().strip()
+            )
+
+    @patch("plant.locker.git_blob_digest")
+    def test_is_unchanged(self, digest_mock):
+        """Ensures HEAD digests are read once per category and compared."""
+        digest_mock.return_value = "abc"
+        blob = MagicMock(hexsha="abc")
+        blob.name = "foo.json"
+        repo_mock = MagicMock()
+        tree_mock = MagicMock()
+        tree_mock.blobs = [blob]
+        repo_mock.head.commit.tree.__truediv__.return_value = tree_mock
+        locker = PlantLocker("repo-foo")
+        locker.repo = repo_mock
+        self.assertTrue(locker.is_unchanged(ExternalEvidence("foo.json", "bar"), "s"))
+        digest_mock.return_value = "def"
+        self.assertFalse(locker.is_unchanged(ExternalEvidence("foo.json", "bar"), "s"))
+        self.assertFalse(locker.is_unchanged(ExternalEvidence("new.json", "bar"), "s"))
+        repo_mock.head.commit.tree.__truediv__.assert_called_once_with("external/bar")
+
+    def test_index_evidence(self):
+        """Ensures unchanged evidence is skipped or refreshed as needed."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            locker = PlantLocker("repo-foo", repo_path=tmpdir, batch_index=True)
+            locker.repo = _repo_mock()
+            locker.repo.config_reader.return_value.get_value.return_value = "me"
+            locker.commit_date = "THEN"
+            os.makedirs(os.path.join(tmpdir, "external", "bar"))
+            evidence = ExternalEvidence("foo.json", "bar", description="meh")
+            self.assertEqual(locker.index_evidence(evidence), PLANTED)
+            locker.flush_index()
+            locker.repo.index.add.reset_mock()
+            locker.commit_date = "NOW"
+            self.assertEqual(locker.index_evidence(evidence, False), SKIPPED)
+            locker.flush_index()
+            locker.repo.index.add.assert_not_called()
+            self.assertEqual(
+                locker.index_evidence(evidence, False, refresh_ttl=True), REFRESHED
+            )
+            evidence = ExternalEvidence("foo.json", "bar", description="new")
+            self.assertEqual(locker.index_evidence(evidence, False), REFRESHED)
+            locker.flush_index()
+            index_file = os.path.join(tmpdir, "external", "bar", "index.json")
+            locker.repo.index.add.assert_called_once_with([index_file])
+            with open(index_file) as f:
+                metadata = json.load(f)
+        self.assertEqual(metadata["foo.json"]["last_update"], "NOW")
+        self.assertEqual(metadata["foo.json"]["description"], "new")
+        self.assertEqual(locker.planted, ["external/bar/foo.json"])
+        self.assertEqual(
+            locker.refreshed, ["external/bar/foo.json", "external/bar/foo.json"]
+        )
+        self.assertEqual(locker.report.counts, {PLANTED: 1, SKIPPED: 1, REFRESHED: 2})
+        self.assertEqual(locker.report.phases["index"]["files"], 3)
+
+    def test_planter_and_paths_cached(self):
+        """Ensures config and category paths are resolved once per session."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            source = os.path.join(tmpdir, "source.json")
+            with open(source, "w") as f:
+                f.write("{}")
+            locker = PlantLocker(
+                "repo-foo", repo_path=os.path.join(tmpdir, "repo"), batch_index=True
+            )
+            locker.repo = _repo_mock()
+            locker.repo.config_reader.return_value.get_value.return_value = "me"
+            locker.commit_date = "NOW"
+            for i in range(20):
+                evidence = ExternalEvidence(f"foo{i}.json", f"bar/{i % 2}")
+                self.assertTrue(locker.write_evidence_file(evidence, source))
+                self.assertEqual(locker.index_evidence(evidence), PLANTED)
+                self.assertEqual(
+                    locker.get_index_file(evidence),
+                    locker.get_index_file_by_path(evidence.path),
+                )
+            locker.flush_index()
+            with open(
+                os.path.join(locker.local_path, "external/bar/1/index.json")
+            ) as f:
+                metadata = json.load(f)
+        locker.repo.config_reader.assert_called_once_with()
+        self.assertEqual(locker.get_planter(), "me")
+        self.assertEqual(len(metadata), 10)
+        self.assertEqual(metadata["foo1.json"]["planted_by"], "me")
+        self.assertEqual(
+            locker.planted[:2], ["external/bar/0/foo0.json", "external/bar/1/foo1.json"]
+        )
+
+    def test_compressed_evidence(self):
+        """Ensures compressed evidence has its codec recorded and kept."""
+        content = b'{"foo": "bar"}' * 1000
+        with tempfile.TemporaryDirectory() as tmpdir:
+            source = os.path.join(tmpdir, "foo.json")
+            with open(source, "wb") as f:
+                f.write(content)
+            lkr = os.path.join(tmpdir, "lkr")
+            locker = PlantLocker("repo-foo", repo_path=lkr, batch_index=True)
+            locker.repo = _repo_mock()
+            locker.repo.config_reader.return_value.get_value.return_value = "me"
+            evidence = ExternalEvidence("foo.json", "bar")
+            self.assertTrue(
+                locker.write_evidence_file(evidence, source, compress="gzip")
+            )
+            self.assertEqual(locker.index_evidence(evidence), PLANTED)
+            locker.flush_index()
+            target = os.path.join(lkr, "external", "bar", "foo.json")
+            self.assertLess(os.path.getsize(target), len(content))
+            with open_compressed(target, "gzip") as f:
+                self.assertEqual(f.read(), content)
+            index_file = os.path.join(lkr, "external", "bar", "index.json")
+            with open(index_file) as f:
+                metadata = json.load(f)["foo.json"]
+            self.assertEqual(metadata["codec"], "gzip")
+            self.assertEqual(metadata["original_size"], len(content))
+            self.assertEqual(
+                metadata["original_digest"],
+                f"sha256:{hashlib.sha256(content).hexdigest()}",
+            )
+            locker.get_head_digest = MagicMock(return_value="abc")
+            self.assertFalse(
+                locker.write_evidence_file(
+                    evidence, source, skip_unchanged=True, compress="gzip"
+                )
+            )
+            self.assertEqual(locker.index_evidence(evidence, False, True), REFRESHED)
+            locker.flush_index()
+            with open(index_file) as f:
+                self.assertEqual(json.load(f)["foo.json"]["codec"], "gzip")
+            self.assertTrue(
+                locker.write_evidence_file(evidence, source, skip_unchanged=True)
+            )
+            self.assertEqual(locker.index_evidence(evidence), PLANTED)
+            locker.flush_index()
+            with open(index_file) as f:
+                self.assertNotIn("codec", json.load(f)["foo.json"])
+            with open(target, "rb") as f:
+                self.assertEqual(f.read(), content)
+
+    def test_blob_store_evidence(self):
+        """Ensures large evidence is stored and committed as a pointer file."""
+        content = bytes(range(256)) * 100
+        digest = hashlib.sha256(content).hexdigest()
+        with tempfile.TemporaryDirectory() as tmpdir:
+            small = os.path.join(tmpdir, "small.bin")
+            with open(small, "wb") as f:
+                f.write(content[:100])
+            big = os.path.join(tmpdir, "big.bin")
+            with open(big, "wb") as f:
+                f.write(content)
+            lkr = os.path.join(tmpdir, "lkr")
+            store = LocalBlobStore(os.path.join(tmpdir, "blobs"))
+            locker = PlantLocker(
+                "repo-foo", repo_path=lkr, blob_store=store, blob_threshold=1000
+            )
+            locker.repo = _repo_mock()
+            locker.repo.config_reader.return_value.get_value.return_value = "me"
+            for name in ["small.bin", "big.bin"]:
+                evidence = ExternalEvidence(name, "bar")
+                source = os.path.join(tmpdir, name)
+                self.assertTrue(
+                    locker.write_evidence_file(evidence, source, compress="gzip")
+                )
+                locker.index_evidence(evidence)
+            target = os.path.join(lkr, "external", "bar", "big.bin")
+            pointer = read_pointer(target)
+            with store.open(digest) as f:
+                self.assertEqual(f.read(), content)
+            with open(os.path.join(lkr, "external", "bar", "index.json")) as f:
+                metadata = json.load(f)
+            locker.get_head_digest = MagicMock(return_value="abc")
+            evidence = ExternalEvidence("big.bin", "bar")
+            self.assertFalse(
+                locker.write_evidence_file(evidence, big, skip_unchanged=True)
+            )
+        self.assertEqual(pointer["digest"], f"sha256:{digest}")
+        self.assertEqual(pointer["size"], len(content))
+        self.assertEqual(pointer["location"], store.get_location(digest))
+        self.assertEqual(metadata["big.bin"]["blob_location"], pointer["location"])
+        self.assertEqual(metadata["big.bin"]["original_digest"], f"sha256:{digest}")
+        self.assertNotIn("codec", metadata["big.bin"])
+        self.assertEqual(metadata["small.bin"]["codec"], "gzip")
+        self.assertNotIn("blob_location", metadata["small.bin"])
+
+    def test_custom_exit_refreshed(self):
+        """Ensures refreshed evidence is listed in the commit message."""
+        with PlantLocker("repo-foo") as locker:
+            locker.planted = ["foo"]
+            locker.refreshed = ["bar"]
+        self.checkin_mock.assert_called_once_with(
+            "Planted external evidence at local time NOW\n\nfoo"
+            "\n\nMetadata refreshed:\nbar"
+        )
+
+    def test_checkin_batch(self):
+        """Ensures each batch commit only lists the evidence of the batch."""
+        with PlantLocker("repo-foo") as locker:
+            locker.repo_url_with_creds = "my repo"
+            locker.planted = ["foo", "bar"]
+            locker.checkin_batch(push=True)
+            self.push_mock.assert_called_once()
+            locker.planted.append("baz")
+            locker.refreshed.append("qux")
+            locker.checkin_batch()
+            self.push_mock.assert_called_once()
+        self.assertEqual(
+            self.checkin_mock.call_args_list,
+            [
+                call("Planted external evidence at local time NOW\n\nfoo\nbar"),
+                call(
+                    "Planted external evidence at local time NOW\n\nbaz"
+                    "\n\nMetadata refreshed:\nqux"
+                ),
+                call("Planted external evidence at local time NOW\n\n"),
+            ],
+        )
+        self.assertEqual(self.push_mock.call_count, 2)
+        self.assertEqual(locker.report.phases["checkin"]["files"], 4)
+
+    def test_journal_resume(self):
+        """Ensures only evidence not completed by a resumed run is planted."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            journal_file = os.path.join(tmpdir, "journal.jsonl")
+            locker = PlantLocker("repo-foo", repo_path=os.path.join(tmpdir, "lkr"))
+            locker.repo = _repo_mock()
+            locker.repo.config_reader.return_value.get_value.return_value = "me"
+            locker.journal = PlantJournal(journal_file)
+            sources = {}
+            for name in ["a", "b", "c", "d"]:
+                sources[name] = os.path.join(tmpdir, f"{name}.json")
+                with open(sources[name], "w") as f:
+                    f.write(f'{{"{name}": 1}}')
+                evidence = ExternalEvidence(f"{name}.json", "bar")
+                self.assertTrue(locker.write_evidence_file(evidence, sources[name]))
+                if name in ["a", "b"]:
+                    locker.index_evidence(evidence)
+                if name == "a":
+                    locker.journal.committed("abc")
+            locker.journal.close()
+            with open(sources["d"], "w") as f:
+                f.write('{"d": 2}')
+            locker = PlantLocker("repo-foo", repo_path=os.path.join(tmpdir, "lkr"))
+            locker.repo = _repo_mock()
+            locker.journal = PlantJournal(journal_file, resume=True)
+            locker.index = MagicMock()
+            with patch.object(locker, "_write_evidence_file") as write_mock:
+                write_mock.return_value = True
+                statuses = {}
+                for name in ["a", "b", "c", "d"]:
+                    evidence = ExternalEvidence(f"{name}.json", "bar")
+                    written = locker.write_evidence_file(evidence, sources[name])
+                    statuses[name] = locker.index_evidence(evidence, written)
+            write_mock.assert_called_once()
+            self.assertEqual(write_mock.call_args.args[1], sources["d"])
+        self.assertEqual(
+            statuses, {"a": RESUMED, "b": RESUMED, "c": PLANTED, "d": PLANTED}
+        )
+        self.assertEqual(locker.planted, ["external/bar/b.json"])
+        self.assertEqual(locker.index.call_count, 2)
+
+
+class TestPlantLockerPush(unittest.TestCase):
+    """Test PlantLocker push retries and conflict resolution."""
+
+    def setUp(self):
+        """Initialize supporting test objects before each test."""
+        logging.disable(logging.CRITICAL)
+        self.sleep_patcher = patch("plant.locker.time.sleep")
+        self.sleep_mock = self.sleep_patcher.start()
+        self.locker = PlantLocker(
+            "repo-foo", repo_url="https://github.com/foo/bar", do_push=True
+        )
+        self.locker.repo = _repo_mock()
+        self.locker._log_large_files = MagicMock()
+        self.remote = self.locker.repo.remote.return_value
+        self.remote.name = "origin"
+        self.rejected = MagicMock(flags=git.remote.PushInfo.REJECTED)
+        self.pushed = MagicMock(flags=git.remote.PushInfo.FAST_FORWARD)
+
+    def tearDown(self):
+        """Cleanup supporting test objects after each test."""
+        logging.disable(logging.NOTSET)
+        self.sleep_patcher.stop()
+
+    def test_push(self):
+        """Ensures the local branch is rebased onto the remote and pushed."""
+        self.remote.push.return_value = [self.pushed]
+        self.locker.push()
+        self.remote.fetch.assert_called_once()
+        self.locker.repo.git.rebase.assert_called_once_with("origin/master")
+        self.remote.push.assert_called_once_with(
+            "master", force=False, set_upstream=True, progress=ANY
+        )
+        self.sleep_mock.assert_not_called()
+
+    def test_push_progress(self):
+        """Ensures push progress is logged and pushed bytes are counted."""
+        logger = MagicMock()
+        progress = PushProgress(logger, interval=60)
+        writing = git.RemoteProgress.WRITING
+        progress.update(writing | git.RemoteProgress.BEGIN, 1, 50)
+        progress.update(writing, 25, 50)
+        progress.update(writing | git.RemoteProgress.END, 50, 50, "2.50 MiB | 5 MiB/s")
+        self.assertEqual(progress.objects, 50)
+        self.assertEqual(progress.nbytes, 2621440)
+        self.assertEqual(
+            logger.info.call_args_list,
+            [
+                call("Push progress: writing objects 1/50"),
+                call("Push progress: writing objects 50/50, 2.50 MiB | 5 MiB/s"),
+            ],
+        )
+
+    def test_background_push(self):
+        """Ensures batches are pushed in the background and then rebased."""
+        self.locker.background_push = True
+        self.locker.checkin = MagicMock()
+        self.locker.repo.head.commit.hexsha = "abc"
+        self.remote.push.side_effect = [[self.rejected], [self.pushed], [self.pushed]]
+        pushed = MagicMock()
+        self.locker.checkin_batch(push=True, pushed=pushed)
+        self.locker.wait_push()
+        pushed.assert_not_called()
+        self.locker.checkin_batch(push=True, pushed=pushed)
+        self.locker.wait_push()
+        pushed.assert_called_once_with("abc")
+        self.remote.fetch.assert_not_called()
+        self.locker.push()
+        self.remote.fetch.assert_called_once()
+        self.assertEqual(
+            self.remote.push.call_args_list[:2],
+            [call("refs/plant/push:refs/heads/master", progress=ANY)] * 2,
+        )
+        self.assertIn("push", self.locker.report.phases)
+
+    def test_push_no_push(self):
+        """Ensures nothing is pushed when push is not requested."""
+        self.locker._do_push = False
+        self.locker.push()
+        self.remote.fetch.assert_not_called()
+        self.remote.push.assert_not_called()
+
+    def test_push_retry(self):
+        """Ensures rejected pushes are retried after a backoff."""
+        self.locker.push_retries = 2
+        self.remote.push.side_effect = [[self.rejected], [self.pushed]]
+        self.locker.push()
+        self.assertEqual(self.remote.fetch.call_count, 2)
+        self.assertEqual(self.locker.repo.git.rebase.call_count, 2)
+        self.sleep_mock.assert_called_once()
+        self.assertLessEqual(self.sleep_mock.call_args.args[0], 4)
+
+    def test_push_retries_exhausted(self):
+        """Ensures a push error is raised when retries are exhausted."""
+        self.locker.push_retries = 1
+        self.remote.push.return_value = [self.rejected]
+        with self.assertRaises(LockerPushError):
+            self.locker.push()
+        self.assertEqual(self.remote.push.call_count, 2)
+        self.sleep_mock.assert_called_once()
+
+    def test_merge_index_metadata(self):
+        """Ensures planted metadata is merged into the upstream metadata."""
+        upstream = {"a.json": {"ttl": 1}, "b.json": {"ttl": 2}}
+        planted = {"a.json": {"ttl": 10}, "c.json": {"ttl": 30}, "d.json": {}}
+        self.assertEqual(
+            merge_index_metadata(upstream, planted, {"a.json", "c.json"}),
+            {"a.json": {"ttl": 10}, "b.json": {"ttl": 2}, "c.json": {"ttl": 30}},
+        )
+
+    def test_merge_index_metadata_removed(self):
+        """Ensures removed metadata is only removed if unchanged upstream."""
+        base = {"a.json": {"ttl": 1}, "b.json": {"ttl": 2}}
+        upstream = {"a.json": {"ttl": 1}, "b.json": {"ttl": 20}, "c.json": {}}
+        self.assertEqual(
+            merge_index_metadata(upstream, {}, set(), {"a.json", "b.json"}, base),
+            {"b.json": {"ttl": 20}, "c.json": {}},
+        )
+
+
+class TestPlantLockerRebase(unittest.TestCase):
+    """Test PlantLocker conflict resolution against real git repositories."""
+
+    def setUp(self):
+        """Initialize a remote with two diverged clones."""
+        logging.disable(logging.CRITICAL)
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.remote = os.path.join(self.tmpdir.name, "remote.git")
+        git.Repo.init(self.remote, bare=True, initial_branch="master")
+        self.mine = self._clone("mine")
+        self.theirs = self._clone("theirs")
+        self._commit(self.mine, {"a.json": "{}"}, {"a.json": {"ttl": 1}})
+        self.mine.git.push("origin", "master")
+        self.theirs.git.pull("origin", "master")
+
+    def tearDown(self):
+        """Cleanup supporting test objects after each test."""
+        logging.disable(logging.NOTSET)
+        self.tmpdir.cleanup()
+
+    def _clone(self, name, **kwargs):
+        repo = git.Repo.clone_from(
+            self.remote, os.path.join(self.tmpdir.name, name), **kwargs
+        )
+        with repo.config_writer() as cw:
+            cw.set_value("user", "email", f"{name}@example.com")
+            cw.set_value("user", "name", name)
+        return repo
+
+    def _commit(self, repo, files, metadata):
+        category = os.path.join(repo.working_dir, "external", "foo")
+        os.makedirs(category, exist_ok=True)
+        for name, content in files.items():
+            with open(os.path.join(category, name), "w") as f:
+                f.write(content)
+        with open(os.path.join(category, "index.json"), "w") as f:
+            json.dump(metadata, f)
+        repo.git.add("--all")
+        repo.git.commit("-m", "plant")
+
+    def test_checkin_batch_rebased(self):
+        """Ensures batches keep index metadata pulled in by a rebase."""
+        locker = PlantLocker(
+            "repo-foo", repo_path=self.mine.working_dir, batch_index=True
+        )
+        locker.repo = self.mine
+        source = os.path.join(self.tmpdir.name, "source.json")
+        with open(source, "w") as f:
+            f.write("{}")
+        for name in ["b.json", "c.json"]:
+            evidence = ExternalEvidence(name, "foo")
+            written = locker.write_evidence_file(evidence, source)
+            locker.index_evidence(evidence, written)
+            locker.checkin_batch()
+            if name == "b.json":
+                # Concurrent plant pulled in by the batch push rebase.
+                self._commit(self.theirs, {"d.json": "{}"}, {"d.json": {"ttl": 4}})
+                self.theirs.git.push("origin", "master")
+                self.mine.remote().fetch()
+                locker.rebase("origin/master")
+        with open(os.path.join(self.mine.working_dir, "external/foo/index.json")) as f:
+            self.assertEqual(set(json.load(f)), {"b.json", "c.json", "d.json"})
+
+    def _plant_cached(self, cache, name, category="foo", **kwargs):
+        source = os.path.join(self.tmpdir.name, "source.json")
+        with open(source, "w") as f:
+            f.write(json.dumps({"name": name}))
+        locker = PlantLocker(
+            "repo-foo",
+            repo_url=f"file://{self.remote}",
+            repo_path=os.path.join(self.tmpdir.name, cache),
+            do_push=True,
+            gitconfig={"user": {"email": "cache@example.com", "name": "cache"}},
+            cached=True,
+            **kwargs,
+        )
+        with locker:
+            evidence = ExternalEvidence(name, category)
+            locker.include_category(category)
+            written = locker.write_evidence_file(evidence, source)
+            locker.index_evidence(evidence, written)
+            # Concurrent push, the plant push is rebased.
+            self.theirs.git.pull("origin", "master")
+            with open(os.path.join(self.theirs.working_dir, "README.md"), "w") as f:
+                f.write(name)
+            self.theirs.git.add("README.md")
+            self.theirs.git.commit("-m", name)
+            self.theirs.git.push("origin", "master")
+
+    def _remote_index(self, category="foo"):
+        remote = git.Repo(self.remote)
+        return json.loads(remote.git.show(f"master:external/{category}/index.json"))
+
+    def test_cached_checkout_mode(self):
+        """Ensures a cached clone is reused in sparse and full checkout modes."""
+        with git.Repo(self.remote).config_writer() as cw:
+            cw.set_value("uploadpack", "allowFilter", "true")
+        self._plant_cached("cache", "b.json")
+        self._plant_cached("cache", "c.json", sparse=True)
+        self._plant_cached("cache", "d.json")
+        self._plant_cached("cache", "e.json", direct=True)
+        self._plant_cached("cache", "f.json")
+        self.assertEqual(
+            set(self._remote_index()),
+            {"a.json", "b.json", "c.json", "d.json", "e.json", "f.json"},
+        )
+        cache = git.Repo(os.path.join(self.tmpdir.name, "cache"))
+        self.assertFalse(cache.git.sparse_checkout("list", with_exceptions=False))
+
+    def test_cached_sparse_then_full(self):
+        """Ensures a full plant keeps metadata of a prior sparse plant cache."""
+        with git.Repo(self.remote).config_writer() as cw:
+            cw.set_value("uploadpack", "allowFilter", "true")
+        self._plant_cached("cache", "y.json", category="bar", sparse=True)
+        self._plant_cached("cache", "c.json")
+        self.assertEqual(set(self._remote_index()), {"a.json", "c.json"})
+        self.assertEqual(set(self._remote_index("bar")), {"y.json"})
+
+    def test_get_metadata_not_checked_out(self):
+        """Ensures index metadata outside of the working tree is read from HEAD."""
+        self.mine.git.sparse_checkout("set", "--cone", "external/bar")
+        locker = PlantLocker("repo-foo", repo_path=self.mine.working_dir)
+        locker.repo = self.mine
+        index_file = os.path.join(self.mine.working_dir, "external/foo/index.json")
+        self.assertFalse(os.path.exists(index_file))
+        self.assertEqual(locker._get_metadata(index_file), {"a.json": {"ttl": 1}})
+        missing = os.path.join(self.mine.working_dir, "external/baz/index.json")
+        self.assertEqual(locker._get_metadata(missing), {})
+
+    def test_rebase_conflicts(self):
+        """Ensures concurrently planted evidence and metadata are merged."""
+        self._commit(
+            self.theirs,
+            {"a.json": '{"theirs": 1}', "b.json": "{}"},
+            {"a.json": {"ttl": 2}, "b.json": {"ttl": 2}},
+        )
+        self.theirs.git.push("origin", "master")
+        self._commit(
+            self.mine,
+            {"a.json": '{"mine": 1}', "c.json": "{}"},
+            {"a.json": {"ttl": 3}, "c.json": {"ttl": 3}},
+        )
+        locker = PlantLocker("repo-foo", repo_path=self.mine.working_dir)
+        locker.repo = self.mine
+        locker.planted = ["external/foo/a.json", "external/foo/c.json"]
+        self.mine.remote().fetch()
+        locker.rebase("origin/master")
+        category = os.path.join(self.mine.working_dir, "external", "foo")
+        with open(os.path.join(category, "index.json")) as f:
+            self.assertEqual(
+                json.load(f),
+                {"a.json": {"ttl": 3}, "b.json": {"ttl": 2}, "c.json": {"ttl": 3}},
+            )
+        with open(os.path.join(category, "a.json")) as f:
+            self.assertEqual(f.read(), '{"mine": 1}')
+        self.assertEqual(self.mine.git.status("--porcelain"), "")
+        self.assertEqual(
+            self.mine.head.commit.parents[0].hexsha,
+            self.theirs.head.commit.hexsha,
+        )
+
+    def test_rebase_conflicts_commits(self):
+        """Ensures conflicts of every local commit replayed are merged."""
+        self._commit(
+            self.theirs, {"b.json": "{}"}, {"a.json": {"ttl": 1}, "b.json": {}}
+        )
+        self.theirs.git.push("origin", "master")
+        # An earlier run, such as a dry run, committed c.json.
+        self._commit(self.mine, {"c.json": "{}"}, {"a.json": {"ttl": 1}, "c.json": {}})
+        self._commit(
+            self.mine,
+            {"d.json": "{}"},
+            {"a.json": {"ttl": 1}, "c.json": {}, "d.json": {"ttl": 4}},
+        )
+        locker = PlantLocker("repo-foo", repo_path=self.mine.working_dir)
+        locker.repo = self.mine
+        locker.planted = ["external/foo/d.json"]
+        self.mine.remote().fetch()
+        locker.rebase("origin/master")
+        for commit, names in [
+            (self.mine.head.commit.parents[0], {"a.json", "b.json", "c.json"}),
+            (self.mine.head.commit, {"a.json", "b.json", "c.json", "d.json"}),
+        ]:
+            index = json.loads(
+                (commit.tree / "external/foo/index.json").data_stream.read()
+            )
+            self.assertEqual(set(index), names)
+        self.assertEqual(self.mine.git.status("--porcelain"), "")
+
+    def test_resume_rejected_push(self):
+        """Ensures evidence of a run resumed after a failed push is merged."""
+        hook = os.path.join(self.remote, "hooks", "pre-receive")
+        with open(hook, "w") as f:
+            f.write("#!/bin/sh\nexit 1\n")
+        os.chmod(hook, 0o755)
+        source = os.path.join(self.tmpdir.name, "c.json")
+        with open(source, "w") as f:
+            f.write("{}")
+        statuses = []
+        for resume in [False, True]:
+            locker = PlantLocker(
+                "repo-foo",
+                repo_url=f"file://{self.remote}",
+                repo_path=os.path.join(self.tmpdir.name, "resumed"),
+                do_push=True,
+                gitconfig={"user": {"email": "resumed@example.com", "name": "r"}},
+                journal=True,
+                resume=resume,
+            )
+            try:
+                with locker:
+                    evidence = ExternalEvidence("c.json", "foo")
+                    written = locker.write_evidence_file(evidence, source)
+                    statuses.append(locker.index_evidence(evidence, written))
+            except LockerPushError:
+                os.remove(hook)
+                # Concurrent plant while the run is interrupted.
+                self._commit(
+                    self.theirs, {"b.json": "{}"}, {"a.json": {}, "b.json": {}}
+                )
+                self.theirs.git.push("origin", "master")
+        self.assertEqual(statuses, [PLANTED, RESUMED])
+        self.assertEqual(set(self._remote_index()), {"a.json", "b.json", "c.json"})
+
+    def test_rebase_conflicts_direct(self):
+        """Ensures direct locker conflicts are resolved without a checkout."""
+        direct = self._clone("direct", sparse=True)
+        direct.git.sparse_checkout("set", "--cone")
+        self._commit(
+            self.theirs,
+            {"a.json": '{"theirs": 1}', "b.json": "{}"},
+            {"a.json": {"ttl": 2}, "b.json": {"ttl": 2}},
+        )
+        self.theirs.git.push("origin", "master")
+        locker = PlantLocker(
+            "repo-foo", repo_path=direct.working_dir, batch_index=True, direct=True
+        )
+        locker.repo = direct
+        for name in ["a.json", "c.json"]:
+            source = os.path.join(self.tmpdir.name, name)
+            with open(source, "w") as f:
+                f.write('{"mine": 1}')
+            evidence = ExternalEvidence(name, "foo", 3)
+            written = locker.write_evidence_file(evidence, source)
+            locker.index_evidence(evidence, written)
+        locker.checkin_batch()
+        direct.remote().fetch()
+        locker.rebase("origin/master")
+        tree = direct.head.commit.tree
+        index = json.loads((tree / "external/foo/index.json").data_stream.read())
+        self.assertEqual(set(index), {"a.json", "b.json", "c.json"})
+        self.assertEqual(index["a.json"]["ttl"], 3)
+        self.assertEqual(
+            (tree / "external/foo/a.json").data_stream.read(), b'{"mine": 1}'
+        )
+        self.assertEqual(direct.git.status("--porcelain"), "")
+        self.assertFalse(os.path.exists(os.path.join(direct.working_dir, "external")))
+        self.assertEqual(
+            direct.head.commit.parents[0].hexsha, self.theirs.head.commit.hexsha
+        )
+
+    def test_direct_commit(self):
+        """Ensures direct plants commit what working tree plants commit."""
+        direct = self._clone("direct", sparse=True)
+        with direct.config_writer() as cw:
+            cw.set_value("user", "email", "mine@example.com")
+        source = os.path.join(self.tmpdir.name, "a.json")
+        with open(source, "w") as f:
+            f.write('{"new": 1}' * 100)
+        trees = []
+        for repo, is_direct in [(self.mine, False), (direct, True)]:
+            locker = PlantLocker(
+                "repo-foo",
+                repo_path=repo.working_dir,
+                batch_index=True,
+                direct=is_direct,
+            )
+            locker.repo = repo
+            locker.commit_date = "NOW"
+            for evidence, compress in [
+                (ExternalEvidence("a.json", "foo", description="meh"), None),
+                (ExternalEvidence("b.json", "foo/bar", ttl=10), None),
+                (ExternalEvidence("c.json", "foo", description="meh"), "gzip"),
+            ]:
+                written = locker.write_evidence_file(
+                    evidence, source, compress=compress
+                )
+                self.assertEqual(locker.index_evidence(evidence, written), PLANTED)
+            locker.checkin_batch()
+            self.assertEqual(repo.git.status("--porcelain"), "")
+            trees.append(repo.head.commit.tree.hexsha)
+        self.assertEqual(trees[0], trees[1])
+        self.assertFalse(os.path.exists(os.path.join(direct.working_dir, "external")))
+        metadata = json.loads(
+            (direct.head.commit.tree / "external/foo/index.json").data_stream.read()
+        )
+        self.assertEqual(metadata["a.json"]["planted_by"], "mine@example.com")
+        self.assertEqual(metadata["c.json"]["codec"], "gzip")
+
+    def test_remove(self):
+        """Ensures direct removals commit what working tree removals commit."""
+        self._commit(
+            self.mine,
+            {"b.json": "{}", "1_c.json": "{}", "2_c.json": "{}"},
+            {
+                "a.json": {"ttl": 1},
+                "b.json": {"ttl": 2},
+                "c.json": {"ttl": 3, "partitions": {"1": [], "2": []}},
+            },
+        )
+        self.mine.git.push("origin", "master")
+        direct = self._clone("direct", sparse=True)
+        trees = []
+        for repo, is_direct in [(self.mine, False), (direct, True)]:
+            locker = PlantLocker(
+                "repo-foo",
+                repo_path=repo.working_dir,
+                batch_index=True,
+                direct=is_direct,
+            )
+            locker.repo = repo
+            self.assertEqual(
+                list(locker.read_indexes()["external/foo/index.json"]),
+                ["a.json", "b.json", "c.json"],
+            )
+            locker.remove("external/foo/a.json")
+            locker.remove("external/foo/c.json")
+            with patch("time.ctime", return_value="NOW"):
+                locker.checkin_batch()
+            self.assertEqual(
+                repo.head.commit.message,
+                "Removed external evidence at local time NOW\n\n"
+                "external/foo/a.json\nexternal/foo/c.json\n",
+            )
+            self.assertEqual(repo.git.status("--porcelain"), "")
+            trees.append(repo.head.commit.tree.hexsha)
+            self.assertEqual(
+                repo.git.ls_tree("-r", "--name-only", "HEAD").split(),
+                ["external/foo/b.json", "external/foo/index.json"],
+            )
+            locker.remove("external/foo/b.json")
+            locker.checkin_batch()
+            self.assertEqual(repo.git.ls_tree("-r", "--name-only", "HEAD"), "")
+        self.assertEqual(trees[0], trees[1])
+
+    def test_rebase_removed_conflicts(self):
+        """Ensures removed evidence changed upstream keeps its upstream version."""
+        self._commit(self.theirs, {"a.json": '{"theirs": 1}'}, {"a.json": {"ttl": 2}})
+        self.theirs.git.push("origin", "master")
+        locker = PlantLocker("repo-foo", repo_path=self.mine.working_dir)
+        locker.repo = self.mine
+        locker.read_indexes()
+        locker.remove("external/foo/a.json")
+        locker.checkin_batch()
+        self.mine.remote().fetch()
+        locker.rebase("origin/master")
+        category = os.path.join(self.mine.working_dir, "external", "foo")
+        with open(os.path.join(category, "index.json")) as f:
+            self.assertEqual(json.load(f), {"a.json": {"ttl": 2}})
+        with open(os.path.join(category, "a.json")) as f:
+            self.assertEqual(f.read(), '{"theirs": 1}')
+        self.assertEqual(self.mine.git.status("--porcelain"), "")
+
+    def test_plan(self):
+        """Ensures planned changes are those planting would make."""
+        self._commit(self.mine, {}, {"a.json": {"ttl": 1, "description": ""}})
+        self.mine.git.push("origin", "master")
+        direct = self._clone("direct", sparse=True)
+        locker = PlantLocker("repo-foo", repo_path=direct.working_dir, direct=True)
+        locker.repo = direct
+        locker.read_indexes({"foo"})
+        same = os.path.join(self.tmpdir.name, "same.json")
+        changed = os.path.join(self.tmpdir.name, "changed.json")
+        with open(same, "w") as f:
+            f.write("{}")
+        with open(changed, "w") as f:
+            f.write('{"changed": 1}')
+        a = ExternalEvidence("a.json", "foo", ttl=1)
+        for evidence, source, options, status in [
+            (a, same, {}, UNCHANGED),
+            (a, same, {"refresh_ttl": True}, METADATA),
+            (ExternalEvidence("a.json", "foo", ttl=2), same, {}, METADATA),
+            (a, changed, {}, UPDATE),
+            (a, same, {"compress": "gzip"}, UPDATE),
+            (ExternalEvidence("b.json", "foo", ttl=1), same, {}, ADD),
+        ]:
+            self.assertEqual(locker.plan(evidence, source, **options), status)
+        self.assertEqual(direct.git.status("--porcelain"), "")
+        self.assertEqual(direct.head.commit.hexsha, self.mine.head.commit.hexsha)
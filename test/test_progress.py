@@ -0,0 +1,66 @@
+# Copyright (c) 2020 IBM Corp. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Plant batch progress tests."""
+
+import json
+import os
+import tempfile
+import unittest
+
+from plant.progress import PlantProgress
+
+
+class TestPlantProgress(unittest.TestCase):
+    """Test PlantProgress."""
+
+    def setUp(self):
+        """Initialize supporting test objects before each test."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "progress.json")
+
+    def tearDown(self):
+        """Cleanup supporting test objects after each test."""
+        self.tmpdir.cleanup()
+
+    def test_record(self):
+        """Ensures progress is persisted and read back per locker."""
+        progress = PlantProgress(self.path, "digest")
+        self.assertEqual(progress.get("foo"), 0)
+        progress.record("foo", 10, "abc")
+        progress.record("bar", 5)
+        progress = PlantProgress(self.path, "digest")
+        self.assertFalse(progress.discarded)
+        self.assertEqual(progress.get("foo"), 10)
+        self.assertEqual(progress.get("bar"), 5)
+        with open(self.path) as f:
+            self.assertEqual(json.load(f)["lockers"]["foo"]["commit"], "abc")
+
+    def test_clear(self):
+        """Ensures the progress file is removed once all lockers are done."""
+        progress = PlantProgress(self.path, "digest")
+        progress.record("foo", 10)
+        progress.record("bar", 5)
+        progress.clear("foo")
+        self.assertTrue(os.path.exists(self.path))
+        progress.clear("bar")
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_other_config(self):
+        """Ensures progress recorded for another config is discarded."""
+        PlantProgress(self.path, "digest").record("foo", 10)
+        progress = PlantProgress(self.path, "other")
+        self.assertTrue(progress.discarded)
+        self.assertEqual(progress.get("foo"), 0)
+        progress.clear("foo")
+        self.assertFalse(os.path.exists(self.path))
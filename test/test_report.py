@@ -0,0 +1,61 @@
+# Copyright (c) 2020 IBM Corp. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Plant run report tests."""
+
+import unittest
+from unittest.mock import patch
+
+from plant.report import RunReport
+
+
+class TestRunReport(unittest.TestCase):
+    """Test RunReport."""
+
+    @patch("plant.report.time.perf_counter")
+    def test_phases(self, perf_counter_mock):
+        """Ensures phase time, files and bytes are accumulated."""
+        perf_counter_mock.side_effect = [1.0, 1.5, 2.0, 3.25]
+        report = RunReport()
+        with report.phase("clone"):
+            pass
+        report.add("write", 0.5, 1, 10)
+        report.add("write", 0.25, 1, 5)
+        with self.assertRaises(ValueError):
+            with report.phase("push", files=2):
+                raise ValueError("meh")
+        self.assertEqual(
+            report.as_dict(),
+            {
+                "phases": {
+                    "clone": {"seconds": 0.5, "files": 0, "bytes": 0},
+                    "write": {"seconds": 0.75, "files": 2, "bytes": 15},
+                    "push": {"seconds": 1.25, "files": 2, "bytes": 0},
+                },
+                "counts": {},
+            },
+        )
+
+    def test_evidence(self):
+        """Ensures evidence is counted and only recorded when requested."""
+        report = RunReport()
+        report.add_evidence("/foo.json", "planted", bytes=3)
+        report.add_evidence("/bar.json", "skipped")
+        self.assertEqual(report.counts, {"planted": 1, "skipped": 1})
+        self.assertNotIn("evidence", report.as_dict())
+        report = RunReport(evidence=True)
+        report.add_evidence("/foo.json", "planted", bytes=3)
+        self.assertEqual(
+            report.as_dict()["evidence"],
+            [{"path": "/foo.json", "status": "planted", "bytes": 3}],
+        )
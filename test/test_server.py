@@ -0,0 +1,202 @@
+# Copyright (c) 2020 IBM Corp. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Plant server tests."""
+
+import json
+import logging
+import os
+import stat
+import tempfile
+import threading
+import unittest
+from concurrent.futures import Future
+from http.client import HTTPConnection
+from unittest.mock import MagicMock
+
+from plant.locker import PLANTED
+from plant.server import LockerWorker, PlantRequest, create_server
+
+
+class TestLockerWorker(unittest.TestCase):
+    """Test LockerWorker request coalescing."""
+
+    def setUp(self):
+        """Initialize supporting test objects before each test."""
+        logging.disable(logging.CRITICAL)
+        self.locker = MagicMock(repo_url="https://github.com/foo/bar")
+        self.locker.write_evidence_file.return_value = True
+        self.locker.index_evidence.return_value = PLANTED
+        self.locker.repo.head.commit.hexsha = "abc"
+
+    def tearDown(self):
+        """Cleanup supporting test objects after each test."""
+        logging.disable(logging.NOTSET)
+
+    def _run(self, requests, **kwargs):
+        worker = LockerWorker(self.locker, coalesce=0.1, **kwargs)
+        futures = [worker.submit(request) for request in requests]
+        worker.stop()
+        worker.run()
+        return futures
+
+    def test_coalesce(self):
+        """Ensures queued requests are planted in a single commit."""
+        requests = [
+            PlantRequest([(f"/foo/bar_{i}.json", {"category": "foo"})])
+            for i in range(3)
+        ]
+        futures = self._run(requests)
+        self.locker.checkin_batch.assert_called_once_with(push=True)
+        for i, future in enumerate(futures):
+            result = future.result()
+            self.assertEqual(result["commit"], "abc")
+            self.assertEqual(result["requests"], 3)
+            self.assertEqual(
+                result["evidence"],
+                [
+                    {
+                        "path": f"/foo/bar_{i}.json",
+                        "evidence": f"external/foo/bar_{i}.json",
+                        "status": PLANTED,
+                    }
+                ],
+            )
+
+    def test_max_batch(self):
+        """Ensures no more than the maximum batch of requests is coalesced."""
+        requests = [
+            PlantRequest([(f"/foo/bar_{i}.json", {"category": "foo"})])
+            for i in range(3)
+        ]
+        futures = self._run(requests, max_batch=2, push=False)
+        self.assertEqual(self.locker.checkin_batch.call_count, 2)
+        self.locker.checkin_batch.assert_called_with(push=False)
+        self.assertEqual([f.result()["requests"] for f in futures], [2, 2, 1])
+
+    def test_failure(self):
+        """Ensures all requests of a failed batch fail and are discarded."""
+        self.locker.checkin_batch.side_effect = ValueError("meh")
+        futures = self._run([PlantRequest([("/foo/bar.json", {"category": "foo"})])])
+        with self.assertRaises(ValueError):
+            futures[0].result()
+        self.locker.discard.assert_called_once()
+
+
+class TestPlantServer(unittest.TestCase):
+    """Test the plant HTTP server."""
+
+    def setUp(self):
+        """Initialize a server with a locker worker stand in."""
+        logging.disable(logging.CRITICAL)
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.evidence = os.path.join(self.tmpdir.name, "bar.json")
+        with open(self.evidence, "w") as f:
+            f.write("{}")
+        self.worker = MagicMock()
+        future = Future()
+        future.set_result({"commit": "abc"})
+        self.worker.submit.return_value = future
+        self.server = self._serve()
+
+    def tearDown(self):
+        """Cleanup supporting test objects after each test."""
+        logging.disable(logging.NOTSET)
+        self.server.shutdown()
+        self.server.server_close()
+        self.tmpdir.cleanup()
+
+    def _serve(self, **kwargs):
+        server = create_server({"https://github.com/foo/bar": self.worker}, **kwargs)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+    def _request(self, method, path, body=None, headers=None):
+        conn = HTTPConnection(*self.server.server_address)
+        conn.request(
+            method,
+            path,
+            json.dumps(body) if body is not None else None,
+            headers or {},
+        )
+        response = conn.getresponse()
+        content = json.loads(response.read())
+        conn.close()
+        return response.status, content
+
+    def test_health(self):
+        """Ensures the lockers served are provided."""
+        status, content = self._request("GET", "/health")
+        self.assertEqual(status, 200)
+        self.assertEqual(content, {"lockers": ["https://github.com/foo/bar"]})
+
+    def test_plant(self):
+        """Ensures a plant request is submitted to the locker worker."""
+        config = {self.evidence: {"category": "foo"}}
+        status, content = self._request("POST", "/plant", {"config": config})
+        self.assertEqual(status, 200)
+        self.assertEqual(content, {"commit": "abc"})
+        request = self.worker.submit.call_args.args[0]
+        self.assertEqual(request.entries, [(self.evidence, {"category": "foo"})])
+        self.assertFalse(request.refresh_ttl)
+
+    def test_bad_requests(self):
+        """Ensures invalid plant requests are rejected."""
+        for body in [
+            {},
+            {"config": []},
+            {"config": {self.evidence: {}}},
+            {"config": {"/foo/nope.json": {"category": "foo"}}},
+            {"config": {self.evidence: {"category": "foo"}}, "locker": "other"},
+        ]:
+            status, content = self._request("POST", "/plant", body)
+            self.assertEqual(status, 400)
+            self.assertIn("error", content)
+        self.worker.submit.assert_not_called()
+
+    def test_token(self):
+        """Ensures requests without the server token are rejected."""
+        self.server.shutdown()
+        self.server.server_close()
+        self.server = self._serve(token="s3cret")
+        config = {self.evidence: {"category": "foo"}}
+        for headers in [None, {"Authorization": "Bearer nope"}]:
+            status, _ = self._request("GET", "/health", headers=headers)
+            self.assertEqual(status, 401)
+            status, _ = self._request("POST", "/plant", {"config": config}, headers)
+            self.assertEqual(status, 401)
+        self.worker.submit.assert_not_called()
+        headers = {"Authorization": "Bearer s3cret"}
+        status, _ = self._request("POST", "/plant", {"config": config}, headers)
+        self.assertEqual(status, 200)
+
+    def test_too_large(self):
+        """Ensures plant requests larger than the maximum are rejected."""
+        self.server.shutdown()
+        self.server.server_close()
+        self.server = self._serve(max_request_bytes=10)
+        config = {self.evidence: {"category": "foo"}}
+        status, content = self._request("POST", "/plant", {"config": config})
+        self.assertEqual(status, 413)
+        self.assertIn("error", content)
+        self.worker.submit.assert_not_called()
+
+    def test_socket_mode(self):
+        """Ensures the Unix domain socket is only accessible to its owner."""
+        socket_path = os.path.join(self.tmpdir.name, "plant.sock")
+        server = create_server({}, socket_path)
+        try:
+            mode = stat.S_IMODE(os.stat(socket_path).st_mode)
+            self.assertEqual(mode, 0o600)
+        finally:
+            server.server_close()
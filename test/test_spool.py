@@ -0,0 +1,111 @@
+# Copyright (c) 2020 IBM Corp. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Plant evidence spool tests."""
+
+import os
+import tempfile
+import time
+import unittest
+
+from plant.spool import Spool
+
+
+class TestSpool(unittest.TestCase):
+    """Test Spool."""
+
+    def setUp(self):
+        """Initialize supporting test objects before each test."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.spool = Spool(os.path.join(self.tmpdir.name, "spool"))
+        self.files = []
+        for i in range(3):
+            path = os.path.join(self.tmpdir.name, f"bar_{i}.json")
+            with open(path, "w") as f:
+                f.write("{}" * (i + 1))
+            self.files.append(path)
+
+    def tearDown(self):
+        """Cleanup supporting test objects after each test."""
+        self.tmpdir.cleanup()
+
+    def test_enqueue(self):
+        """Ensures spooled evidence is provided in the order it was enqueued."""
+        entries = [
+            ("https://github.com/foo/bar", f, {"category": "foo"}) for f in self.files
+        ]
+        self.assertEqual(self.spool.enqueue(entries), 3)
+        self.spool.enqueue(
+            [("https://github.com/foo/baz", self.files[0], {"category": "baz"})]
+        )
+        spooled = self.spool.entries()
+        self.assertEqual(
+            [os.path.basename(e.evidence) for e in spooled],
+            ["bar_0.json", "bar_1.json", "bar_2.json", "bar_0.json"],
+        )
+        self.assertEqual([e.size for e in spooled], [2, 4, 6, 2])
+        self.assertEqual(spooled[3].details, {"category": "baz"})
+        with open(spooled[1].evidence) as f:
+            self.assertEqual(f.read(), "{}{}")
+        self.assertEqual(
+            self.spool.lockers(),
+            ["https://github.com/foo/bar", "https://github.com/foo/baz"],
+        )
+
+    def test_enqueue_failure(self):
+        """Ensures no evidence is spooled when any evidence cannot be."""
+        entries = [
+            ("https://github.com/foo/bar", self.files[0], {"category": "foo"}),
+            ("https://github.com/foo/bar", "/does/not/exist.json", {"category": "foo"}),
+        ]
+        with self.assertRaises(FileNotFoundError):
+            self.spool.enqueue(entries)
+        self.assertEqual(self.spool.entries(), [])
+        self.assertEqual(os.listdir(self.spool.tmp_path), [])
+
+    def test_is_due(self):
+        """Ensures flush thresholds are checked."""
+        self.assertFalse(self.spool.is_due(count=1))
+        entries = [
+            ("https://github.com/foo/bar", f, {"category": "foo"}) for f in self.files
+        ]
+        self.spool.enqueue(entries)
+        self.assertFalse(self.spool.is_due())
+        self.assertFalse(self.spool.is_due(count=4))
+        self.assertTrue(self.spool.is_due(count=3))
+        self.assertFalse(self.spool.is_due(nbytes=13))
+        self.assertTrue(self.spool.is_due(nbytes=12))
+        self.assertFalse(self.spool.is_due(age=60))
+        time.sleep(0.02)
+        self.assertTrue(self.spool.is_due(age=0.01))
+
+    def test_remove(self):
+        """Ensures flushed entries are removed from the spool."""
+        entries = [
+            ("https://github.com/foo/bar", f, {"category": "foo"}) for f in self.files
+        ]
+        self.spool.enqueue(entries)
+        self.spool.remove(self.spool.entries()[:2])
+        spooled = self.spool.entries()
+        self.assertEqual(
+            [os.path.basename(e.evidence) for e in spooled], ["bar_2.json"]
+        )
+
+    def test_lock(self):
+        """Ensures only one flush holds the spool lock."""
+        with self.spool.lock() as locked:
+            self.assertTrue(locked)
+            with Spool(self.spool.path).lock() as other:
+                self.assertFalse(other)
+        with self.spool.lock() as locked:
+            self.assertTrue(locked)
@@ -0,0 +1,41 @@
+# Copyright (c) 2020 IBM Corp. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Plant utilities tests."""
+
+import unittest
+
+from plant.utils import batched, ordered_map
+
+
+class TestUtils(unittest.TestCase):
+    """Test plant utilities."""
+
+    def test_ordered_map(self):
+        """Ensures results are provided in item order."""
+        self.assertEqual(
+            list(ordered_map(str, range(20), 4)), list(map(str, range(20)))
+        )
+
+    def test_batched_size(self):
+        """Ensures items are grouped into batches of a number of items."""
+        self.assertEqual(list(batched(range(5), 2)), [[0, 1], [2, 3], [4]])
+
+    def test_batched_limit(self):
+        """Ensures items are grouped into batches up to a weight."""
+        batches = batched([5, 3, 1, 9, 1, 1], limit=8, weight=lambda i: i)
+        self.assertEqual(list(batches), [[5, 3], [1, 9], [1, 1]])
+        batches = batched([5, 3, 1, 9, 1, 1], size=2, limit=8, weight=lambda i: i)
+        self.assertEqual(list(batches), [[5, 3], [1, 9], [1, 1]])
+        batches = batched([1, 1, 1, 9], size=2, limit=8, weight=lambda i: i)
+        self.assertEqual(list(batches), [[1, 1], [1, 9]])